@@ -0,0 +1,72 @@
+"""Compare the cold-start time of `sync-repos` with each project backend.
+
+Each run is a fresh interpreter, so that import time is included, which is
+what a pre-commit hook pays on every commit.
+
+    $ python benchmarks/cold_start.py [--runs 10] [--poetry-cwd tests]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+SCRIPT = """
+import pathlib, sys
+from poetry_to_pre_commit import sync_repos
+sync_repos.sync_repos(
+    argv=["--backend", sys.argv[1], "--map", "pyright-python=pyright"],
+    pre_commit_path=pathlib.Path(sys.argv[2]),
+    poetry_cwd=pathlib.Path(sys.argv[3]),
+    quiet=True,
+)
+"""
+
+CONFIG = """\
+repos:
+  - repo: https://github.com/RobertCraigie/pyright-python
+    rev: v1.1.300
+    hooks:
+      - id: pyright
+"""
+
+
+def time_run(backend: str, config: pathlib.Path, poetry_cwd: pathlib.Path) -> float:
+    config.write_text(CONFIG)
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", SCRIPT, backend, str(config), str(poetry_cwd)],
+        check=True,
+        cwd=ROOT,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--poetry-cwd", type=pathlib.Path, default=ROOT / "tests")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = pathlib.Path(tmp) / ".pre-commit-config.yaml"
+        for backend in ("toml", "poetry"):
+            times = [
+                time_run(backend, config, args.poetry_cwd.resolve())
+                for _ in range(args.runs)
+            ]
+            print(
+                f"{backend:>6}: median {statistics.median(times) * 1000:7.1f} ms, "
+                f"min {min(times) * 1000:7.1f} ms ({args.runs} runs)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare reading a few packages from a large poetry.lock by parsing the whole
+file, and by scanning it for just these packages.
+
+    $ python benchmarks/lock_lookup.py [--packages 100 1000 5000] [--runs 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+from poetry_to_pre_commit import common, toml_reader
+
+PYPROJECT = """\
+[tool.poetry]
+name = "benchmark"
+version = "0.1.0"
+description = ""
+authors = []
+
+[tool.poetry.dependencies]
+python = "^3.8"
+"""
+
+
+def make_lock(packages: int) -> str:
+    parts = ["# Generated lock\n"]
+    for i in range(packages):
+        parts.append(
+            "[[package]]\n"
+            f'name = "package-{i}"\n'
+            f'version = "1.{i}.0"\n'
+            'description = "A package"\n'
+            "optional = false\n"
+            'python-versions = ">=3.8"\n'
+            "files = [\n"
+            + "".join(
+                f'    {{file = "package_{i}-1.{i}.0-{tag}.whl", '
+                f'hash = "sha256:{i:064x}"}},\n'
+                for tag in ("py3-none-any", "cp312-cp312-linux", "cp312-cp312-macos")
+            )
+            + "]\n\n"
+            "[package.dependencies]\n"
+            f'package-{(i + 1) % packages} = ">=1.0"\n\n'
+        )
+    parts.append('[metadata]\nlock-version = "2.0"\npython-versions = "^3.8"\n')
+    return "".join(parts)
+
+
+def measure(function: Callable[[], object], runs: int) -> float:
+    times: list[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--packages", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--runs", type=int, default=5)
+    # Number of packages looked up, spread over the whole lock file
+    parser.add_argument("--lookup", type=int, default=5)
+    parser.add_argument(
+        "--poetry", action="store_true", help="Also time the Poetry backend."
+    )
+    args = parser.parse_args()
+
+    for packages in args.packages:
+        text = make_lock(packages)
+        step = max(packages // args.lookup, 1)
+        names = {f"package-{i}" for i in range(step - 1, packages, step)}
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory)
+            (path / "pyproject.toml").write_text(PYPROJECT)
+            (path / "poetry.lock").write_text(text)
+
+            timings = {
+                "toml, full parse": lambda: [
+                    p
+                    for p in toml_reader.parse_lock(
+                        toml_reader.loads_toml(text, source=None)
+                    )
+                    if p.name in names
+                ],
+                "toml, scan": lambda: toml_reader.scan_lock(text, names),
+            }
+            if args.poetry:
+                timings["poetry, locked repository"] = lambda: [
+                    p
+                    for p in common.PoetryProject(cwd=path).packages
+                    if p.name in names
+                ]
+                timings["poetry, raw lock data"] = lambda: common.PoetryProject(
+                    cwd=path
+                ).find_packages(names)
+
+            results = {name: measure(f, args.runs) for name, f in timings.items()}
+
+        reference = results["toml, full parse"]
+        for name, seconds in results.items():
+            print(
+                f"{packages:>5} packages, {name:>26}: {seconds * 1000:8.1f} ms "
+                f"(saves {(reference - seconds) * 1000:8.1f} ms)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Time the hooks on synthetic projects of increasing size.
+
+Generates `pyproject.toml`/`poetry.lock` pairs and `.pre-commit-config.yaml`
+files, and times `sync_repos`, `sync_hooks_additional_dependencies` and
+`pre_commit_config_roundtrip` separately, along with the import time of the
+hooks. Two series are run: one growing the number of packages (with few
+hooks), one growing the number of hooks (with few packages).
+
+Results are written as JSON with `--output`, and can be compared with a
+previous run with `--compare`. Steps where a benchmark grows faster than its
+input are flagged as non-linear.
+
+    $ python benchmarks/suite.py [--output results.json] [--compare previous.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+from lock_lookup import make_lock
+
+from poetry_to_pre_commit import common, project_cache, sync_repos
+from poetry_to_pre_commit import sync_hooks_additional_dependencies as sync_hooks
+
+ROOT = pathlib.Path(__file__).parent.parent
+GROUPS = 5
+DEPENDENCIES_PER_GROUP = 20
+# Number of packages while growing the number of hooks
+HOOKS_SERIES_PACKAGES = 100
+# Below this, timings are mostly noise and aren't checked for non-linearity
+NOISE_FLOOR = 0.002
+
+
+def make_pyproject(packages: int) -> str:
+    lines = [
+        "[tool.poetry]",
+        'name = "benchmark"',
+        'version = "0.1.0"',
+        'description = ""',
+        "authors = []",
+        "",
+        "[tool.poetry.dependencies]",
+        'python = "^3.8"',
+    ]
+    for group in range(GROUPS):
+        lines += ["", f"[tool.poetry.group.group-{group}.dependencies]"]
+        lines += [
+            f'package-{i} = "*"'
+            for i in range(group, packages, GROUPS)[:DEPENDENCIES_PER_GROUP]
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def make_config(packages: int, hooks: int) -> str:
+    lines = ["repos:"]
+    for i in range(hooks):
+        lines += [
+            f"  - repo: https://github.com/example/package-{i % packages}",
+            "    rev: v0.0.1",
+            "    hooks:",
+            f"      - id: hook-{i}",
+            "        additional_dependencies:",
+            f"          - package-{i % packages}==0.0.1",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def get_bind_argv(hooks: int) -> list[str]:
+    return [f"--bind=hook-{i}=group-{i % GROUPS}" for i in range(hooks)]
+
+
+def measure(
+    setup: Callable[[], None], function: Callable[[], object], runs: int
+) -> float:
+    times: list[float] = []
+    for _ in range(runs):
+        setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_size(packages: int, hooks: int, runs: int, cache: bool) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory)
+        (path / "pyproject.toml").write_text(make_pyproject(packages))
+        (path / "poetry.lock").write_text(make_lock(packages))
+        config_path = path / ".pre-commit-config.yaml"
+        config_text = make_config(packages, hooks)
+        cache_argv = [] if cache else ["--no-cache"]
+
+        def reset() -> None:
+            config_path.write_text(config_text)
+
+        def roundtrip() -> None:
+            with common.pre_commit_config_roundtrip(config_path) as config:
+                repo = config.data["repos"][0]
+                repo["rev"], old_rev = "v1.0.0", repo["rev"]
+                config.changes.append(
+                    common.RevChange(0, repo["repo"], old_rev, repo["rev"])
+                )
+
+        return {
+            "sync_repos": measure(
+                reset,
+                lambda: sync_repos.sync_repos(
+                    argv=cache_argv,
+                    pre_commit_path=config_path,
+                    poetry_cwd=path,
+                    quiet=True,
+                ),
+                runs,
+            ),
+            "sync_hooks_additional_dependencies": measure(
+                reset,
+                lambda: sync_hooks.sync_hooks_additional_dependencies(
+                    argv=[*cache_argv, *get_bind_argv(hooks)],
+                    pre_commit_path=config_path,
+                    poetry_cwd=path,
+                    quiet=True,
+                ),
+                runs,
+            ),
+            "pre_commit_config_roundtrip": measure(reset, roundtrip, runs),
+        }
+
+
+def measure_import(module: str, runs: int) -> float:
+    """Time of a fresh interpreter importing `module`, minus the interpreter's."""
+
+    def run(code: str) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT)
+        return time.perf_counter() - start
+
+    baseline = statistics.median(run("pass") for _ in range(runs))
+    return statistics.median(run(f"import {module}") for _ in range(runs)) - baseline
+
+
+def find_non_linear(
+    results: list[dict[str, Any]], threshold: float
+) -> list[dict[str, Any]]:
+    """Steps of a series where time grows faster than size**threshold."""
+    flagged: list[dict[str, Any]] = []
+    for series in ("packages", "hooks"):
+        points = [r for r in results if r["series"] == series]
+        for previous, current in zip(points, points[1:]):
+            size_ratio = current[series] / previous[series]
+            for benchmark, seconds in current["timings"].items():
+                previous_seconds = previous["timings"][benchmark]
+                if max(seconds, previous_seconds) < NOISE_FLOOR:
+                    continue
+                exponent = math.log(seconds / previous_seconds) / math.log(size_ratio)
+                if exponent > threshold:
+                    flagged.append(
+                        {
+                            "series": series,
+                            "benchmark": benchmark,
+                            "from": previous[series],
+                            "to": current[series],
+                            "exponent": round(exponent, 2),
+                        }
+                    )
+    return flagged
+
+
+def compare(
+    previous: dict[str, Any], current: dict[str, Any], threshold: float
+) -> list[str]:
+    """Benchmarks that got slower than `threshold` times their previous value."""
+    old = {
+        (r["series"], r["packages"], r["hooks"], name): seconds
+        for r in previous["results"]
+        for name, seconds in r["timings"].items()
+    }
+    regressions: list[str] = []
+    for result in current["results"]:
+        for name, seconds in result["timings"].items():
+            key = (result["series"], result["packages"], result["hooks"], name)
+            before = old.get(key)
+            if not before or max(seconds, before) < NOISE_FLOOR:
+                continue
+            if seconds / before > threshold:
+                regressions.append(
+                    f"{name} ({result['packages']} packages, "
+                    f"{result['hooks']} hooks): {before * 1000:.1f} ms -> "
+                    f"{seconds * 1000:.1f} ms"
+                )
+    for module, seconds in current["import"].items():
+        before = previous.get("import", {}).get(module)
+        if before and seconds / before > threshold:
+            regressions.append(
+                f"import {module}: {before * 1000:.1f} ms -> {seconds * 1000:.1f} ms"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--packages", type=int, nargs="+", default=[10, 100, 1000, 5000]
+    )
+    parser.add_argument("--hooks", type=int, nargs="+", default=[5, 50, 500, 2000])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Let the hooks use their cache (only the first run that parses "
+        "poetry.lock will miss it).",
+    )
+    parser.add_argument(
+        "--non-linear-threshold",
+        type=float,
+        default=1.3,
+        help="Flag steps where time grows like size**N with N above this.",
+    )
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON.")
+    parser.add_argument(
+        "--compare", type=pathlib.Path, help="JSON results of a previous run."
+    )
+    parser.add_argument("--regression-threshold", type=float, default=1.25)
+    args = parser.parse_args()
+
+    sizes = [("packages", packages, min(args.hooks)) for packages in args.packages]
+    sizes += [("hooks", HOOKS_SERIES_PACKAGES, hooks) for hooks in args.hooks]
+
+    results: list[dict[str, Any]] = []
+    for series, packages, hooks in sizes:
+        timings = run_size(packages, hooks, args.runs, args.cache)
+        results.append(
+            {"series": series, "packages": packages, "hooks": hooks, "timings": timings}
+        )
+        for name, seconds in timings.items():
+            print(
+                f"{packages:>5} packages, {hooks:>5} hooks, {name:>35}: "
+                f"{seconds * 1000:9.1f} ms"
+            )
+
+    imports = {
+        module: measure_import(module, args.runs)
+        for module in (
+            "poetry_to_pre_commit.sync_repos",
+            "poetry_to_pre_commit.sync_hooks_additional_dependencies",
+        )
+    }
+    for module, seconds in imports.items():
+        print(f"import {module}: {seconds * 1000:.1f} ms")
+
+    non_linear = find_non_linear(results, args.non_linear_threshold)
+    report: dict[str, Any] = {
+        "tool_version": project_cache.get_tool_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": args.runs,
+        "cache": args.cache,
+        "results": results,
+        "import": imports,
+        "non_linear": non_linear,
+    }
+    for step in non_linear:
+        print(
+            f"NON-LINEAR: {step['benchmark']} from {step['from']} to {step['to']} "
+            f"{step['series']}: time ~ size**{step['exponent']}"
+        )
+
+    status = 0
+    if args.compare:
+        regressions = compare(
+            json.loads(args.compare.read_text()), report, args.regression_threshold
+        )
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        status = 1 if regressions else 0
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
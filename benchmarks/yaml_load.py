@@ -0,0 +1,56 @@
+"""Compare the no-change path of a sync on a large pre-commit config: loading
+it with ruamel.yaml's round-trip loader (as needed to write it back), and with
+the fast loader the hooks use to decide whether anything changed.
+
+    $ python benchmarks/yaml_load.py [--repos 50 200 1000] [--runs 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import statistics
+import tempfile
+import time
+from typing import Any, Callable
+
+import ruamel.yaml
+from yaml_write import make_config
+
+from poetry_to_pre_commit import common
+
+
+def roundtrip(path: pathlib.Path) -> Any:
+    return ruamel.yaml.YAML().load(path.read_text())
+
+
+def fast(path: pathlib.Path) -> Any:
+    return common.load_config_fast(path)
+
+
+def measure(function: Callable[[pathlib.Path], Any], path: pathlib.Path) -> float:
+    start = time.perf_counter()
+    function(path)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repos", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory) / ".pre-commit-config.yaml"
+        for repos in args.repos:
+            path.write_text(make_config(repos))
+            for name, function in (("roundtrip", roundtrip), ("fast", fast)):
+                times = [measure(function, path) for _ in range(args.runs)]
+                print(
+                    f"{repos:>5} repos, {name:>9}: "
+                    f"median {statistics.median(times) * 1000:8.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare writing changes to a large pre-commit config by patching its text
+(yaml_patch) and by dumping the whole document again with ruamel.yaml.
+
+    $ python benchmarks/yaml_write.py [--repos 50 200 1000] [--runs 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import statistics
+import time
+from typing import Any
+
+import ruamel.yaml
+
+from poetry_to_pre_commit import common, yaml_patch
+
+
+def make_config(repos: int) -> str:
+    lines = ["# Generated config", "repos:"]
+    for i in range(repos):
+        lines += [
+            f"  - repo: https://github.com/example/project-{i}  # repo {i}",
+            f"    rev: v1.{i}.0",
+            "    hooks:",
+            f"      - id: hook-{i}",
+            "        additional_dependencies:",
+            *(f"          - dep-{j}=={i}.0" for j in range(5)),
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def make_changes(data: dict[str, Any], every: int) -> list[common.Change]:
+    changes: list[common.Change] = []
+    for index, repo in enumerate(data["repos"]):
+        if index % every:
+            continue
+        old = repo["rev"]
+        repo["rev"] = f"v2.{index}.0"
+        changes.append(common.RevChange(index, repo["repo"], old, repo["rev"]))
+        hook = repo["hooks"][0]
+        old_deps = tuple(hook["additional_dependencies"])
+        hook["additional_dependencies"] = [f"dep-{j}=={index}.1" for j in range(5)]
+        changes.append(
+            common.AdditionalDependenciesChange(
+                index, 0, hook["id"], old_deps, tuple(hook["additional_dependencies"])
+            )
+        )
+    return changes
+
+
+def dump(text: str, every: int) -> float:
+    yaml = ruamel.yaml.YAML()
+    data = yaml.load(text)
+    make_changes(data, every)
+    start = time.perf_counter()
+    yaml.indent(mapping=2, sequence=4, offset=2)
+    yaml.dump(data, io.StringIO())
+    return time.perf_counter() - start
+
+
+def patch(text: str, every: int) -> float:
+    data = ruamel.yaml.YAML().load(text)
+    changes = make_changes(data, every)
+    start = time.perf_counter()
+    yaml_patch.patch(text, data, changes)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repos", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--runs", type=int, default=5)
+    # Change one repo out of N
+    parser.add_argument("--every", type=int, default=10)
+    args = parser.parse_args()
+
+    for repos in args.repos:
+        text = make_config(repos)
+        for name, function in (("dump", dump), ("patch", patch)):
+            times = [function(text, args.every) for _ in range(args.runs)]
+            print(
+                f"{repos:>5} repos, {name:>5}: "
+                f"median {statistics.median(times) * 1000:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,36 @@
 from __future__ import annotations
 
-from .sync_hooks_additional_dependencies import sync_hooks_additional_dependencies_cli
-from .sync_repos import sync_repos_cli
+import importlib
+from typing import TYPE_CHECKING, Any
 
-__all__ = ["sync_hooks_additional_dependencies_cli", "sync_repos_cli"]
+if TYPE_CHECKING:
+    from .monorepo import sync_monorepo_cli
+    from .sync_all import sync_all_cli
+    from .sync_hooks_additional_dependencies import (
+        sync_hooks_additional_dependencies_cli,
+    )
+    from .sync_repos import sync_repos_cli
+
+__all__ = [
+    "sync_all_cli",
+    "sync_hooks_additional_dependencies_cli",
+    "sync_monorepo_cli",
+    "sync_repos_cli",
+]
+
+# Importing the hooks is deferred until they're used, so that importing the
+# package stays cheap.
+_CLI_MODULES = {
+    "sync_all_cli": ".sync_all",
+    "sync_hooks_additional_dependencies_cli": ".sync_hooks_additional_dependencies",
+    "sync_monorepo_cli": ".monorepo",
+    "sync_repos_cli": ".sync_repos",
+}
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module = _CLI_MODULES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
@@ -0,0 +1,86 @@
+"""Compute the changes the hooks would make, without touching the disk.
+
+This is meant for tools syncing many configurations in the same process: they
+load the pre-commit config and the project data however they like (e.g. with
+`TomlProject.from_data`, once per lock file), and get back the list of
+changes along with an updated copy of the config.
+"""
+
+from __future__ import annotations
+
+import copy
+import dataclasses
+from typing import Any, Iterable, Mapping
+
+from . import common, sync_hooks_additional_dependencies, sync_repos
+from .common import AdditionalDependenciesChange, Project, RevChange
+from .toml_reader import TomlProject
+
+__all__ = [
+    "AdditionalDependenciesChange",
+    "ChangeSet",
+    "Project",
+    "RevChange",
+    "TomlProject",
+    "compute_changes",
+]
+
+
+@dataclasses.dataclass(frozen=True)
+class ChangeSet:
+    repos: tuple[RevChange, ...]
+    hooks: tuple[AdditionalDependenciesChange, ...]
+    # The config with the changes applied. The input config is left untouched.
+    config: dict[str, Any]
+
+    def __bool__(self) -> bool:
+        return bool(self.repos or self.hooks)
+
+    @property
+    def changes(self) -> list[common.Change]:
+        return [*self.repos, *self.hooks]
+
+
+def compute_changes(
+    config: Mapping[str, Any],
+    project: Project,
+    *,
+    map: Mapping[str, str] | None = None,
+    skip: Iterable[str] = (),
+    bind: Mapping[str, Iterable[str]] | None = None,
+    no_new_deps: bool = False,
+    transitive: bool = False,
+    prune_markers: bool = False,
+    marker_env: Mapping[str, Mapping[str, str]] | None = None,
+) -> ChangeSet:
+    """Compute what `sync-all` would change in `config`.
+
+    Args:
+        config: pre-commit config, as plain data (e.g. from `yaml.safe_load`)
+        project: packages and dependency groups of the Poetry project
+        map, skip: same as the `--map` and `--skip` options of `sync-repos`
+        bind, no_new_deps, transitive, prune_markers: same as the `--bind`,
+            `--no-new-deps`, `--transitive` and `--prune-markers` options of
+            `sync-hooks-additional-dependencies`
+        marker_env: marker environment values, by hook id, like the
+            `--marker-env` option
+
+    Raises:
+        SystemError: if a bound group or one of its packages can't be found.
+    """
+    new_config = copy.deepcopy(dict(config))
+    repos = sync_repos.sync_repos_with_project(
+        new_config, project, map=dict(map or {}), skip=list(skip)
+    )
+    hooks = sync_hooks_additional_dependencies.sync_hooks_with_project(
+        new_config,
+        project,
+        bind={hook_id: set(groups) for hook_id, groups in (bind or {}).items()},
+        no_new_deps=no_new_deps,
+        transitive=transitive,
+        prune_markers=prune_markers,
+        marker_env={
+            hook_id: dict(values) for hook_id, values in (marker_env or {}).items()
+        },
+    )
+    return ChangeSet(repos=tuple(repos), hooks=tuple(hooks), config=new_config)
@@ -1,26 +1,265 @@
 from __future__ import annotations
 
+import argparse
 import contextlib
-import copy
 import dataclasses
+import functools
+import os
 import pathlib
-from typing import Any, Generator, Iterable, cast
+import re
+import stat
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Collection,
+    Generator,
+    Iterable,
+    Protocol,
+    Union,
+    cast,
+)
 
-import ruamel.yaml
-from poetry import factory
+if TYPE_CHECKING:
+    from poetry.poetry import Poetry
+    from poetry.repositories.repository import (  # pyright: ignore[reportMissingTypeStubs]
+        Repository,
+    )
+
+# Name of the group holding the project's main dependencies, as in
+# poetry.core.packages.dependency_group.MAIN_GROUP (not imported, to avoid
+# loading Poetry just for a constant).
+MAIN_GROUP = "main"
+
+BACKENDS = ("auto", "toml", "poetry", "uv")
+
+_CANONICALIZE_RE = re.compile(r"[-_.]+")
+_REQUIREMENT_NAME_RE = re.compile(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def canonicalize_name(name: str) -> str:
+    """Normalize a package name (PEP 503).
+
+    Same as packaging.utils.canonicalize_name, which is slow to import.
+    """
+    return _CANONICALIZE_RE.sub("-", name).lower()
+
+
+def requirement_name(requirement: str) -> str:
+    """Canonical name of the package in a requirement string, e.g. `foo[bar]>=1`."""
+    match = _REQUIREMENT_NAME_RE.match(requirement)
+    return canonicalize_name(match.group(1) if match else requirement.strip())
+
+
+@dataclasses.dataclass(frozen=True)
+class RevChange:
+    """The `rev` of a repo in the pre-commit config was changed."""
+
+    repo_index: int
+    repo: str
+    old_rev: str | None
+    new_rev: str
+
+    def __str__(self) -> str:
+        return f"{self.repo}: rev {self.old_rev} -> {self.new_rev}"
+
+
+@dataclasses.dataclass(frozen=True)
+class AdditionalDependenciesChange:
+    """The `additional_dependencies` of a hook were changed."""
+
+    repo_index: int
+    hook_index: int
+    hook_id: str
+    old: tuple[str, ...] | None
+    new: tuple[str, ...]
+
+    def _by_name(self, requirements: Iterable[str] | None) -> dict[str, str]:
+        return {requirement_name(r): r for r in requirements or ()}
+
+    @property
+    def added(self) -> tuple[str, ...]:
+        """Requirements of packages that weren't there before."""
+        old = self._by_name(self.old)
+        return tuple(r for r in self.new if requirement_name(r) not in old)
+
+    @property
+    def removed(self) -> tuple[str, ...]:
+        """Requirements of packages that aren't there anymore."""
+        new = self._by_name(self.new)
+        return tuple(r for r in self.old or () if requirement_name(r) not in new)
+
+    @property
+    def updated(self) -> tuple[tuple[str, str], ...]:
+        """(old, new) requirements of packages that are still there."""
+        old = self._by_name(self.old)
+        return tuple(
+            (old[name], r)
+            for name, r in self._by_name(self.new).items()
+            if name in old and old[name] != r
+        )
+
+    def __str__(self) -> str:
+        lines = [f"{self.hook_id}: additional_dependencies"]
+        lines += [f"  + {requirement}" for requirement in self.added]
+        lines += [f"  - {requirement}" for requirement in self.removed]
+        lines += [f"  ~ {old} -> {new}" for old, new in self.updated]
+        return "\n".join(lines)
+
+
+Change = Union[RevChange, AdditionalDependenciesChange]
+
+
+@dataclasses.dataclass
+class PreCommitConfig:
+    data: dict[str, Any]
+    # Every modification of `data` must be recorded here
+    changes: list[Change] = dataclasses.field(default_factory=lambda: [])
+    # With `dry_run`, the text that would have been written
+    new_text: str | None = None
+
+
+# Configs locked by this process
+_locked_configs: set[pathlib.Path] = set()
+
+
+@contextlib.contextmanager
+def lock_config(path: pathlib.Path) -> Generator[None, None, None]:
+    """Hold an advisory lock on the config for a load/modify/write cycle.
+
+    The config file itself is locked with `flock`, so that concurrent runs
+    syncing the same config wait for each other. Writes replace the file, so
+    when it was replaced while waiting, the new file is locked instead. The
+    lock is reentrant within a process, and isn't taken where `fcntl` isn't
+    available.
+    """
+    path = path.resolve()
+    if path in _locked_configs:
+        yield
+        return
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    while True:
+        with path.open("rb") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if not os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                continue
+            _locked_configs.add(path)
+            try:
+                yield
+            finally:
+                _locked_configs.discard(path)
+            return
 
 
 @contextlib.contextmanager
 def pre_commit_config_roundtrip(
-    path: pathlib.Path,
-) -> Generator[dict[str, Any], None, None]:
-    yaml = ruamel.yaml.YAML()
-    config = cast("dict[str, Any]", yaml.load(path.read_text()))
-    old_config = copy.deepcopy(config)
+    path: pathlib.Path, *, dry_run: bool = False
+) -> Generator[PreCommitConfig, None, None]:
+    """Load the config, and write it back if any change was recorded.
+
+    Changes are tracked explicitly rather than by comparing with a copy of
+    the loaded document, which is costly with ruamel's comment metadata.
+    They are written by patching the original text where possible, and by
+    dumping the whole document otherwise. With `dry_run`, the new text is
+    stored in `new_text` instead of being written.
+
+    Unless `dry_run`, the config is locked from loading to writing, and
+    written atomically to a temporary file renamed over it, so that
+    concurrent runs neither lose each other's changes nor read a partially
+    written file.
+    """
+    with contextlib.nullcontext() if dry_run else lock_config(path):
+        yield from _pre_commit_config_roundtrip(path, dry_run=dry_run)
+
+
+def _pre_commit_config_roundtrip(
+    path: pathlib.Path, *, dry_run: bool
+) -> Generator[PreCommitConfig, None, None]:
+    from . import project_cache, timing
+
+    with timing.span("load config"):
+        import ruamel.yaml
+
+        from . import yaml_patch
+
+        yaml = ruamel.yaml.YAML()
+        text = path.read_text()
+        config = PreCommitConfig(data=cast("dict[str, Any]", yaml.load(text)))
     yield config
-    if config != old_config:
-        yaml.indent(mapping=2, sequence=4, offset=2)
-        yaml.dump(config, path)
+    if not config.changes:
+        return
+
+    with timing.span("write config"):
+        try:
+            new_text = yaml_patch.patch(text, config.data, config.changes)
+        except yaml_patch.CannotPatch:
+            import io
+
+            yaml.indent(mapping=2, sequence=4, offset=2)
+            stream = io.StringIO()
+            yaml.dump(config.data, stream)
+            new_text = stream.getvalue()
+        if dry_run:
+            config.new_text = new_text
+        else:
+            # Replace the target of a symlink rather than the symlink
+            path = path.resolve()
+            project_cache.write_atomic(
+                path, new_text.encode(), mode=stat.S_IMODE(os.stat(path).st_mode)
+            )
+
+
+def has_fast_loader() -> bool:
+    """Whether `load_config_fast` has a C loader to use.
+
+    That's PyYAML's C loader when PyYAML is installed with libyaml, or
+    ruamel.yaml's when ruamel.yaml.clib is installed. Without one, loading
+    the config is not much faster than with the round-trip loader.
+    """
+    try:
+        import yaml
+    except ImportError:
+        pass
+    else:
+        if hasattr(yaml, "CSafeLoader"):
+            return True
+    import ruamel.yaml
+    import ruamel.yaml.parser
+
+    return ruamel.yaml.YAML(typ="safe").Parser is not ruamel.yaml.parser.Parser
+
+
+def load_config_fast(path: pathlib.Path) -> dict[str, Any]:
+    """Load the config as plain data, for when it won't be written back.
+
+    Uses PyYAML's C loader when available, and ruamel.yaml's safe loader
+    otherwise (see `has_fast_loader`). Both are faster than ruamel's
+    round-trip loader, and don't keep comments and formatting.
+    """
+    text = path.read_text()
+    try:
+        from yaml import CSafeLoader, load
+    except ImportError:
+        import ruamel.yaml
+
+        return cast("dict[str, Any]", ruamel.yaml.YAML(typ="safe").load(text))
+    return cast("dict[str, Any]", load(text, Loader=CSafeLoader))
+
+
+def apply_changes(data: dict[str, Any], changes: Iterable[Change]) -> None:
+    """Apply changes recorded on another load of the same config to `data`."""
+    for change in changes:
+        repo = data["repos"][change.repo_index]
+        if isinstance(change, RevChange):
+            repo["rev"] = change.new_rev
+        else:
+            repo["hooks"][change.hook_index]["additional_dependencies"] = list(
+                change.new
+            )
 
 
 @dataclasses.dataclass(frozen=True, order=True)
@@ -28,20 +267,429 @@ class PoetryPackage:
     name: str
     version: str = "*"
     extras: frozenset[str] = dataclasses.field(default_factory=frozenset)
+    # PEP 508 environment markers, empty if the package is always needed
+    markers: str = ""
 
     def __str__(self) -> str:
         if self.extras:
             extras = ",".join(sorted(self.extras))
-            return f"{self.name}[{extras}]=={self.version}"
+            requirement = f"{self.name}[{extras}]=={self.version}"
         else:
-            return f"{self.name}=={self.version}"
+            requirement = f"{self.name}=={self.version}"
+        if self.markers:
+            return f"{requirement}; {self.markers}"
+        return requirement
+
 
+@dataclasses.dataclass(frozen=True, order=True)
+class Dependency:
+    """A dependency declared in a group of pyproject.toml."""
 
-def get_poetry_packages(cwd: pathlib.Path | None = None) -> Iterable[PoetryPackage]:
-    locker = factory.Factory().create_poetry(cwd=cwd).locker
-    repository = locker.locked_repository()
+    name: str
+    extras: frozenset[str] = dataclasses.field(default_factory=lambda: frozenset())
+    # PEP 508 environment markers, empty if the dependency always applies
+    markers: str = ""
+
+
+@dataclasses.dataclass(frozen=True, order=True)
+class LockedDependency:
+    """A dependency of a package in poetry.lock."""
 
-    for package in repository.packages:
-        yield PoetryPackage(
-            name=package.name, version=package.version.text, extras=package.features
+    name: str
+    extras: frozenset[str] = dataclasses.field(default_factory=lambda: frozenset())
+    # PEP 508 environment markers, empty if the dependency always applies
+    markers: str = ""
+
+
+@dataclasses.dataclass(frozen=True)
+class PackageDependencies:
+    """The dependencies of a package in poetry.lock."""
+
+    required: tuple[LockedDependency, ...] = ()
+    # Additional dependencies of each extra of the package
+    extras: dict[str, tuple[LockedDependency, ...]] = dataclasses.field(
+        default_factory=lambda: {}
+    )
+
+
+def normalize_markers(markers: str) -> str:
+    """Markers as packaging writes them, whichever backend read them.
+
+    Markers that can't be parsed are kept as is.
+    """
+    if not markers:
+        return ""
+    from packaging.markers import InvalidMarker, Marker
+
+    try:
+        return str(Marker(markers))
+    except InvalidMarker:
+        return markers
+
+
+def split_markers(markers: str) -> list[str]:
+    """The normalized clauses that `markers` AND together, in order.
+
+    Markers that can't be parsed are their own single clause.
+    """
+    if not markers:
+        return []
+    text = normalize_markers(markers)
+    clauses: list[str] = []
+    depth, quote, start, index = 0, "", 0, 0
+    while index < len(text):
+        char = text[index]
+        if quote:
+            quote = "" if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char in "()":
+            depth += 1 if char == "(" else -1
+        elif depth == 0 and text.startswith(" or ", index):
+            # `and` binds tighter: this is a single disjunction
+            return [text]
+        elif depth == 0 and text.startswith(" and ", index):
+            clauses.append(text[start:index])
+            index += len(" and ")
+            start = index
+            continue
+        index += 1
+    clauses.append(text[start:])
+    return [normalize_markers(clause) for clause in clauses]
+
+
+def merge_markers(markers: list[str]) -> str:
+    """Markers applying when any of `markers` does (empty ones always apply)."""
+    if not all(markers):
+        return ""
+    if len(markers) == 1:
+        return markers[0]
+    return " or ".join(f"({marker})" for marker in markers)
+
+
+def merge_packages(packages: Iterable[PoetryPackage]) -> list[PoetryPackage]:
+    """Merge the packages needed with different extras or markers.
+
+    E.g. when several groups of a hook need the same package.
+    """
+    by_version: dict[tuple[str, str], list[PoetryPackage]] = {}
+    for package in packages:
+        by_version.setdefault((package.name, package.version), []).append(package)
+
+    merged: list[PoetryPackage] = []
+    for (name, version), same in by_version.items():
+        if len(same) == 1:
+            merged.extend(same)
+            continue
+        extras: set[str] = set()
+        for package in same:
+            extras.update(package.extras)
+        merged.append(
+            PoetryPackage(
+                name=name,
+                version=version,
+                extras=frozenset(extras),
+                markers=merge_markers(sorted({p.markers for p in same})),
+            )
+        )
+    return merged
+
+
+def merge_locked_dependencies(
+    dependencies: Iterable[LockedDependency],
+) -> list[LockedDependency]:
+    """Merge the constraints of a package on the same dependency.
+
+    A package can depend on another with different constraints depending on
+    the environment (e.g. the Python version): the dependency applies if any
+    of their markers does, with the extras of all of them.
+    """
+    by_name: dict[str, list[LockedDependency]] = {}
+    for dependency in dependencies:
+        by_name.setdefault(dependency.name, []).append(dependency)
+
+    merged: list[LockedDependency] = []
+    for name, constraints in by_name.items():
+        if len(constraints) == 1:
+            merged.extend(constraints)
+            continue
+        extras: set[str] = set()
+        for constraint in constraints:
+            extras.update(constraint.extras)
+        merged.append(
+            LockedDependency(
+                name=name,
+                extras=frozenset(extras),
+                markers=merge_markers([c.markers for c in constraints]),
+            )
         )
+    return merged
+
+
+class Project(Protocol):
+    """Packages of poetry.lock and dependency groups of pyproject.toml."""
+
+    @property
+    def packages(self) -> list[PoetryPackage]: ...
+
+    def find_packages(self, names: Collection[str]) -> list[PoetryPackage]:
+        """Locked packages with these (canonical) names.
+
+        Cheaper than going through all the `packages` when only a few are
+        needed.
+        """
+        ...
+
+    @property
+    def dependency_graph(self) -> dict[str, PackageDependencies]:
+        """The dependencies of each package of poetry.lock, by name."""
+        ...
+
+    @property
+    def group_names(self) -> list[str]: ...
+
+    def get_group_dependencies(self, group: str) -> list[Dependency]:
+        """Raises ValueError if the group doesn't exist."""
+        ...
+
+
+@dataclasses.dataclass
+class PoetryProject:
+    """Poetry project and lock file, loaded at most once per run.
+
+    Pass the same instance to `get_poetry_packages` and `get_poetry_deps` so
+    that `pyproject.toml` and `poetry.lock` are only parsed once.
+    """
+
+    cwd: pathlib.Path | None = None
+
+    @functools.cached_property
+    def poetry(self) -> Poetry:
+        from . import timing
+
+        with timing.span("import poetry"):
+            from poetry import factory
+
+        with timing.span("create poetry"):
+            return factory.Factory().create_poetry(cwd=self.cwd)
+
+    @functools.cached_property
+    def locked_repository(self) -> Repository:
+        from . import timing
+
+        poetry = self.poetry
+        with timing.span("locked repository"):
+            return poetry.locker.locked_repository()
+
+    @functools.cached_property
+    def locked_packages(self) -> list[PoetryPackage]:
+        return [
+            PoetryPackage(
+                name=package.name, version=package.version.text, extras=package.features
+            )
+            for package in self.locked_repository.packages
+        ]
+
+    @functools.cached_property
+    def locked_dependency_graph(self) -> dict[str, PackageDependencies]:
+        return {
+            package.name: PackageDependencies(
+                required=tuple(
+                    merge_locked_dependencies(
+                        LockedDependency(
+                            name=dep.name,
+                            extras=frozenset(dep.extras),
+                            markers=(
+                                ""
+                                if dep.marker.is_any()
+                                else normalize_markers(str(dep.marker))
+                            ),
+                        )
+                        for dep in package.requires
+                        if not dep.is_optional()
+                    )
+                ),
+                extras={
+                    extra: tuple(
+                        LockedDependency(name=dep.name, extras=frozenset(dep.extras))
+                        for dep in deps
+                    )
+                    for extra, deps in package.extras.items()
+                },
+            )
+            for package in self.locked_repository.packages
+        }
+
+    @property
+    def packages(self) -> list[PoetryPackage]:
+        return self.locked_packages
+
+    @property
+    def dependency_graph(self) -> dict[str, PackageDependencies]:
+        return self.locked_dependency_graph
+
+    def find_packages(self, names: Collection[str]) -> list[PoetryPackage]:
+        if "locked_repository" in self.__dict__:
+            return [package for package in self.packages if package.name in names]
+        # Building the locked repository creates a Package object, with all its
+        # dependencies and files, for every package: use the raw data instead.
+        from . import timing
+
+        poetry = self.poetry
+        with timing.span("read lock data"):
+            lock_data = poetry.locker.lock_data
+        packages: list[PoetryPackage] = []
+        for package in lock_data.get("package", []):
+            name = canonicalize_name(package["name"])
+            if name in names:
+                packages.append(PoetryPackage(name=name, version=package["version"]))
+        return packages
+
+    @property
+    def group_names(self) -> list[str]:
+        return sorted(self.poetry.package.dependency_group_names(include_optional=True))
+
+    def get_group_dependencies(self, group: str) -> list[Dependency]:
+        dep_group = self.poetry.package.dependency_group(group)
+        return [
+            Dependency(
+                name=dep.name,
+                extras=dep.extras,
+                markers=(
+                    "" if dep.marker.is_any() else normalize_markers(str(dep.marker))
+                ),
+            )
+            for dep in dep_group.dependencies
+        ]
+
+
+def get_project(cwd: pathlib.Path | None = None, backend: str = "auto") -> Project:
+    """Return the project for `cwd`, read with the given backend.
+
+    `toml` reads pyproject.toml and poetry.lock directly, `poetry` uses the
+    Poetry library, and `auto` uses the former unless the files use a format
+    it doesn't understand. `uv` reads pyproject.toml and uv.lock, and is what
+    `auto` uses for projects locked with uv.lock.
+    """
+    if backend == "poetry":
+        return PoetryProject(cwd=cwd)
+
+    from . import toml_reader, uv_reader
+
+    if backend == "uv" or (backend == "auto" and uv_reader.is_uv_project(cwd=cwd)):
+        try:
+            return uv_reader.load_project(cwd=cwd)
+        except toml_reader.UnsupportedFormat as e:
+            raise SystemError(f"Cannot read project with the uv backend: {e}")
+
+    try:
+        return toml_reader.LazyTomlProject.load(cwd=cwd)
+    except toml_reader.UnsupportedFormat as e:
+        if backend == "toml":
+            raise SystemError(f"Cannot read project with the toml backend: {e}")
+        return PoetryProject(cwd=cwd)
+
+
+def add_common_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="auto",
+        help="How to read pyproject.toml and the lock file: `toml` parses "
+        "poetry.lock directly, `poetry` uses the Poetry library, `uv` parses "
+        "uv.lock, and `auto` (the default) uses `uv` for projects locked with "
+        "uv.lock, and `toml` otherwise, falling back to `poetry` for "
+        "unsupported formats.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or write the cache of parsed pyproject.toml and poetry.lock.",
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Print cache hit/miss statistics.",
+    )
+    parser.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="Record a fingerprint of pyproject.toml, poetry.lock, the pre-commit "
+        "config and the options after each successful sync, and exit immediately "
+        "if none of them changed since.",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print how long each phase of the run took.",
+    )
+    parser.add_argument(
+        "--trace",
+        type=pathlib.Path,
+        metavar="PATH",
+        help="Write the timings of each phase to PATH, as a JSON trace "
+        "(Trace Event Format, e.g. for chrome://tracing or Perfetto).",
+    )
+    parser.add_argument(
+        "--profile",
+        type=pathlib.Path,
+        metavar="PATH",
+        help="Profile the run with cProfile and write the stats to PATH "
+        "(to be read with pstats).",
+    )
+    parser.add_argument(
+        "--incremental",
+        nargs="?",
+        const="auto",
+        default=None,
+        metavar="REVISION",
+        help="Only sync the repos and hooks of the packages that changed in "
+        "poetry.lock since the last incremental run (or since REVISION, in git). "
+        "Everything is synced if pyproject.toml or the pre-commit config changed.",
+    )
+    parser.add_argument(
+        "--install-hooks",
+        choices=("now", "background"),
+        default=None,
+        help="After a sync, build the pre-commit environments it invalidated "
+        "(with `pre-commit install-hooks`), `now` or in the `background`, rather "
+        "than on the next pre-commit run.",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Don't write the pre-commit config: print what would change, and "
+        "exit with 1 if anything would.",
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="With --check, print a unified diff of the config rather than a "
+        "summary of the changes.",
+    )
+
+
+def get_fingerprint_options(args: argparse.Namespace) -> dict[str, Any]:
+    """Options that influence the result of a sync."""
+    ignored = {
+        "filenames",
+        "cache_stats",
+        "no_cache",
+        "skip_unchanged",
+        "timings",
+        "trace",
+        "profile",
+        "diff",
+        "incremental",
+        "install_hooks",
+    }
+    return {key: value for key, value in vars(args).items() if key not in ignored}
+
+
+def get_poetry_packages(
+    cwd: pathlib.Path | None = None, project: Project | None = None
+) -> Iterable[PoetryPackage]:
+    if project is None:
+        project = get_project(cwd=cwd)
+
+    yield from project.packages
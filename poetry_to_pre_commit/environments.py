@@ -0,0 +1,157 @@
+"""Tell which pre-commit environments a sync invalidated, and install them.
+
+pre-commit keys the environment of a hook by its repo, rev and
+additional_dependencies: changing any of them makes pre-commit build a new
+environment on its next run, usually in the middle of a commit. With
+`--install-hooks`, these environments are built right after the sync, from a
+config only containing the affected hooks, so that the others aren't even
+looked at.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import pathlib
+import shutil
+import subprocess
+import sys
+from typing import Any, Iterable
+
+from . import common, project_cache, toml_reader
+
+ENVIRONMENTS_DIR = "environments"
+INSTALL_MODES = ("now", "background")
+
+
+@dataclasses.dataclass(frozen=True)
+class Environment:
+    repo: str
+    rev: str | None
+    additional_dependencies: tuple[str, ...]
+    # Hooks using the environment
+    hook_ids: tuple[str, ...]
+
+    def __str__(self) -> str:
+        name = self.repo if self.rev is None else f"{self.repo}@{self.rev}"
+        dependencies = ", ".join(self.additional_dependencies) or "no dependencies"
+        return f"{name} ({', '.join(self.hook_ids)}: {dependencies})"
+
+
+def get_affected_hooks(
+    config: dict[str, Any], changes: Iterable[common.Change]
+) -> dict[int, list[int]]:
+    """Indexes of the hooks whose environment changed, by repo index."""
+    affected: dict[int, set[int]] = {}
+    for change in changes:
+        hook_indexes = affected.setdefault(change.repo_index, set())
+        if isinstance(change, common.RevChange):
+            hooks = config["repos"][change.repo_index].get("hooks", [])
+            hook_indexes.update(range(len(hooks)))
+        else:
+            hook_indexes.add(change.hook_index)
+    return {
+        repo_index: sorted(hook_indexes)
+        for repo_index, hook_indexes in sorted(affected.items())
+    }
+
+
+def get_invalidated_environments(
+    config: dict[str, Any], changes: Iterable[common.Change]
+) -> list[Environment]:
+    """Environments pre-commit will have to build for the synced `config`."""
+    hook_ids: dict[tuple[str, str | None, tuple[str, ...]], list[str]] = {}
+    for repo_index, hook_indexes in get_affected_hooks(config, changes).items():
+        repo = config["repos"][repo_index]
+        for hook_index in hook_indexes:
+            hook = repo["hooks"][hook_index]
+            key = (
+                str(repo["repo"]),
+                None if repo.get("rev") is None else str(repo["rev"]),
+                tuple(str(dep) for dep in hook.get("additional_dependencies", [])),
+            )
+            hook_ids.setdefault(key, []).append(str(hook["id"]))
+    return [
+        Environment(
+            repo=repo, rev=rev, additional_dependencies=deps, hook_ids=tuple(ids)
+        )
+        for (repo, rev, deps), ids in hook_ids.items()
+    ]
+
+
+def print_environments(environments: list[Environment]) -> None:
+    if not environments:
+        return
+    print("pre-commit environments invalidated by this sync:")
+    for environment in environments:
+        print(f"  {environment}")
+
+
+def get_affected_config(
+    config: dict[str, Any], changes: Iterable[common.Change]
+) -> dict[str, Any]:
+    """A config with only the hooks whose environment changed, as plain data."""
+    repos: list[dict[str, Any]] = []
+    for repo_index, hook_indexes in get_affected_hooks(config, changes).items():
+        repo = config["repos"][repo_index]
+        repos.append(
+            {
+                **{key: value for key, value in repo.items() if key != "hooks"},
+                "hooks": [repo["hooks"][index] for index in hook_indexes],
+            }
+        )
+    return {"repos": repos}
+
+
+def get_pre_commit_command() -> list[str]:
+    executable = shutil.which("pre-commit")
+    if executable:
+        return [executable]
+    # The hooks don't run in pre-commit's environment, but from the shell,
+    # pre-commit may be installed alongside
+    return [sys.executable, "-m", "pre_commit"]
+
+
+def install(
+    *,
+    config: dict[str, Any],
+    changes: list[common.Change],
+    pre_commit_path: pathlib.Path,
+    poetry_cwd: pathlib.Path | None,
+    mode: str,
+) -> None:
+    """Build the invalidated environments with `pre-commit install-hooks`.
+
+    With `background`, pre-commit is started in its own session and the sync
+    doesn't wait for it.
+    """
+    if not changes:
+        return
+    pre_commit_path = pre_commit_path.resolve()
+    cache_dir = project_cache.get_cache_dir(
+        toml_reader.locate_pyproject(cwd=poetry_cwd).parent
+    )
+    # One config per config file, so that concurrent syncs don't clash.
+    # JSON is valid YAML.
+    name = hashlib.sha256(str(pre_commit_path).encode()).hexdigest()
+    path = project_cache.ensure_cache_dir(cache_dir, ENVIRONMENTS_DIR) / f"{name}.yaml"
+    project_cache.write_atomic(
+        path, json.dumps(get_affected_config(config, changes)).encode()
+    )
+
+    command = [*get_pre_commit_command(), "install-hooks", "--config", str(path)]
+    if mode == "background":
+        subprocess.Popen(
+            command,
+            cwd=pre_commit_path.parent,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        print("Installing them in the background.")
+        return
+    result = subprocess.run(command, cwd=pre_commit_path.parent, check=False)
+    if result.returncode:
+        print(f"pre-commit install-hooks failed with exit code {result.returncode}.")
@@ -0,0 +1,86 @@
+"""Skip runs whose inputs haven't changed since the last successful sync.
+
+The fingerprint covers everything a sync depends on: pyproject.toml,
+poetry.lock, the pre-commit config and the options. Checking it only needs
+hashlib, so an unchanged run exits before importing Poetry or ruamel.yaml.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import pathlib
+from typing import Any
+
+from . import project_cache, toml_reader
+
+FINGERPRINTS_DIR = "fingerprints"
+
+
+@dataclasses.dataclass
+class Fingerprint:
+    path: pathlib.Path
+    inputs: list[pathlib.Path]
+    options: dict[str, Any]
+
+    def compute(self) -> str:
+        digest = hashlib.sha256()
+        digest.update(project_cache.get_tool_version().encode() + b"\0")
+        digest.update(
+            json.dumps(self.options, sort_keys=True, default=_json_default).encode()
+        )
+        for path in self.inputs:
+            try:
+                digest.update(b"\0+" + path.read_bytes())
+            except FileNotFoundError:
+                digest.update(b"\0-")
+        return digest.hexdigest()
+
+    def matches(self) -> bool:
+        try:
+            return self.path.read_text() == self.compute()
+        except OSError:
+            return False
+
+    def record(self) -> None:
+        project_cache.ensure_cache_dir(self.path.parent.parent, FINGERPRINTS_DIR)
+        project_cache.write_atomic(self.path, self.compute().encode())
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)  # pyright: ignore[reportUnknownArgumentType,reportUnknownVariableType]
+    return str(value)
+
+
+def get_fingerprint(
+    *,
+    hook: str,
+    options: dict[str, Any],
+    pre_commit_path: pathlib.Path,
+    poetry_cwd: pathlib.Path | None = None,
+) -> Fingerprint | None:
+    """Return the fingerprint of a run, or None if there's no project.
+
+    `options` should only contain what influences the result (e.g. not the
+    filenames pre-commit passes).
+    """
+    try:
+        pyproject_path = toml_reader.locate_pyproject(cwd=poetry_cwd)
+    except toml_reader.UnsupportedFormat:
+        return None
+
+    pre_commit_path = pre_commit_path.resolve()
+    # One fingerprint per hook and config file
+    name = hashlib.sha256(f"{hook}\0{pre_commit_path}".encode()).hexdigest()
+    cache_dir = project_cache.get_cache_dir(pyproject_path.parent)
+    return Fingerprint(
+        path=cache_dir / FINGERPRINTS_DIR / name,
+        inputs=[
+            pyproject_path,
+            *(pyproject_path.parent / name for name in toml_reader.LOCK_FILES),
+            pre_commit_path,
+        ],
+        options={"hook": hook, **options},
+    )
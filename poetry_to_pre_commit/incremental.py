@@ -0,0 +1,164 @@
+"""Only sync what a change of poetry.lock can affect.
+
+Lock updates usually touch a few packages. With `--incremental`, each
+package entry of poetry.lock is compared with a previous version of the
+lock, and only the repos of changed packages, and the hooks whose packages
+changed, are synced. The rest of the config is left untouched.
+
+The previous version is either a git revision (`--incremental=HEAD`), or by
+default, a snapshot recorded after the last incremental run (everything is
+synced without a snapshot, as the config may not match any revision). Snapshots
+only store a digest of each package entry. When pyproject.toml or the pre-commit config differ from the previous
+version, or the options differ from the snapshot's, everything is synced.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import pathlib
+import subprocess
+from typing import Any
+
+from . import project_cache, toml_reader
+
+SNAPSHOTS_DIR = "incremental"
+# Value of --incremental without a revision
+AUTO = "auto"
+
+
+@dataclasses.dataclass(frozen=True)
+class State:
+    """What a sync depends on, in a comparable form."""
+
+    pyproject: str
+    config: str
+    # Digest of the entries of each package in poetry.lock
+    packages: dict[str, str]
+    # Only known for snapshots
+    options: str | None = None
+
+    @classmethod
+    def from_texts(
+        cls, *, pyproject: str, config: str, lock: str, options: str | None = None
+    ) -> State:
+        return cls(
+            pyproject=_digest(pyproject),
+            config=_digest(config),
+            packages=toml_reader.digest_lock_packages(lock),
+            options=options,
+        )
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def get_options_digest(options: dict[str, Any]) -> str:
+    return _digest(json.dumps(options, sort_keys=True, default=str))
+
+
+def get_changed_packages(old: State, new: State) -> set[str] | None:
+    """Names of the packages that changed, or None if everything must be synced."""
+    if (old.pyproject, old.config) != (new.pyproject, new.config):
+        return None
+    if old.options is not None and old.options != new.options:
+        return None
+    return {
+        name
+        for name in old.packages.keys() | new.packages.keys()
+        if old.packages.get(name) != new.packages.get(name)
+    }
+
+
+def git_show(revision: str, path: pathlib.Path) -> str | None:
+    """Content of `path` at `revision`, or None if git can't tell."""
+    try:
+        result = subprocess.run(
+            ["git", "show", f"{revision}:./{path.name}"],
+            cwd=path.parent,
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.decode()
+
+
+@dataclasses.dataclass
+class Incremental:
+    pyproject_path: pathlib.Path
+    pre_commit_path: pathlib.Path
+    snapshot_path: pathlib.Path
+    revision: str
+    options: str
+
+    @property
+    def lock_path(self) -> pathlib.Path:
+        return toml_reader.locate_lock(self.pyproject_path)
+
+    def get_current_state(self) -> State:
+        return State.from_texts(
+            pyproject=self.pyproject_path.read_text(),
+            config=self.pre_commit_path.read_text(),
+            lock=self.lock_path.read_text() if self.lock_path.exists() else "",
+            options=self.options,
+        )
+
+    def get_previous_state(self) -> State | None:
+        if self.revision == AUTO:
+            try:
+                return State(**json.loads(self.snapshot_path.read_text()))
+            except (OSError, ValueError, TypeError):
+                return None
+        texts = [
+            git_show(self.revision, path)
+            for path in (self.pyproject_path, self.pre_commit_path, self.lock_path)
+        ]
+        pyproject, config, lock = texts
+        if pyproject is None or config is None or lock is None:
+            return None
+        return State.from_texts(pyproject=pyproject, config=config, lock=lock)
+
+    def get_changed_packages(self) -> set[str] | None:
+        """Names of the packages that changed, or None to sync everything."""
+        previous = self.get_previous_state()
+        if previous is None:
+            return None
+        return get_changed_packages(previous, self.get_current_state())
+
+    def record(self) -> None:
+        """Store the current state, for the next run to compare against."""
+        project_cache.ensure_cache_dir(self.snapshot_path.parent.parent, SNAPSHOTS_DIR)
+        state = self.get_current_state()
+        project_cache.write_atomic(
+            self.snapshot_path, json.dumps(dataclasses.asdict(state)).encode()
+        )
+
+
+def get_incremental(
+    *,
+    hook: str,
+    revision: str,
+    options: dict[str, Any],
+    pre_commit_path: pathlib.Path,
+    poetry_cwd: pathlib.Path | None = None,
+) -> Incremental | None:
+    """Return the incremental state of a run, or None if there's no project."""
+    try:
+        pyproject_path = toml_reader.locate_pyproject(cwd=poetry_cwd)
+    except toml_reader.UnsupportedFormat:
+        return None
+
+    pre_commit_path = pre_commit_path.resolve()
+    # One snapshot per hook and config file
+    name = hashlib.sha256(f"{hook}\0{pre_commit_path}".encode()).hexdigest()
+    cache_dir = project_cache.get_cache_dir(pyproject_path.parent)
+    return Incremental(
+        pyproject_path=pyproject_path,
+        pre_commit_path=pre_commit_path,
+        snapshot_path=cache_dir / SNAPSHOTS_DIR / f"{name}.json",
+        revision=revision,
+        options=get_options_digest({"hook": hook, **options}),
+    )
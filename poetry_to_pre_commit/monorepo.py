@@ -0,0 +1,200 @@
+"""Sync many pre-commit configs, each with its Poetry project, in parallel.
+
+Each `.pre-commit-config.yaml` is synced with the nearest pyproject.toml in
+its directory or a parent directory. Configs sharing a project are handled
+by the same worker, so that its lock file is only read once.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import dataclasses
+import os
+import pathlib
+import sys
+import traceback
+
+from . import (
+    common,
+    project_cache,
+    runner,
+    sync_all,
+    sync_hooks_additional_dependencies,
+    sync_repos,
+    toml_reader,
+)
+
+PRE_COMMIT_CONFIG_FILE = ".pre-commit-config.yaml"
+# Directories that never contain projects of their own
+IGNORED_DIRECTORIES = {"node_modules", "venv", "__pycache__"}
+
+
+@dataclasses.dataclass
+class ProjectResult:
+    pre_commit_path: pathlib.Path
+    changes: list[common.Change] = dataclasses.field(default_factory=lambda: [])
+    skipped: bool = False
+    error: str | None = None
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            status = f"error: {self.error}"
+        elif self.skipped:
+            status = "unchanged (skipped)"
+        elif self.changes:
+            status = f"{len(self.changes)} change(s)"
+        else:
+            status = "unchanged"
+        return f"{self.pre_commit_path}: {status}"
+
+
+def get_sync_monorepo_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "roots",
+        nargs="*",
+        type=pathlib.Path,
+        help="Directories containing a .pre-commit-config.yaml (default: the "
+        "current directory). With --discover, directories to search.",
+    )
+    parser.add_argument(
+        "--discover",
+        action="store_true",
+        help="Find all the .pre-commit-config.yaml files below the roots.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default: number of CPUs).",
+    )
+    sync_repos.add_sync_repos_arguments(parser)
+    sync_hooks_additional_dependencies.add_sync_hooks_additional_dependencies_arguments(
+        parser
+    )
+    common.add_common_arguments(parser)
+    return parser
+
+
+def discover_configs(root: pathlib.Path) -> list[pathlib.Path]:
+    configs: list[pathlib.Path] = []
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(
+            name
+            for name in subdirectories
+            if not name.startswith(".") and name not in IGNORED_DIRECTORIES
+        )
+        if PRE_COMMIT_CONFIG_FILE in files:
+            configs.append(pathlib.Path(directory) / PRE_COMMIT_CONFIG_FILE)
+    return configs
+
+
+def group_by_project(
+    configs: list[pathlib.Path],
+) -> tuple[dict[pathlib.Path, list[pathlib.Path]], list[ProjectResult]]:
+    """Group configs by the directory of their pyproject.toml."""
+    groups: dict[pathlib.Path, list[pathlib.Path]] = {}
+    errors: list[ProjectResult] = []
+    for config in configs:
+        try:
+            pyproject_path = toml_reader.locate_pyproject(cwd=config.parent)
+        except toml_reader.UnsupportedFormat as e:
+            errors.append(ProjectResult(pre_commit_path=config, error=str(e)))
+            continue
+        groups.setdefault(pyproject_path.parent, []).append(config)
+    return groups, errors
+
+
+def sync_project(
+    args: argparse.Namespace,
+    poetry_cwd: pathlib.Path,
+    configs: list[pathlib.Path],
+) -> list[ProjectResult]:
+    """Sync all the configs using the same project, loading it once."""
+    try:
+        cache = None if args.no_cache else project_cache.get_cache(cwd=poetry_cwd)
+        project = project_cache.load_project(
+            cwd=poetry_cwd, backend=args.backend, cache=cache
+        )
+    except Exception as e:
+        return [
+            ProjectResult(pre_commit_path=config, error=repr(e)) for config in configs
+        ]
+
+    # Each project gets its own requirements files and wheelhouse
+    for option in ("requirements_dir", "wheelhouse"):
+        if getattr(args, option):
+            args = argparse.Namespace(
+                **{**vars(args), option: poetry_cwd / getattr(args, option)}
+            )
+    sync = sync_all.get_sync_function(args, poetry_cwd=poetry_cwd)
+    results: list[ProjectResult] = []
+    for config in configs:
+        try:
+            changes = runner.run(
+                hook="sync-all",
+                args=args,
+                pre_commit_path=config,
+                poetry_cwd=poetry_cwd,
+                sync=sync,
+                project=project,
+                # Only print one line per config
+                quiet=True,
+            )
+        except Exception as e:
+            traceback.print_exc()
+            results.append(ProjectResult(pre_commit_path=config, error=repr(e)))
+            continue
+        results.append(
+            ProjectResult(
+                pre_commit_path=config,
+                changes=changes or [],
+                skipped=changes is None,
+            )
+        )
+    if cache is not None:
+        cache.flush()
+    if args.cache_stats:
+        project_cache.print_stats(cache)
+    return results
+
+
+def sync_monorepo(argv: list[str]) -> int:
+    """Sync all the configs, and return the exit code.
+
+    The exit code is 1 if any config was changed or couldn't be synced.
+    """
+    parser = get_sync_monorepo_parser()
+    args = parser.parse_args(argv)
+
+    roots: list[pathlib.Path] = args.roots or [pathlib.Path.cwd()]
+    if args.discover:
+        configs = [config for root in roots for config in discover_configs(root)]
+    else:
+        configs = [root / PRE_COMMIT_CONFIG_FILE for root in roots]
+    groups, results = group_by_project([config.resolve() for config in configs])
+
+    jobs = min(args.jobs, len(groups))
+    if jobs <= 1:
+        for poetry_cwd, group_configs in groups.items():
+            results.extend(sync_project(args, poetry_cwd, group_configs))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(sync_project, args, poetry_cwd, group_configs)
+                for poetry_cwd, group_configs in groups.items()
+            ]
+            for future in futures:
+                results.extend(future.result())
+
+    results.sort(key=lambda result: result.pre_commit_path)
+    for result in results:
+        print(result)
+    return int(any(result.changes or result.error for result in results))
+
+
+def sync_monorepo_cli() -> None:
+    """Entrypoint when running from the shell."""
+    sys.exit(sync_monorepo(argv=sys.argv[1:]))
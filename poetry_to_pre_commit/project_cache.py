@@ -0,0 +1,296 @@
+"""On-disk cache of the data read from pyproject.toml and poetry.lock.
+
+Most commits don't touch poetry.lock, so instead of parsing it on every run,
+we store what we read in a pickle file keyed by the hash of both files (plus
+the version of this tool and the backend). The cache lives in
+`.cache/poetry-to-pre-commit/` next to pyproject.toml, unless
+`POETRY_TO_PRE_COMMIT_CACHE_DIR` says otherwise.
+
+On a miss, the project is written to the cache at the end of the run, and
+only if the run parsed poetry.lock: runs that only scanned it for a few
+packages stay as fast without the cache.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import hashlib
+import json
+import os
+import pathlib
+import pickle
+
+from . import common, timing, toml_reader
+
+CACHE_DIR_ENV_VAR = "POETRY_TO_PRE_COMMIT_CACHE_DIR"
+CACHE_DIR = pathlib.Path(".cache") / "poetry-to-pre-commit"
+# Bump when the pickled classes (or how they are filled) change
+CACHE_FORMAT = "6"
+MAX_ENTRIES = 16
+MAX_BYTES = 64 * 1024 * 1024
+STATS_FILE = "stats.json"
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions "
+            f"({self.hit_rate:.0%} hit rate)"
+        )
+
+
+@dataclasses.dataclass
+class Cache:
+    directory: pathlib.Path
+    max_entries: int = MAX_ENTRIES
+    max_bytes: int = MAX_BYTES
+    # For the current run
+    stats: CacheStats = dataclasses.field(default_factory=CacheStats)
+    # Projects missing from the cache, written by `flush`
+    pending: dict[str, common.Project] = dataclasses.field(default_factory=lambda: {})
+
+    def _entry_path(self, key: str) -> pathlib.Path:
+        return self.directory / f"{key}.pickle"
+
+    def get(self, key: str) -> toml_reader.TomlProject | None:
+        path = self._entry_path(key)
+        try:
+            data = path.read_bytes()
+            project = pickle.loads(data)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            self.stats.misses += 1
+            return None
+        # Entries are evicted by least recent use
+        with contextlib.suppress(OSError):
+            path.touch()
+        self.stats.hits += 1
+        return project
+
+    def set(self, key: str, project: toml_reader.TomlProject) -> None:
+        ensure_cache_dir(self.directory)
+        write_atomic(self._entry_path(key), pickle.dumps(project))
+        self._evict()
+
+    def flush(self) -> None:
+        """Write the pending projects that were read in full."""
+        for key, project in self.pending.items():
+            project_snapshot = snapshot(project)
+            if project_snapshot is not None:
+                self.set(key, project_snapshot)
+        self.pending.clear()
+
+    def _evict(self) -> None:
+        entries: list[tuple[float, int, pathlib.Path]] = []
+        for path in self.directory.glob("*.pickle"):
+            try:
+                stat = path.stat()
+            except OSError:  # Evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+
+        # Keep the most recently used entries that fit, but always the last one
+        total_bytes = 0
+        for index, (_, size, path) in enumerate(entries):
+            total_bytes += size
+            if index == 0 or (
+                index < self.max_entries and total_bytes <= self.max_bytes
+            ):
+                continue
+            with contextlib.suppress(OSError):
+                path.unlink()
+                self.stats.evictions += 1
+
+    def record_stats(self) -> CacheStats:
+        """Add the stats of this run to the stored totals, and return them."""
+        path = self.directory / STATS_FILE
+        try:
+            total = CacheStats(**json.loads(path.read_text()))
+        except (OSError, ValueError, TypeError):
+            total = CacheStats()
+        total.hits += self.stats.hits
+        total.misses += self.stats.misses
+        total.evictions += self.stats.evictions
+        if self.directory.exists():
+            write_atomic(path, json.dumps(dataclasses.asdict(total)).encode())
+        return total
+
+
+@dataclasses.dataclass
+class ResidentProjects:
+    """Projects kept in memory by a long-lived process (see `server`).
+
+    Entries are keyed by the `stat` of pyproject.toml and the lock files
+    rather than their content, so that a hit costs a few system calls.
+    """
+
+    max_entries: int = MAX_ENTRIES
+    entries: dict[tuple[object, ...], common.Project] = dataclasses.field(
+        default_factory=lambda: {}
+    )
+
+    @staticmethod
+    def get_key(pyproject_path: pathlib.Path, backend: str) -> tuple[object, ...]:
+        key: list[object] = [backend, str(pyproject_path)]
+        lock_paths = [pyproject_path.parent / name for name in toml_reader.LOCK_FILES]
+        for path in (pyproject_path, *lock_paths):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                key.append(None)
+            else:
+                key.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return tuple(key)
+
+    def get(self, key: tuple[object, ...]) -> common.Project | None:
+        project = self.entries.pop(key, None)
+        if project is not None:
+            # Move it to the end, as the most recently used
+            self.entries[key] = project
+        return project
+
+    def set(self, key: tuple[object, ...], project: common.Project) -> None:
+        self.entries[key] = project
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+
+
+# Set by the server, to keep projects in memory between runs
+resident: ResidentProjects | None = None
+
+
+def ensure_cache_dir(cache_dir: pathlib.Path, subdirectory: str = "") -> pathlib.Path:
+    """Create `cache_dir` and its `subdirectory`, and return the latter."""
+    directory = cache_dir / subdirectory
+    # Other processes may be creating it at the same time
+    directory.mkdir(parents=True, exist_ok=True)
+    gitignore = cache_dir / ".gitignore"
+    if not gitignore.exists():
+        # Like pytest's cache: don't let anyone commit this by mistake
+        gitignore.write_text("*\n")
+    return directory
+
+
+def write_atomic(path: pathlib.Path, content: bytes, mode: int | None = None) -> None:
+    """Write to a temporary file renamed to `path`, with `mode` if given."""
+    import tempfile
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+def get_tool_version() -> str:
+    from importlib import metadata
+
+    try:
+        return metadata.version("poetry_to_pre_commit")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def get_cache_key(pyproject_path: pathlib.Path, backend: str) -> str:
+    lock_paths = [pyproject_path.parent / name for name in toml_reader.LOCK_FILES]
+    digest = hashlib.sha256()
+    for part in (CACHE_FORMAT, get_tool_version(), backend):
+        digest.update(part.encode() + b"\0")
+    for path in (pyproject_path, *lock_paths):
+        try:
+            digest.update(b"+" + path.read_bytes())
+        except FileNotFoundError:
+            digest.update(b"-")
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_cache_dir(root: pathlib.Path) -> pathlib.Path:
+    directory = os.environ.get(CACHE_DIR_ENV_VAR)
+    if directory:
+        return pathlib.Path(directory)
+    return root / CACHE_DIR
+
+
+def snapshot(project: common.Project) -> toml_reader.TomlProject | None:
+    """Plain data of `project`, or None if it didn't need to parse its lock."""
+    if isinstance(project, toml_reader.LazyTomlProject) and not project.lock_parsed:
+        return None
+    return toml_reader.TomlProject(
+        packages=list(project.packages),
+        groups={
+            group: project.get_group_dependencies(group)
+            for group in project.group_names
+        },
+        dependency_graph=project.dependency_graph,
+    )
+
+
+def load_project(
+    cwd: pathlib.Path | None = None,
+    backend: str = "auto",
+    cache: Cache | None = None,
+) -> common.Project:
+    """Like `common.get_project`, but read from and populate `cache`.
+
+    Call `cache.flush()` once the project was used, to write it to the cache.
+    """
+    if cache is None:
+        return common.get_project(cwd=cwd, backend=backend)
+
+    try:
+        pyproject_path = toml_reader.locate_pyproject(cwd=cwd)
+    except toml_reader.UnsupportedFormat:
+        # Let the backend produce the appropriate error
+        return common.get_project(cwd=cwd, backend=backend)
+
+    resident_key = None
+    if resident is not None:
+        resident_key = resident.get_key(pyproject_path, backend=backend)
+        resident_project = resident.get(resident_key)
+        if resident_project is not None:
+            return resident_project
+
+    key = get_cache_key(pyproject_path=pyproject_path, backend=backend)
+    with timing.span("read cache"):
+        project = cache.get(key)
+    if project is None:
+        project = common.get_project(cwd=cwd, backend=backend)
+        cache.pending[key] = project
+    if resident is not None and resident_key is not None:
+        resident.set(resident_key, project)
+    return project
+
+
+def get_cache(cwd: pathlib.Path | None = None) -> Cache | None:
+    """Return the cache of the project in `cwd`, if there's a project."""
+    try:
+        root = toml_reader.locate_pyproject(cwd=cwd).parent
+    except toml_reader.UnsupportedFormat:
+        return None
+    return Cache(directory=get_cache_dir(root))
+
+
+def print_stats(cache: Cache | None) -> None:
+    if cache is None:
+        print("poetry-to-pre-commit cache: disabled")
+        return
+    total = cache.record_stats()
+    print(f"poetry-to-pre-commit cache: this run: {cache.stats}; total: {total}")
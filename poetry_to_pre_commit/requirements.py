@@ -0,0 +1,109 @@
+"""Write hash-pinned requirements files for the bound hooks.
+
+For each hook bound to Poetry groups, a `<hook id>.txt` file pins the whole
+dependency closure of these groups at the versions of poetry.lock, with the
+hashes of their files and the environment markers of the packages only some
+platforms need, e.g.:
+
+    attrs==23.2.0 \
+        --hash=sha256:99b8...
+    tzdata==2024.1; sys_platform == "win32" \
+        --hash=sha256:9068...
+
+Installing it with `pip install --require-hashes --no-deps -r <file>` needs
+no dependency resolution and can't install anything else than what was
+locked.
+"""
+
+from __future__ import annotations
+
+import pathlib
+from typing import TYPE_CHECKING, Any, Collection, Iterable
+
+from . import common, project_cache, sync_hooks_additional_dependencies, toml_reader
+
+if TYPE_CHECKING:
+    from .runner import SyncFunction
+
+HEADER = (
+    "# Generated by poetry-to-pre-commit from poetry.lock for the `{hook_id}` "
+    "hook. Do not edit.\n"
+)
+
+
+def parse_lock_hashes(lock: dict[str, Any]) -> dict[str, list[str]]:
+    """Hashes of the files of each package of poetry.lock or uv.lock."""
+    return {
+        name: [file["hash"] for file in files if "hash" in file]
+        for name, files in toml_reader.parse_lock_files(lock).items()
+    }
+
+
+def format_requirements(
+    packages: Iterable[common.PoetryPackage], hashes: dict[str, list[str]]
+) -> str:
+    missing = sorted(p.name for p in packages if not hashes.get(p.name))
+    if missing:
+        raise SystemError(
+            "Cannot write hash-pinned requirements, the lock file has no file "
+            f"hashes for: {', '.join(missing)}."
+        )
+    return "".join(
+        " \\\n    ".join([str(package), *(f"--hash={h}" for h in hashes[package.name])])
+        + "\n"
+        for package in sorted(packages)
+    )
+
+
+def write_hooks_requirements(
+    *,
+    directory: pathlib.Path,
+    project: common.Project,
+    bind: dict[str, set[str]],
+    lock_path: pathlib.Path,
+) -> list[pathlib.Path]:
+    """Write the requirements of each bound hook in `directory`."""
+    deps_by_group = sync_hooks_additional_dependencies.get_deps_by_group(
+        project=project, bind=bind, transitive=True
+    )
+    hashes = parse_lock_hashes(toml_reader.load_toml(lock_path))
+
+    directory.mkdir(parents=True, exist_ok=True)
+    paths: list[pathlib.Path] = []
+    for hook_id, groups in sorted(bind.items()):
+        packages: set[common.PoetryPackage] = set()
+        for group in groups:
+            packages.update(deps_by_group[group])
+        # pip refuses a package listed twice (e.g. by two groups)
+        packages = set(common.merge_packages(packages))
+        path = directory / f"{hook_id}.txt"
+        content = HEADER.format(hook_id=hook_id) + format_requirements(packages, hashes)
+        if not path.exists() or path.read_text() != content:
+            project_cache.write_atomic(path, content.encode())
+        paths.append(path)
+    return paths
+
+
+def with_requirements(
+    sync: SyncFunction,
+    *,
+    directory: pathlib.Path,
+    bind: dict[str, set[str]],
+    poetry_cwd: pathlib.Path | None,
+) -> SyncFunction:
+    """Wrap `sync` so that it also writes the requirements of the bound hooks."""
+    lock_path = toml_reader.locate_lock(toml_reader.locate_pyproject(cwd=poetry_cwd))
+
+    def sync_and_write(
+        config: dict[str, Any],
+        project: common.Project,
+        *,
+        changed: Collection[str] | None = None,
+    ) -> list[common.Change]:
+        changes = list(sync(config, project, changed=changed))
+        write_hooks_requirements(
+            directory=directory, project=project, bind=bind, lock_path=lock_path
+        )
+        return changes
+
+    return sync_and_write
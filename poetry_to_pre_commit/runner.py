@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import pathlib
+from typing import Any, Collection, Iterable, Protocol
+
+from . import common, fingerprint, project_cache, timing
+
+
+class SyncFunction(Protocol):
+    def __call__(
+        self,
+        config: dict[str, Any],
+        project: common.Project,
+        *,
+        changed: Collection[str] | None = None,
+    ) -> Iterable[common.Change]:
+        """Apply a sync to the pre-commit config, and return the changes made.
+
+        With `changed`, only the repos and hooks of these packages are synced.
+        """
+        ...
+
+
+def run(
+    *,
+    hook: str,
+    args: argparse.Namespace,
+    pre_commit_path: pathlib.Path,
+    poetry_cwd: pathlib.Path | None,
+    sync: SyncFunction,
+    project: common.Project | None = None,
+    quiet: bool = False,
+) -> list[common.Change] | None:
+    """Run a sync, with the options common to all hooks.
+
+    The project is loaded once (unless it's provided) and the config is read
+    and written at most once, however many transformations `sync` applies.
+    Unless `quiet`, the pre-commit environments invalidated by the changes
+    are printed.
+
+    Returns:
+        The changes made to the config, or None if the run was skipped
+        because its inputs didn't change.
+    """
+    with timing.instrument(
+        timings=args.timings, trace=args.trace, profile=args.profile
+    ):
+        return _run(
+            hook=hook,
+            args=args,
+            pre_commit_path=pre_commit_path,
+            poetry_cwd=poetry_cwd,
+            sync=sync,
+            project=project,
+            quiet=quiet,
+        )
+
+
+def _run(
+    *,
+    hook: str,
+    args: argparse.Namespace,
+    pre_commit_path: pathlib.Path,
+    poetry_cwd: pathlib.Path | None,
+    sync: SyncFunction,
+    project: common.Project | None,
+    quiet: bool,
+) -> list[common.Change] | None:
+    with timing.span("check fingerprint"):
+        run_fingerprint = (
+            fingerprint.get_fingerprint(
+                hook=hook,
+                options=common.get_fingerprint_options(args),
+                pre_commit_path=pre_commit_path,
+                poetry_cwd=poetry_cwd,
+            )
+            if args.skip_unchanged
+            else None
+        )
+        if run_fingerprint and run_fingerprint.matches():
+            return None
+
+    # The cache of a project passed by the caller is the caller's to report
+    loads_project = project is None
+    cache = None
+    if project is None:
+        with timing.span("load project"):
+            cache = None if args.no_cache else project_cache.get_cache(cwd=poetry_cwd)
+            project = project_cache.load_project(
+                cwd=poetry_cwd, backend=args.backend, cache=cache
+            )
+
+    incremental = None
+    if args.incremental:
+        from . import incremental as incremental_module
+
+        with timing.span("compare lock"):
+            incremental = incremental_module.get_incremental(
+                hook=hook,
+                revision=args.incremental,
+                options=common.get_fingerprint_options(args),
+                pre_commit_path=pre_commit_path,
+                poetry_cwd=poetry_cwd,
+            )
+            changed = incremental.get_changed_packages() if incremental else None
+        if changed is not None:
+            sync = functools.partial(sync, changed=changed)
+
+    if args.check:
+        changes = check(
+            pre_commit_path=pre_commit_path, sync=sync, project=project, diff=args.diff
+        )
+    else:
+        config = write(pre_commit_path=pre_commit_path, sync=sync, project=project)
+        changes = config.changes
+        if changes:
+            report_environments(
+                args=args,
+                config=config.data,
+                changes=changes,
+                pre_commit_path=pre_commit_path,
+                poetry_cwd=poetry_cwd,
+                quiet=quiet,
+            )
+
+    # A failed check must run again next time
+    if run_fingerprint and not (args.check and changes):
+        run_fingerprint.record()
+    if incremental and not args.check:
+        incremental.record()
+    if cache is not None:
+        with timing.span("write cache"):
+            cache.flush()
+    if args.cache_stats and loads_project:
+        project_cache.print_stats(cache)
+    return changes
+
+
+def write(
+    *,
+    pre_commit_path: pathlib.Path,
+    sync: SyncFunction,
+    project: common.Project,
+) -> common.PreCommitConfig:
+    """Apply `sync` to the config, and write it back if it changed.
+
+    When a C loader is available, the config is read with it to find the
+    changes. Only if there are any, it is loaded again with the round-trip
+    loader, to write them while keeping comments and formatting. Otherwise,
+    it is only loaded with the round-trip loader.
+
+    The config is locked throughout, so that the changes found are still the
+    ones to make when writing.
+
+    Returns:
+        The synced config, as plain data.
+    """
+    if not common.has_fast_loader():
+        with common.pre_commit_config_roundtrip(pre_commit_path) as config:
+            with timing.span("sync"):
+                config.changes.extend(sync(config.data, project))
+        return config
+
+    with common.lock_config(pre_commit_path):
+        with timing.span("load config"):
+            config = common.PreCommitConfig(
+                data=common.load_config_fast(pre_commit_path)
+            )
+        with timing.span("sync"):
+            config.changes.extend(sync(config.data, project))
+        if not config.changes:
+            return config
+
+        with common.pre_commit_config_roundtrip(pre_commit_path) as roundtrip:
+            common.apply_changes(roundtrip.data, config.changes)
+            roundtrip.changes.extend(config.changes)
+    return config
+
+
+def report_environments(
+    *,
+    args: argparse.Namespace,
+    config: dict[str, Any],
+    changes: list[common.Change],
+    pre_commit_path: pathlib.Path,
+    poetry_cwd: pathlib.Path | None,
+    quiet: bool,
+) -> None:
+    """Print the pre-commit environments to rebuild, and install them if asked."""
+    from . import environments
+
+    if not quiet:
+        environments.print_environments(
+            environments.get_invalidated_environments(config, changes)
+        )
+    if args.install_hooks:
+        with timing.span("install hooks"):
+            environments.install(
+                config=config,
+                changes=changes,
+                pre_commit_path=pre_commit_path,
+                poetry_cwd=poetry_cwd,
+                mode=args.install_hooks,
+            )
+
+
+def check(
+    *,
+    pre_commit_path: pathlib.Path,
+    sync: SyncFunction,
+    project: common.Project,
+    diff: bool,
+) -> list[common.Change]:
+    """Print what `sync` would change in the config, without writing it.
+
+    The config is read with the fastest loader available. It is only loaded
+    again with the round-trip loader if a diff of a modified config is asked.
+    """
+    with timing.span("load config"):
+        data = common.load_config_fast(pre_commit_path)
+    with timing.span("sync"):
+        changes = list(sync(data, project))
+    if not changes:
+        return changes
+
+    if not diff:
+        print(f"{pre_commit_path} is out of sync:")
+        for change in changes:
+            print(f"  {change}".replace("\n", "\n  "))
+        return changes
+
+    import difflib
+
+    with common.pre_commit_config_roundtrip(pre_commit_path, dry_run=True) as config:
+        common.apply_changes(config.data, changes)
+        config.changes.extend(changes)
+    old_text = pre_commit_path.read_text()
+    print(
+        "".join(
+            difflib.unified_diff(
+                old_text.splitlines(keepends=True),
+                (config.new_text or old_text).splitlines(keepends=True),
+                fromfile=str(pre_commit_path),
+                tofile=str(pre_commit_path),
+            )
+        ),
+        end="",
+    )
+    return changes
+
+
+def exit_if_out_of_sync(
+    args: argparse.Namespace, changes: list[common.Change] | None
+) -> None:
+    if args.check and changes:
+        raise SystemExit(1)
@@ -0,0 +1,281 @@
+"""Resident server, to avoid paying for the startup of each hook run.
+
+Most of the time of a hook run goes to starting the interpreter, importing
+the libraries and loading the project. `poetry-to-pre-commit-server` starts a
+long-lived process that keeps the libraries imported and the projects it
+loaded in memory (until their pyproject.toml or poetry.lock change). The
+hooks forward their runs to it through a UNIX socket, and run in-process as
+usual when no server is listening, or when it runs another version of the
+tool (e.g. the one of another `rev` in the pre-commit config).
+
+Runs are handled one at a time, in the directory of the client, with the
+environment of the server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import pathlib
+import socket
+import stat
+import sys
+import tempfile
+import traceback
+from typing import Any, Callable
+
+SOCKET_ENV_VAR = "POETRY_TO_PRE_COMMIT_SOCKET"
+# Stop after this long without a request, in seconds
+IDLE_TIMEOUT = 3600.0
+
+
+def get_socket_path() -> pathlib.Path:
+    path = os.environ.get(SOCKET_ENV_VAR)
+    if path:
+        return pathlib.Path(path)
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return pathlib.Path(runtime_dir) / "poetry-to-pre-commit.sock"
+    user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    directory = pathlib.Path(tempfile.gettempdir()) / f"poetry-to-pre-commit-{user}"
+    return directory / "server.sock"
+
+
+def _is_owned(stat_result: os.stat_result) -> bool:
+    return not hasattr(os, "getuid") or stat_result.st_uid == os.getuid()
+
+
+def is_safe_directory(path: pathlib.Path) -> bool:
+    """Whether only the current user can replace the files of `path`.
+
+    That's the case of a directory the user owns and nobody else may write
+    to, or of a sticky one like /tmp, where only owners remove their files.
+    """
+    try:
+        stat_result = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(stat_result.st_mode):
+        return False
+    if stat_result.st_mode & stat.S_ISVTX:
+        return True
+    return _is_owned(stat_result) and not stat_result.st_mode & 0o022
+
+
+def is_safe_socket(path: pathlib.Path) -> bool:
+    """Whether `path` is a socket of the current user, in a safe directory."""
+    try:
+        stat_result = os.lstat(path)
+    except OSError:
+        return False
+    return (
+        stat.S_ISSOCK(stat_result.st_mode)
+        and _is_owned(stat_result)
+        and is_safe_directory(path.parent)
+    )
+
+
+def _request(path: pathlib.Path, request: dict[str, Any]) -> dict[str, Any] | None:
+    """Send a request to the server and return its response, if it answers.
+
+    Sockets that another user could have created are ignored, so that the
+    runs and their output can't be hijacked.
+    """
+    if not hasattr(socket, "AF_UNIX") or not is_safe_socket(path):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(path))
+            client.sendall(json.dumps(request).encode())
+            client.shutdown(socket.SHUT_WR)
+            response = _read_all(client)
+        except OSError:
+            return None
+    # Empty if the server stopped before answering
+    return json.loads(response) if response else None
+
+
+def _read_all(connection: socket.socket) -> bytes:
+    chunks: list[bytes] = []
+    while chunk := connection.recv(65536):
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def forward(hook: str, argv: list[str]) -> int | None:
+    """Run a hook on the server, if one is running.
+
+    Returns:
+        The exit status of the run, or None if there's no server to run it.
+    """
+    from .project_cache import get_tool_version
+
+    response = _request(
+        get_socket_path(),
+        {
+            "hook": hook,
+            "argv": argv,
+            "cwd": os.getcwd(),
+            "version": get_tool_version(),
+        },
+    )
+    # Not run by the server, e.g. as it runs another version
+    if response is None or "status" not in response:
+        return None
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["status"]
+
+
+def get_hooks() -> dict[str, Callable[..., None]]:
+    from . import sync_all, sync_hooks_additional_dependencies, sync_repos
+
+    return {
+        "sync-repos": sync_repos.sync_repos,
+        "sync-hooks-additional-dependencies": (
+            sync_hooks_additional_dependencies.sync_hooks_additional_dependencies
+        ),
+        "sync-all": sync_all.sync_all,
+    }
+
+
+def get_exit_status(exc: SystemExit) -> int:
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def handle(
+    request: dict[str, Any], hooks: dict[str, Callable[..., None]]
+) -> dict[str, Any]:
+    """Run the hook of `request` as if it was run by the client."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    status = 0
+    initial_cwd = os.getcwd()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            os.chdir(request["cwd"])
+            hooks[request["hook"]](argv=request["argv"])
+        except SystemExit as exc:
+            status = get_exit_status(exc)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            os.chdir(initial_cwd)
+    return {"status": status, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def serve(path: pathlib.Path, idle_timeout: float | None = IDLE_TIMEOUT) -> None:
+    """Handle the requests sent to `path` until asked to stop or idle."""
+    from . import project_cache
+
+    if _request(path, {"command": "ping"}) is not None:
+        raise SystemExit(f"A server is already listening on {path}.")
+    # The default directory is private to the user
+    with contextlib.suppress(FileExistsError):
+        path.parent.mkdir(mode=0o700)
+    if not is_safe_directory(path.parent):
+        raise SystemExit(
+            f"Other users could replace the socket in {path.parent}, "
+            "use another --socket."
+        )
+    with contextlib.suppress(FileNotFoundError):
+        path.unlink()
+
+    # Everything a run needs (but Poetry, which is only imported if used)
+    hooks = get_hooks()
+    version = project_cache.get_tool_version()
+    project_cache.resident = project_cache.ResidentProjects()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        # Only the current user may connect
+        umask = os.umask(0o177)
+        try:
+            listener.bind(str(path))
+        finally:
+            os.umask(umask)
+        try:
+            listener.listen()
+            listener.settimeout(idle_timeout)
+            while True:
+                try:
+                    connection, _ = listener.accept()
+                except socket.timeout:
+                    break
+                with connection:
+                    connection.settimeout(None)
+                    try:
+                        request = json.loads(_read_all(connection))
+                    except ValueError:
+                        continue
+                    command = request.get("command", "run")
+                    if command != "run":
+                        response = {"status": 0, "stdout": "", "stderr": ""}
+                    elif (
+                        request.get("version") == version
+                        and request.get("hook") in hooks
+                    ):
+                        response = handle(request, hooks)
+                    else:
+                        # The client runs it in-process
+                        response = {}
+                    connection.sendall(json.dumps(response).encode())
+                    if command == "stop":
+                        break
+        finally:
+            project_cache.resident = None
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+
+
+def get_server_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Keep a process warm to run the hooks faster."
+    )
+    parser.add_argument(
+        "--socket",
+        type=pathlib.Path,
+        default=None,
+        help=f"Path of the UNIX socket (default: ${SOCKET_ENV_VAR}, or a file "
+        "in $XDG_RUNTIME_DIR or in a private directory of the temporary "
+        "directory). The hooks use the same default.",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=IDLE_TIMEOUT,
+        help="Stop after this many seconds without a request "
+        f"(default: {IDLE_TIMEOUT:.0f}, 0 to never stop).",
+    )
+    parser.add_argument(
+        "--stop", action="store_true", help="Stop the running server and exit."
+    )
+    return parser
+
+
+def server(argv: list[str]) -> int:
+    parser = get_server_parser()
+    args = parser.parse_args(argv)
+    path = args.socket or get_socket_path()
+
+    if args.stop:
+        if _request(path, {"command": "stop"}) is None:
+            print(f"No server listening on {path}.")
+            return 1
+        return 0
+
+    print(f"Listening on {path}", flush=True)
+    serve(path, idle_timeout=args.idle_timeout or None)
+    return 0
+
+
+def server_cli() -> None:
+    """Entrypoint when running from the shell."""
+    sys.exit(server(argv=sys.argv[1:]))
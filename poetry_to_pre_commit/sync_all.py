@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import pathlib
+import sys
+from typing import TYPE_CHECKING, Any, Collection, Iterable
+
+from . import common, runner, server, sync_hooks_additional_dependencies, sync_repos
+
+if TYPE_CHECKING:
+    from .runner import SyncFunction
+
+PRE_COMMIT_CONFIG_FILE = pathlib.Path(".pre-commit-config.yaml")
+
+
+def get_sync_all_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filenames", nargs="*")
+    sync_repos.add_sync_repos_arguments(parser)
+    sync_hooks_additional_dependencies.add_sync_hooks_additional_dependencies_arguments(
+        parser
+    )
+    common.add_common_arguments(parser)
+    return parser
+
+
+def sync_all_with_project(
+    config: dict[str, Any],
+    project: common.Project,
+    *,
+    map: dict[str, str],
+    skip: list[str],
+    bind: dict[str, set[str]],
+    no_new_deps: bool = False,
+    transitive: bool = False,
+    prune_markers: bool = False,
+    marker_env: dict[str, dict[str, str]] | None = None,
+    pip_options: Iterable[str] = (),
+    changed: Collection[str] | None = None,
+) -> list[common.Change]:
+    return [
+        *sync_repos.sync_repos_with_project(
+            config, project, map=map, skip=skip, changed=changed
+        ),
+        *sync_hooks_additional_dependencies.sync_hooks_with_project(
+            config,
+            project,
+            bind=bind,
+            no_new_deps=no_new_deps,
+            transitive=transitive,
+            prune_markers=prune_markers,
+            marker_env=marker_env,
+            pip_options=pip_options,
+            changed=changed,
+        ),
+    ]
+
+
+def get_sync_function(
+    args: argparse.Namespace, poetry_cwd: pathlib.Path | None
+) -> SyncFunction:
+    bind = sync_hooks_additional_dependencies.combine_bind_values(args.bind)
+    sync: SyncFunction = functools.partial(
+        sync_all_with_project,
+        map=dict(args.map),
+        skip=args.skip,
+        bind=bind,
+        no_new_deps=args.no_new_deps,
+        transitive=args.transitive,
+        prune_markers=args.prune_markers,
+        marker_env=sync_hooks_additional_dependencies.combine_marker_env_values(
+            args.marker_env
+        ),
+        pip_options=sync_hooks_additional_dependencies.get_pip_options(args),
+    )
+    return sync_hooks_additional_dependencies.with_exports(
+        sync, args, bind=bind, poetry_cwd=poetry_cwd
+    )
+
+
+def sync_all(
+    argv: list[str],
+    pre_commit_path: pathlib.Path = PRE_COMMIT_CONFIG_FILE,
+    poetry_cwd: pathlib.Path | None = None,
+    quiet: bool = False,
+) -> None:
+    """Run both sync-repos and sync-hooks-additional-dependencies in one pass."""
+    parser = get_sync_all_parser()
+    args = parser.parse_args(argv)
+
+    changes = runner.run(
+        hook="sync-all",
+        args=args,
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+        sync=get_sync_function(args, poetry_cwd=poetry_cwd),
+        quiet=quiet,
+    )
+    runner.exit_if_out_of_sync(args, changes)
+
+
+def sync_all_cli() -> None:
+    """Entrypoint when running from the shell."""
+    status = server.forward("sync-all", sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
+    sync_all(argv=sys.argv[1:])
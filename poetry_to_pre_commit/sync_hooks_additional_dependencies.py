@@ -1,17 +1,21 @@
 from __future__ import annotations
 
 import argparse
+import collections
+import dataclasses
+import functools
 import pathlib
 import sys
-from typing import Any, Iterable
+from typing import TYPE_CHECKING, Any, Collection, Iterable, cast
 
-from packaging.requirements import Requirement
-from poetry import factory
-from poetry.core.packages.dependency_group import MAIN_GROUP
+from . import common, runner, server
 
-from . import common
+if TYPE_CHECKING:
+    from .runner import SyncFunction
 
 PRE_COMMIT_CONFIG_FILE = pathlib.Path(".pre-commit-config.yaml")
+# Parsed requirements and markers kept in memory, for the resident server
+PARSE_CACHE_SIZE = 4096
 
 
 def format_bind(value: str) -> tuple[str, set[str]]:
@@ -24,6 +28,26 @@ def format_bind(value: str) -> tuple[str, set[str]]:
     return key, set(value.split(","))
 
 
+def format_marker_env(value: str) -> tuple[str, tuple[str, str]]:
+    try:
+        hook_id, name, marker_value = value.split("=", 2)
+    except ValueError:
+        raise ValueError(
+            f"Invalid marker environment value: {value}. Expected format: "
+            "pre_commit_hook_id=marker_name=value."
+        )
+    return hook_id, (name, marker_value)
+
+
+def combine_marker_env_values(
+    marker_env: list[tuple[str, tuple[str, str]]],
+) -> dict[str, dict[str, str]]:
+    result: dict[str, dict[str, str]] = {}
+    for hook_id, (name, value) in marker_env:
+        result.setdefault(hook_id, {})[name] = value
+    return result
+
+
 def combine_bind_values(bind: list[tuple[str, set[str]]]) -> dict[str, set[str]]:
     result: dict[str, set[str]] = {}
     for key, value in bind:
@@ -31,9 +55,9 @@ def combine_bind_values(bind: list[tuple[str, set[str]]]) -> dict[str, set[str]]
     return result
 
 
-def get_sync_hooks_additional_dependencies_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("filenames", nargs="*")
+def add_sync_hooks_additional_dependencies_arguments(
+    parser: argparse.ArgumentParser,
+) -> None:
     parser.add_argument(
         "--bind",
         type=format_bind,
@@ -41,51 +65,314 @@ def get_sync_hooks_additional_dependencies_parser() -> argparse.ArgumentParser:
         default=[],
         help="Bind pre-commit hook ids to poetry group names (e.g. mypy=types). "
         "To add the main package dependencies, use the poetry group name "
-        f"`{MAIN_GROUP}`. You can bind multiple poetry groups to a single hook "
+        f"`{common.MAIN_GROUP}`. You can bind multiple poetry groups to a single hook "
         "id by either using multiple flags, or by providing a comma-separated "
         "list of poetry group names (e.g. "
-        f"`--bind mypy={MAIN_GROUP} --bind mypy:types` or "
-        f"`--bind mypy={MAIN_GROUP},types`).",
+        f"`--bind mypy={common.MAIN_GROUP} --bind mypy:types` or "
+        f"`--bind mypy={common.MAIN_GROUP},types`).",
     )
     parser.add_argument(
         "--no-new-deps",
         action="store_true",
         help="Update or remove dependencies, but don't add any new one.",
     )
+    parser.add_argument(
+        "--transitive",
+        action="store_true",
+        help="Also pin the dependencies of the dependencies of the bound groups "
+        "(and so on), as locked in poetry.lock.",
+    )
+    parser.add_argument(
+        "--prune-markers",
+        action="store_true",
+        help="Leave out the dependencies whose environment markers don't apply "
+        "to the running interpreter (e.g. Windows-only packages, or backports "
+        "for older Python versions).",
+    )
+    parser.add_argument(
+        "--marker-env",
+        type=format_marker_env,
+        action="append",
+        default=[],
+        metavar="HOOK=NAME=VALUE",
+        help="Evaluate the environment markers of the dependencies of a hook "
+        "with this value rather than the running interpreter's (e.g. "
+        "`mypy=python_version=3.12`), and prune them as with --prune-markers. "
+        "Can be repeated.",
+    )
+    parser.add_argument(
+        "--wheelhouse",
+        type=pathlib.Path,
+        metavar="DIR",
+        help="Copy the wheels of the dependency closure of the bound groups from "
+        "Poetry's artifact cache to DIR (checking them against poetry.lock's "
+        "hashes), and make the bound hooks install from there with pip's "
+        "--find-links. Only the wheels it copied are ever removed from DIR.",
+    )
+    parser.add_argument(
+        "--wheelhouse-url",
+        metavar="URL",
+        help="With --wheelhouse, the location given to --find-links in the "
+        "config, if the absolute path of DIR differs between machines.",
+    )
+    parser.add_argument(
+        "--requirements-dir",
+        type=pathlib.Path,
+        metavar="DIR",
+        help="Also write, for each bound hook, a DIR/<hook id>.txt requirements "
+        "file pinning the full dependency closure with the file hashes from "
+        "poetry.lock.",
+    )
+
+
+def get_sync_hooks_additional_dependencies_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filenames", nargs="*")
+    add_sync_hooks_additional_dependencies_arguments(parser)
+    common.add_common_arguments(parser)
     return parser
 
 
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_marker(markers: str) -> Any:
+    from packaging.markers import InvalidMarker, Marker
+
+    try:
+        return Marker(markers)
+    except InvalidMarker:
+        return None
+
+
+def applies(markers: str, environment: dict[str, str] | None) -> bool:
+    """Whether a dependency with these markers applies to `environment`.
+
+    Without an environment, or when the markers can't be parsed, dependencies
+    always apply.
+    """
+    if environment is None or not markers:
+        return True
+    marker = _parse_marker(markers)
+    return marker is None or marker.evaluate(environment)
+
+
+def get_environments(
+    bind: dict[str, set[str]],
+    *,
+    prune_markers: bool,
+    marker_env: dict[str, dict[str, str]],
+) -> dict[str, dict[str, str]]:
+    """The marker environment of each bound hook whose dependencies are pruned."""
+    hook_ids = set(bind) if prune_markers else set(bind) & set(marker_env)
+    if not hook_ids:
+        return {}
+
+    from packaging.markers import default_environment
+
+    default = cast("dict[str, str]", default_environment())
+    return {hook_id: {**default, **marker_env.get(hook_id, {})} for hook_id in hook_ids}
+
+
+def get_closure(
+    graph: dict[str, common.PackageDependencies],
+    roots: Iterable[common.Dependency],
+    environment: dict[str, str] | None = None,
+) -> dict[str, set[str]]:
+    """Find all the packages needed by `roots`, with the extras they need.
+
+    Each package is expanded once, and then once more for each extra that
+    is requested later on, so this is linear in the size of the graph.
+    With an `environment`, dependencies whose markers don't apply to it are
+    left out, otherwise every dependency is considered.
+    """
+    extras_by_name: dict[str, set[str]] = {}
+    queue = collections.deque((root.name, root.extras) for root in roots)
+    while queue:
+        name, extras = queue.popleft()
+        package = graph.get(name, common.PackageDependencies())
+        known_extras = extras_by_name.get(name)
+        if known_extras is None:
+            known_extras = extras_by_name[name] = set()
+            queue.extend(
+                (dep.name, dep.extras)
+                for dep in package.required
+                if applies(dep.markers, environment)
+            )
+        new_extras = extras - known_extras
+        known_extras.update(new_extras)
+        for extra in new_extras:
+            queue.extend(
+                (dep.name, dep.extras) for dep in package.extras.get(extra, ())
+            )
+    return extras_by_name
+
+
+# Past this many alternative paths to a package, it's considered always needed
+MAX_MARKER_CLAUSES = 16
+
+
+def get_closure_markers(
+    graph: dict[str, common.PackageDependencies],
+    roots: Iterable[common.Dependency],
+    extras_by_name: dict[str, set[str]],
+) -> dict[str, str]:
+    """Find the markers under which each package of a closure is needed.
+
+    A package is needed when all the markers along a path from a root apply,
+    for any of the paths leading to it. These are kept as sets of markers (one
+    per path) until they're formatted, dropping the paths that are implied by
+    shorter ones.
+    """
+    conditions: dict[str, set[frozenset[str]]] = {}
+    queue: collections.deque[str] = collections.deque()
+
+    def add(name: str, clauses: Iterable[frozenset[str]]) -> None:
+        known = conditions.setdefault(name, set())
+        new = {c for c in clauses if not any(k <= c for k in known)}
+        if not new:
+            return
+        known.difference_update({k for k in known if any(c <= k for c in new)})
+        known.update(new)
+        if len(known) > MAX_MARKER_CLAUSES:
+            known.clear()
+            known.add(frozenset())
+        queue.append(name)
+
+    for root in roots:
+        add(root.name, [frozenset([root.markers] if root.markers else [])])
+    while queue:
+        name = queue.popleft()
+        clauses = list(conditions[name])
+        package = graph.get(name, common.PackageDependencies())
+        edges = [
+            *package.required,
+            *(
+                dep
+                for extra in extras_by_name.get(name, ())
+                for dep in package.extras.get(extra, ())
+            ),
+        ]
+        for dep in edges:
+            if dep.name not in extras_by_name:
+                continue
+            add(
+                dep.name,
+                [
+                    clause | {dep.markers} if dep.markers else clause
+                    for clause in clauses
+                ],
+            )
+
+    def format_clause(clause: frozenset[str]) -> str:
+        if len(clause) == 1:
+            return next(iter(clause))
+        return " and ".join(f"({marker})" for marker in sorted(clause))
+
+    return {
+        name: common.normalize_markers(
+            common.merge_markers(sorted(format_clause(c) for c in clauses))
+        )
+        for name, clauses in conditions.items()
+    }
+
+
 def get_poetry_deps(
-    *, cwd: pathlib.Path | None = None, group: str
+    *,
+    cwd: pathlib.Path | None = None,
+    group: str,
+    project: common.Project | None = None,
+    transitive: bool = False,
+    environment: dict[str, str] | None = None,
 ) -> Iterable[common.PoetryPackage]:
-    package_by_name = {p.name: p for p in common.get_poetry_packages(cwd=cwd)}
-    main_package = factory.Factory().create_poetry(cwd=cwd).package
+    if project is None:
+        project = common.get_project(cwd=cwd)
+
     try:
-        dep_group = main_package.dependency_group(group)
+        dependencies = project.get_group_dependencies(group)
     except ValueError:
         raise SystemError(f"Group not found in pyproject.toml: {group}.")
+    dependencies = [dep for dep in dependencies if applies(dep.markers, environment)]
+
+    graph = project.dependency_graph if transitive else {}
+    if transitive:
+        extras_by_name = get_closure(graph, dependencies, environment=environment)
+    else:
+        extras_by_name = {dep.name: set(dep.extras) for dep in dependencies}
+    # Markers are only written with --transitive, and not when they were
+    # already evaluated against an environment
+    markers_by_name = (
+        get_closure_markers(graph, dependencies, extras_by_name)
+        if transitive and environment is None
+        else {}
+    )
+    package_by_name = {p.name: p for p in project.find_packages(extras_by_name)}
 
-    for dep in dep_group.dependencies:
-        try:
-            package = package_by_name[dep.name]
-        except KeyError as e:
+    for dep in dependencies:
+        if dep.name not in package_by_name:
             raise SystemError(
                 f"Package not found in poetry.lock: {dep.name}. "
                 "Is your poetry.lock up-to-date?"
-            ) from e
-        yield common.PoetryPackage(
-            name=dep.name, version=package.version, extras=dep.extras
-        )
+            )
+    for name, extras in extras_by_name.items():
+        # Dependencies of other platforms or Python versions may not be locked
+        if name in package_by_name:
+            yield common.PoetryPackage(
+                name=name,
+                version=package_by_name[name].version,
+                extras=frozenset(extras),
+                markers=markers_by_name.get(name, ""),
+            )
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_requirement(requirement: str) -> Any:
+    from packaging.requirements import Requirement
+
+    return Requirement(requirement)
+
+
+def combine_markers(package_markers: str, requirement_markers: str) -> str:
+    """Markers of both, without repeating those one already contains."""
+    if not package_markers or not requirement_markers:
+        return package_markers or requirement_markers
+    package_conjuncts = set(common.split_markers(package_markers))
+    requirement_conjuncts = set(common.split_markers(requirement_markers))
+    if package_conjuncts <= requirement_conjuncts:
+        return requirement_markers
+    if requirement_conjuncts <= package_conjuncts:
+        return package_markers
+    # As it's written when the requirement is parsed again
+    return common.normalize_markers(f"({package_markers}) and ({requirement_markers})")
 
 
 def update_or_remove_additional_deps(
     poetry_deps: set[common.PoetryPackage], hook_additional_deps: list[str]
-) -> set[common.PoetryPackage]:
+) -> list[str]:
+    """Requirements of the packages of `poetry_deps` already in the hook.
+
+    The extras and markers of the existing entries are kept.
+    """
     # Additional packages that are already in pre-commit configuration could be listed with
     # any format that is accepted by pip - use `Requirement` to parse them properly.
-    current_deps = [Requirement(dep).name for dep in hook_additional_deps]
+    current_deps: dict[str, Any] = {}
+    for dep in hook_additional_deps:
+        # pip options, e.g. --find-links
+        if dep.startswith("-"):
+            continue
+        requirement = _parse_requirement(dep)
+        current_deps[common.canonicalize_name(requirement.name)] = requirement
 
-    return {package for package in poetry_deps if package.name in current_deps}
+    requirements: list[str] = []
+    for package in poetry_deps:
+        requirement = current_deps.get(package.name)
+        if requirement is None:
+            continue
+        package = dataclasses.replace(
+            package,
+            extras=package.extras | frozenset(requirement.extras),
+            markers=combine_markers(package.markers, str(requirement.marker or "")),
+        )
+        requirements.append(str(package))
+    return requirements
 
 
 def _sync_hooks_additional_dependencies(
@@ -94,7 +381,10 @@ def _sync_hooks_additional_dependencies(
     deps_by_group: dict[str, set[common.PoetryPackage]],
     bind: dict[str, set[str]],
     no_new_deps: bool = False,
-) -> None:
+    changed: Collection[str] | None = None,
+    deps_by_hook: dict[str, set[common.PoetryPackage]] | None = None,
+    pip_options: Iterable[str] = (),
+) -> list[common.AdditionalDependenciesChange]:
     """Sync additional dependencies from `deps_by_group` to `config`.
 
     Args:
@@ -103,9 +393,19 @@ def _sync_hooks_additional_dependencies(
         bind: poetry dependency groups to consider for each pre-commit hook
         no_new_deps: Update or remove existing dependencies from the "additional_dependencies"
             section of pre-commit config, but do not add new dependencies from poetry.
+        changed: If set, only sync the hooks depending on these packages (in
+            poetry or in their current "additional_dependencies").
+        deps_by_hook: packages of the hooks that don't use `deps_by_group`
+            (e.g. because they're pruned by environment markers)
+        pip_options: options for pip to put before the packages of each
+            bound hook (e.g. `--find-links=...`)
+
+    Returns:
+        The changes made to `config`.
     """
-    for repo in config.get("repos", []):
-        for hook in repo.get("hooks", []):
+    changes: list[common.AdditionalDependenciesChange] = []
+    for repo_index, repo in enumerate(config.get("repos", [])):
+        for hook_index, hook in enumerate(repo.get("hooks", [])):
             hook_id = hook["id"]
             try:
                 groups = bind[hook_id]
@@ -113,47 +413,208 @@ def _sync_hooks_additional_dependencies(
                 continue
             deps: set[common.PoetryPackage] = set()
 
-            for group in groups:
-                deps.update(deps_by_group.get(group, set()))
+            if deps_by_hook is not None and hook_id in deps_by_hook:
+                deps.update(deps_by_hook[hook_id])
+            else:
+                for group in groups:
+                    deps.update(deps_by_group.get(group, set()))
+            deps = set(common.merge_packages(deps))
+            if changed is not None and not is_affected(
+                deps=deps,
+                hook_additional_deps=hook.get("additional_dependencies"),
+                changed=changed,
+            ):
+                continue
 
-            packages = (
+            requirements = (
                 update_or_remove_additional_deps(
                     poetry_deps=deps,
                     hook_additional_deps=hook["additional_dependencies"],
                 )
                 if no_new_deps
-                else deps
+                else [str(package) for package in deps]
+            )
+            new = [*pip_options, *sorted(requirements)]
+            old = hook.get("additional_dependencies")
+            if old is not None and list(old) == new:
+                continue
+
+            hook["additional_dependencies"] = new
+            changes.append(
+                common.AdditionalDependenciesChange(
+                    repo_index=repo_index,
+                    hook_index=hook_index,
+                    hook_id=hook_id,
+                    old=None if old is None else tuple(old),
+                    new=tuple(new),
+                )
             )
-            hook["additional_dependencies"] = sorted(
-                str(package) for package in packages
+    return changes
+
+
+def is_affected(
+    *,
+    deps: set[common.PoetryPackage],
+    hook_additional_deps: list[str] | None,
+    changed: Collection[str],
+) -> bool:
+    names = {package.name for package in deps}
+    names.update(common.requirement_name(dep) for dep in hook_additional_deps or [])
+    return not names.isdisjoint(changed)
+
+
+def get_deps_by_group(
+    project: common.Project, bind: dict[str, set[str]], transitive: bool = False
+) -> dict[str, set[common.PoetryPackage]]:
+    """Packages of each bound group, computed once per group."""
+    deps_by_group: dict[str, set[common.PoetryPackage]] = {}
+    for groups in bind.values():
+        for group in groups - deps_by_group.keys():
+            deps_by_group[group] = set(
+                get_poetry_deps(project=project, group=group, transitive=transitive)
             )
+    return deps_by_group
+
+
+def get_deps_by_hook(
+    project: common.Project,
+    bind: dict[str, set[str]],
+    environments: dict[str, dict[str, str]],
+    transitive: bool = False,
+) -> dict[str, set[common.PoetryPackage]]:
+    """Packages of each hook of `environments`, pruned by environment markers.
+
+    Packages are computed once per group and environment.
+    """
+    deps_by_key: dict[
+        tuple[str, tuple[tuple[str, str], ...]], set[common.PoetryPackage]
+    ] = {}
+    deps_by_hook: dict[str, set[common.PoetryPackage]] = {}
+    for hook_id, environment in environments.items():
+        environment_key = tuple(sorted(environment.items()))
+        deps: set[common.PoetryPackage] = set()
+        for group in bind[hook_id]:
+            key = (group, environment_key)
+            if key not in deps_by_key:
+                deps_by_key[key] = set(
+                    get_poetry_deps(
+                        project=project,
+                        group=group,
+                        transitive=transitive,
+                        environment=environment,
+                    )
+                )
+            deps.update(deps_by_key[key])
+        deps_by_hook[hook_id] = deps
+    return deps_by_hook
+
+
+def get_pip_options(args: argparse.Namespace) -> list[str]:
+    if not args.wheelhouse:
+        return []
+    return [
+        f"--find-links={args.wheelhouse_url or args.wheelhouse.resolve()}",
+    ]
+
+
+def sync_hooks_with_project(
+    config: dict[str, Any],
+    project: common.Project,
+    *,
+    bind: dict[str, set[str]],
+    no_new_deps: bool = False,
+    transitive: bool = False,
+    prune_markers: bool = False,
+    marker_env: dict[str, dict[str, str]] | None = None,
+    pip_options: Iterable[str] = (),
+    changed: Collection[str] | None = None,
+) -> list[common.AdditionalDependenciesChange]:
+    environments = get_environments(
+        bind, prune_markers=prune_markers, marker_env=marker_env or {}
+    )
+    return _sync_hooks_additional_dependencies(
+        config=config,
+        bind=bind,
+        deps_by_group=get_deps_by_group(
+            project=project,
+            bind={
+                hook_id: groups
+                for hook_id, groups in bind.items()
+                if hook_id not in environments
+            },
+            transitive=transitive,
+        ),
+        no_new_deps=no_new_deps,
+        changed=changed,
+        deps_by_hook=get_deps_by_hook(
+            project=project,
+            bind=bind,
+            environments=environments,
+            transitive=transitive,
+        ),
+        pip_options=pip_options,
+    )
+
+
+def with_exports(
+    sync: SyncFunction,
+    args: argparse.Namespace,
+    *,
+    bind: dict[str, set[str]],
+    poetry_cwd: pathlib.Path | None,
+) -> SyncFunction:
+    """Wrap `sync` to also write the requirements files and wheelhouse asked for."""
+    if args.requirements_dir and not args.check:
+        from . import requirements
+
+        sync = requirements.with_requirements(
+            sync, directory=args.requirements_dir, bind=bind, poetry_cwd=poetry_cwd
+        )
+    if args.wheelhouse and not args.check:
+        from . import wheelhouse
+
+        sync = wheelhouse.with_wheelhouse(
+            sync, directory=args.wheelhouse, bind=bind, poetry_cwd=poetry_cwd
+        )
+    return sync
 
 
 def sync_hooks_additional_dependencies(
     argv: list[str],
     pre_commit_path: pathlib.Path = PRE_COMMIT_CONFIG_FILE,
     poetry_cwd: pathlib.Path | None = None,
+    quiet: bool = False,
 ) -> None:
     """Sync additional dependencies with the packages versions from poetry lock file."""
     parser = get_sync_hooks_additional_dependencies_parser()
     args = parser.parse_args(argv)
 
     bind = combine_bind_values(args.bind)
-    deps_by_group: dict[str, set[common.PoetryPackage]] = {}
-
-    for groups in bind.values():
-        for group in groups:
-            deps_by_group[group] = set(get_poetry_deps(cwd=poetry_cwd, group=group))
+    sync: SyncFunction = functools.partial(
+        sync_hooks_with_project,
+        bind=bind,
+        no_new_deps=args.no_new_deps,
+        transitive=args.transitive,
+        prune_markers=args.prune_markers,
+        marker_env=combine_marker_env_values(args.marker_env),
+        pip_options=get_pip_options(args),
+    )
+    sync = with_exports(sync, args, bind=bind, poetry_cwd=poetry_cwd)
 
-    with common.pre_commit_config_roundtrip(pre_commit_path) as config:
-        _sync_hooks_additional_dependencies(
-            config=config,
-            bind=bind,
-            deps_by_group=deps_by_group,
-            no_new_deps=args.no_new_deps,
-        )
+    changes = runner.run(
+        hook="sync-hooks-additional-dependencies",
+        args=args,
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+        sync=sync,
+        quiet=quiet,
+    )
+    runner.exit_if_out_of_sync(args, changes)
 
 
 def sync_hooks_additional_dependencies_cli() -> None:
     """Entrypoint when running from the shell."""
+    status = server.forward("sync-hooks-additional-dependencies", sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
     sync_hooks_additional_dependencies(argv=sys.argv[1:])
@@ -2,11 +2,12 @@ from __future__ import annotations
 
 import argparse
 import dataclasses
+import functools
 import pathlib
 import sys
-from typing import Any, Iterable
+from typing import Any, Collection, Iterable
 
-from . import common
+from . import common, runner, server
 
 PRE_COMMIT_CONFIG_FILE = pathlib.Path(".pre-commit-config.yaml")
 
@@ -17,9 +18,7 @@ class PreCommitRepo:
     pre_commit_rev: str
 
 
-def get_sync_repos_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("filenames", nargs="*")
+def add_sync_repos_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "--skip",
         action="append",
@@ -36,6 +35,13 @@ def get_sync_repos_parser() -> argparse.ArgumentParser:
         "is a mirror, the prefix 'mirrors-' is assumed, you don't need to explicit it. "
         "Flag can be repeated multiple times.",
     )
+
+
+def get_sync_repos_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filenames", nargs="*")
+    add_sync_repos_arguments(parser)
+    common.add_common_arguments(parser)
     return parser
 
 
@@ -78,53 +84,81 @@ def extract_pypi_names(
 def sync_repos_in_precommit_config(
     repo_packages: Iterable[tuple[PreCommitRepo, common.PoetryPackage]],
     config: dict[str, Any],
-) -> None:
+) -> list[common.RevChange]:
     version_by_repo = {repo.repo: package.version for repo, package in repo_packages}
-    for repo in config.get("repos", []):
+    changes: list[common.RevChange] = []
+    for index, repo in enumerate(config.get("repos", [])):
         try:
             new_version = version_by_repo[repo["repo"]]
         except KeyError:
             continue
 
-        rev = repo.get("rev", "")
-        if rev.startswith("v"):
+        rev = repo.get("rev")
+        if (rev or "").startswith("v"):
             new_version = f"v{new_version}"
 
-        repo["rev"] = new_version
+        if rev != new_version:
+            repo["rev"] = new_version
+            changes.append(
+                common.RevChange(
+                    repo_index=index,
+                    repo=repo["repo"],
+                    old_rev=rev,
+                    new_rev=new_version,
+                )
+            )
+    return changes
+
+
+def sync_repos_with_project(
+    config: dict[str, Any],
+    project: common.Project,
+    *,
+    map: dict[str, str],
+    skip: list[str],
+    changed: Collection[str] | None = None,
+) -> list[common.RevChange]:
+    precommit_repos = get_pre_commit_repos(config=config)
+    precommit_repos_with_names = {
+        name: repo
+        for name, repo in extract_pypi_names(repos=precommit_repos, map=map, skip=skip)
+        if changed is None or common.canonicalize_name(name) in changed
+    }
+    poetry_packages = project.find_packages(set(precommit_repos_with_names))
+
+    return sync_repos_in_precommit_config(
+        repo_packages=[
+            (precommit_repos_with_names[package.name], package)
+            for package in poetry_packages
+        ],
+        config=config,
+    )
 
 
 def sync_repos(
     argv: list[str],
     pre_commit_path: pathlib.Path = PRE_COMMIT_CONFIG_FILE,
     poetry_cwd: pathlib.Path | None = None,
+    quiet: bool = False,
 ) -> None:
     parser = get_sync_repos_parser()
     args = parser.parse_args(argv)
 
-    with common.pre_commit_config_roundtrip(pre_commit_path) as config:
-        precommit_repos = get_pre_commit_repos(config=config)
-        precommit_repos_with_names = dict(
-            extract_pypi_names(
-                repos=precommit_repos,
-                map=dict(args.map),
-                skip=args.skip,
-            )
-        )
-        package_names_from_repos = set(precommit_repos_with_names)
-        poetry_packages = (
-            package
-            for package in common.get_poetry_packages(cwd=poetry_cwd)
-            if package.name in package_names_from_repos
-        )
-
-        sync_repos_in_precommit_config(
-            repo_packages=[
-                (precommit_repos_with_names[package.name], package)
-                for package in poetry_packages
-            ],
-            config=config,
-        )
+    changes = runner.run(
+        hook="sync-repos",
+        args=args,
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+        sync=functools.partial(
+            sync_repos_with_project, map=dict(args.map), skip=args.skip
+        ),
+        quiet=quiet,
+    )
+    runner.exit_if_out_of_sync(args, changes)
 
 
 def sync_repos_cli() -> None:
+    status = server.forward("sync-repos", sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
     sync_repos(argv=sys.argv[1:])
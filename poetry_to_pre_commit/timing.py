@@ -0,0 +1,159 @@
+"""Time the phases of a run (imports, project loading, config read/write...).
+
+Phases are wrapped in `span(name)`. When nobody listens, this costs next to
+nothing. To forward the spans elsewhere (e.g. to your telemetry), register a
+listener, called with each `Span` once it ends:
+
+    from poetry_to_pre_commit import timing
+
+    with timing.listening(lambda span: print(span.name, span.duration)):
+        sync_repos.sync_repos(argv=[...])
+
+Spans are recorded per process and are not thread-safe.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import pathlib
+import time
+from typing import Any, Callable, Generator
+
+Listener = Callable[["Span"], None]
+
+_listeners: list[Listener] = []
+_depth = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class Span:
+    name: str
+    # time.perf_counter() values, in seconds
+    start: float
+    duration: float
+    # Number of enclosing spans
+    depth: int
+
+
+@contextlib.contextmanager
+def span(name: str) -> Generator[None, None, None]:
+    global _depth
+
+    if not _listeners:
+        yield
+        return
+
+    start = time.perf_counter()
+    depth = _depth
+    _depth += 1
+    try:
+        yield
+    finally:
+        _depth = depth
+        ended = Span(
+            name=name,
+            start=start,
+            duration=time.perf_counter() - start,
+            depth=depth,
+        )
+        for listener in _listeners:
+            listener(ended)
+
+
+def add_listener(listener: Listener) -> None:
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Listener) -> None:
+    _listeners.remove(listener)
+
+
+@contextlib.contextmanager
+def listening(listener: Listener) -> Generator[None, None, None]:
+    add_listener(listener)
+    try:
+        yield
+    finally:
+        remove_listener(listener)
+
+
+@dataclasses.dataclass
+class Recorder:
+    """Listener keeping all the spans, to report them at the end of a run."""
+
+    spans: list[Span] = dataclasses.field(default_factory=lambda: [])
+
+    def __call__(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def format(self) -> str:
+        lines = ["poetry-to-pre-commit timings:"]
+        for span in sorted(self.spans, key=lambda s: (s.start, s.depth)):
+            indent = "  " * (span.depth + 1)
+            lines.append(f"{indent}{span.name}: {span.duration * 1000:.1f} ms")
+        return "\n".join(lines)
+
+    def to_trace(self) -> dict[str, Any]:
+        """Spans in the Trace Event Format (chrome://tracing, Perfetto...)."""
+        origin = min((span.start for span in self.spans), default=0.0)
+        return {
+            "traceEvents": [
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": round((span.start - origin) * 1e6),
+                    "dur": round(span.duration * 1e6),
+                    "pid": 0,
+                    "tid": 0,
+                }
+                for span in sorted(self.spans, key=lambda s: s.start)
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+
+@contextlib.contextmanager
+def instrument(
+    *,
+    timings: bool = False,
+    trace: pathlib.Path | None = None,
+    profile: pathlib.Path | None = None,
+) -> Generator[None, None, None]:
+    """Report the spans of the enclosed code, as asked on the command line.
+
+    Args:
+        timings: print a per-phase breakdown
+        trace: write the spans to this file, as a JSON trace
+        profile: profile the code with cProfile and write the stats (to be
+            read with `pstats`) to this file
+    """
+    if not (timings or trace or profile):
+        yield
+        return
+
+    recorder = Recorder()
+    profiler = None
+    if profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+
+    with listening(recorder):
+        if profiler:
+            profiler.enable()
+        try:
+            with span("total"):
+                yield
+        finally:
+            if profiler:
+                profiler.disable()
+
+    if profiler and profile:
+        profiler.dump_stats(profile)
+    if trace:
+        import json
+
+        trace.write_text(json.dumps(recorder.to_trace(), indent=2) + "\n")
+    if timings:
+        print(recorder.format())
@@ -0,0 +1,502 @@
+"""Read pyproject.toml and poetry.lock without importing Poetry.
+
+Poetry is a large application, and importing it dominates the runtime of the
+hooks. We only need package names, versions, extras and groups, which are easy
+to read from the TOML files directly. Anything this module doesn't understand
+raises `UnsupportedFormat`, so that the caller can fall back to the Poetry
+library.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import functools
+import pathlib
+import re
+import sys
+from typing import Any, Collection, cast
+
+from . import common, timing
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:  # pragma: no cover
+    # Always installed on these versions, as a dependency of Poetry
+    import tomli as tomllib
+
+SUPPORTED_LOCK_VERSIONS = ("1", "2")
+# Lock files a project may have, by order of precedence
+LOCK_FILES = ("poetry.lock", "uv.lock")
+
+# In poetry.lock, each package starts with its name and version
+_LOCK_PACKAGE_RE = re.compile(r"^\[\[package\]\]\n", re.MULTILINE)
+_LOCK_NAME_VERSION_RE = re.compile(r'name = "([^"\\\n]*)"\nversion = "([^"\\\n]*)"\n')
+_LOCK_NAME_RE = re.compile(r'\[\[package\]\]\nname = "([^"\\\n]*)"\n')
+# Entries of [package.extras], e.g. "coverage[toml] (>=5.3)"
+_EXTRA_REQUIREMENT_RE = re.compile(
+    r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[([^\]]*)\])?"
+)
+_LOCK_VERSION_RE = re.compile(r'^lock-version = "([^"\\\n]*)"$', re.MULTILINE)
+# A part of a `python` constraint of pyproject.toml, e.g. `>= 3.9` or `3.12.*`
+_PYTHON_CONSTRAINT_RE = re.compile(
+    r"\s*(\^|~=|~|<=|>=|==|!=|<|>)?\s*(\d+(?:\.\d+)*)(\.\*)?\s*$"
+)
+# Parts of a `python` constraint are separated by commas or spaces
+_PYTHON_CONSTRAINT_SEPARATOR_RE = re.compile(r"\s*,\s*|(?<=[\d*])\s+")
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def load_toml(path: pathlib.Path) -> dict[str, Any]:
+    return loads_toml(path.read_text(encoding="utf-8"), source=path)
+
+
+def loads_toml(text: str, source: pathlib.Path | None) -> dict[str, Any]:
+    try:
+        return tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        raise UnsupportedFormat(f"{source}: {e}") from e
+
+
+def locate_pyproject(cwd: pathlib.Path | None = None) -> pathlib.Path:
+    """Find pyproject.toml in `cwd` or its parents, like Poetry does."""
+    cwd = (cwd or pathlib.Path.cwd()).resolve()
+    for directory in [cwd, *cwd.parents]:
+        candidate = directory / "pyproject.toml"
+        if candidate.is_file():
+            return candidate
+    raise UnsupportedFormat(f"No pyproject.toml found in {cwd} or its parents.")
+
+
+def locate_lock(pyproject_path: pathlib.Path) -> pathlib.Path:
+    """The lock file of the project, poetry.lock if there is none yet."""
+    for name in LOCK_FILES:
+        candidate = pyproject_path.parent / name
+        if candidate.is_file():
+            return candidate
+    return pyproject_path.parent / LOCK_FILES[0]
+
+
+def check_lock_version(lock_version: str) -> None:
+    if lock_version.split(".")[0] not in SUPPORTED_LOCK_VERSIONS:
+        raise UnsupportedFormat(f"Unsupported poetry.lock version: {lock_version!r}")
+
+
+def parse_lock(lock: dict[str, Any]) -> list[common.PoetryPackage]:
+    check_lock_version(str(lock.get("metadata", {}).get("lock-version", "")))
+
+    try:
+        return [
+            common.PoetryPackage(
+                name=common.canonicalize_name(package["name"]),
+                version=str(package["version"]),
+            )
+            for package in lock.get("package", [])
+        ]
+    except (KeyError, TypeError) as e:
+        raise UnsupportedFormat(f"Malformed package in poetry.lock: {e}") from e
+
+
+def parse_locked_dependency(
+    name: str, spec: Any
+) -> tuple[common.LockedDependency, bool]:
+    """Parse an entry of [package.dependencies], and tell if it's optional."""
+    specs = cast("list[Any]", spec if isinstance(spec, list) else [spec])
+    constraints: list[common.LockedDependency] = []
+    optional = True
+    for item in specs:
+        if isinstance(item, str):
+            item = {}
+        elif not isinstance(item, dict):
+            raise UnsupportedFormat(f"Unsupported dependency in poetry.lock: {name}")
+        item = cast("dict[str, Any]", item)
+        optional = optional and bool(item.get("optional", False))
+        constraints.append(
+            common.LockedDependency(
+                name=common.canonicalize_name(name),
+                extras=frozenset(
+                    common.canonicalize_name(extra) for extra in item.get("extras", [])
+                ),
+                markers=common.normalize_markers(str(item.get("markers", ""))),
+            )
+        )
+    (dependency,) = common.merge_locked_dependencies(constraints)
+    return dependency, optional
+
+
+def parse_extra_requirement(requirement: str) -> common.LockedDependency:
+    match = _EXTRA_REQUIREMENT_RE.match(requirement)
+    if match is None:
+        raise UnsupportedFormat(f"Unsupported extra in poetry.lock: {requirement}")
+    name, extras = match.groups()
+    return common.LockedDependency(
+        name=common.canonicalize_name(name),
+        extras=frozenset(
+            common.canonicalize_name(extra.strip())
+            for extra in (extras or "").split(",")
+            if extra.strip()
+        ),
+    )
+
+
+def parse_lock_dependencies(
+    lock: dict[str, Any],
+) -> dict[str, common.PackageDependencies]:
+    graph: dict[str, common.PackageDependencies] = {}
+    try:
+        for package in lock.get("package", []):
+            required: list[common.LockedDependency] = []
+            for name, spec in package.get("dependencies", {}).items():
+                dependency, optional = parse_locked_dependency(name, spec)
+                if not optional:
+                    required.append(dependency)
+            graph[common.canonicalize_name(package["name"])] = (
+                common.PackageDependencies(
+                    required=tuple(required),
+                    extras={
+                        common.canonicalize_name(extra): tuple(
+                            parse_extra_requirement(r) for r in requirements
+                        )
+                        for extra, requirements in package.get("extras", {}).items()
+                    },
+                )
+            )
+    except (KeyError, TypeError, AttributeError) as e:
+        raise UnsupportedFormat(f"Malformed package in poetry.lock: {e}") from e
+    return graph
+
+
+def parse_lock_files(lock: dict[str, Any]) -> dict[str, list[dict[str, Any]]]:
+    """Files of each (canonical) package name of poetry.lock or uv.lock.
+
+    The entries are as in the lock: with a `file` name and a `hash` in
+    poetry.lock, and with a `url` or `path` and usually a `hash` in uv.lock.
+    """
+    files_by_name: dict[str, list[dict[str, Any]]] = {}
+    # Lock files before version 2 list the files in [metadata.files]
+    for name, files in lock.get("metadata", {}).get("files", {}).items():
+        files_by_name[common.canonicalize_name(name)] = list(files)
+    for package in lock.get("package", []):
+        name = common.canonicalize_name(package["name"])
+        if "files" in package:
+            files_by_name[name] = list(package["files"])
+        # uv.lock lists the source distribution and the wheels separately
+        elif "sdist" in package or "wheels" in package:
+            files = [package["sdist"]] if "sdist" in package else []
+            files_by_name[name] = [*files, *package.get("wheels", [])]
+    return files_by_name
+
+
+def read_lock_version(text: str) -> str:
+    """Find the lock version in the [metadata] table, at the end of poetry.lock."""
+    match = _LOCK_VERSION_RE.search(text, max(text.rfind("\n[metadata]\n"), 0))
+    return match.group(1) if match else ""
+
+
+def scan_lock(text: str, names: Collection[str]) -> list[common.PoetryPackage]:
+    """Find the packages with these (canonical) names in poetry.lock.
+
+    Rather than parsing the whole TOML document, with the dependencies and
+    file hashes of every package, this jumps from one `[[package]]` header to
+    the next, reads the name and version that follow, and stops as soon as
+    all the names were found.
+    """
+    missing = set(names)
+    packages: list[common.PoetryPackage] = []
+    match = _LOCK_PACKAGE_RE.search(text) if missing else None
+    while match:
+        package = _LOCK_NAME_VERSION_RE.match(text, match.end())
+        if package is None:
+            raise UnsupportedFormat("Unexpected package entry in poetry.lock")
+        name = common.canonicalize_name(package.group(1))
+        if name in missing:
+            missing.remove(name)
+            packages.append(common.PoetryPackage(name=name, version=package.group(2)))
+            if not missing:
+                break
+        match = _LOCK_PACKAGE_RE.search(text, package.end())
+    return packages
+
+
+def digest_lock_packages(text: str) -> dict[str, str]:
+    """Digest of the entries of each (canonical) package name in poetry.lock.
+
+    Like `scan_lock`, this only looks for the `[[package]]` headers. An entry
+    goes from its header to the next one, or to the [metadata] table. uv.lock
+    uses the same layout, without the [metadata] table.
+    """
+    import hashlib
+
+    digests: dict[str, Any] = {}
+    end = text.rfind("\n[metadata]\n")
+    if end == -1:
+        end = len(text)
+    starts = [match.start() for match in _LOCK_PACKAGE_RE.finditer(text, 0, end)]
+    for start, next_start in zip(starts, [*starts[1:], end]):
+        entry = text[start:next_start]
+        package = _LOCK_NAME_RE.match(entry)
+        if package is None:
+            raise UnsupportedFormat("Unexpected package entry in poetry.lock")
+        name = common.canonicalize_name(package.group(1))
+        # A package may be locked at several versions (e.g. per Python version)
+        digests.setdefault(name, hashlib.sha256()).update(entry.encode())
+    return {name: digest.hexdigest() for name, digest in digests.items()}
+
+
+def _bump(version: list[int], index: int) -> list[int]:
+    return [*version[:index], version[index] + 1] + [0] * (len(version) - index - 1)
+
+
+def _python_constraint_bounds(part: str) -> list[tuple[str, list[int]]] | None:
+    """The comparisons that a part of a `python` constraint stands for."""
+    match = _PYTHON_CONSTRAINT_RE.match(part)
+    if match is None or (match.group(3) and match.group(1) not in (None, "==")):
+        return None
+    operator, version = match.group(1), [int(n) for n in match.group(2).split(".")]
+    if match.group(3):
+        return [(">=", version), ("<", _bump(version, len(version) - 1))]
+    if operator == "^":
+        first_non_zero = next((i for i, n in enumerate(version) if n), len(version) - 1)
+        return [(">=", version), ("<", _bump(version, first_non_zero))]
+    if operator == "~":
+        return [(">=", version), ("<", _bump(version, min(len(version) - 1, 1)))]
+    if operator == "~=":
+        return [(">=", version), ("<", _bump(version, max(len(version) - 2, 0)))]
+    return [(operator or "==", version)]
+
+
+def python_constraint_to_markers(constraint: str) -> str:
+    """Markers for a `python` constraint of pyproject.toml (e.g. `^3.9`).
+
+    They're written the way Poetry writes them: `python_version` when it's
+    enough to compare the minor versions, `python_full_version` otherwise.
+    Unions (`||`) and excluded wildcards (`!=3.9.*`) are not supported.
+    """
+    constraint = constraint.strip()
+    if constraint in ("", "*"):
+        return ""
+    bounds: list[tuple[str, list[int]]] = []
+    for part in _PYTHON_CONSTRAINT_SEPARATOR_RE.split(constraint):
+        part_bounds = _python_constraint_bounds(part)
+        if part_bounds is None:
+            raise UnsupportedFormat(f"Unsupported python constraint: {constraint}")
+        bounds.extend(part_bounds)
+    # A range of a single minor version, e.g. `~3.9`
+    for index, (operator, version) in enumerate(bounds):
+        upper = ("<", _bump(version, 1)) if len(version) == 2 else None
+        if operator == ">=" and upper in bounds:
+            bounds.remove(upper)
+            bounds[index] = ("==", version)
+            break
+
+    markers: list[str] = []
+    for operator, version in bounds:
+        if operator in (">=", "<", "==") and len(version) <= 2:
+            variable = "python_version"
+        else:
+            variable = "python_full_version"
+            version = version + [0] * (3 - len(version))
+        markers.append(f'{variable} {operator} "{".".join(map(str, version))}"')
+    return " and ".join(markers)
+
+
+def get_dependency_markers(item: dict[str, Any]) -> str:
+    """Markers of a dependency table, from its `markers`, `python` and `platform`.
+
+    Their clauses are in the order Poetry gives them.
+    """
+    python = (
+        python_constraint_to_markers(str(item["python"])) if "python" in item else ""
+    )
+    platform = f'sys_platform == "{item["platform"]}"' if "platform" in item else ""
+    clauses: list[str] = []
+    for markers in (str(item.get("markers", "")), python, platform):
+        new = [c for c in common.split_markers(markers) if c not in clauses]
+        # Poetry puts a single clause after the ones of a range
+        if len(clauses) == 1 and len(new) > 1:
+            clauses = [*new, *clauses]
+        else:
+            clauses.extend(new)
+    return common.normalize_markers(" and ".join(f"({c})" for c in clauses))
+
+
+def parse_dependency(name: str, spec: Any) -> common.Dependency:
+    # A dependency is either a version string, a table, or a list of tables
+    # (multiple constraints, e.g. per python version).
+    specs = cast("list[Any]", spec if isinstance(spec, list) else [spec])
+    extras: set[str] = set()
+    markers: list[str] = []
+    for item in specs:
+        if isinstance(item, dict):
+            item = cast("dict[str, Any]", item)
+            extras.update(
+                common.canonicalize_name(extra) for extra in item.get("extras", [])
+            )
+            markers.append(get_dependency_markers(item))
+        elif isinstance(item, str):
+            markers.append("")
+        else:
+            raise UnsupportedFormat(f"Unsupported dependency specification: {name}")
+    return common.Dependency(
+        name=common.canonicalize_name(name),
+        extras=frozenset(extras),
+        markers=common.normalize_markers(common.merge_markers(markers)),
+    )
+
+
+def parse_groups(pyproject: dict[str, Any]) -> dict[str, list[common.Dependency]]:
+    if "dependency-groups" in pyproject:
+        raise UnsupportedFormat("PEP 735 [dependency-groups] are not supported.")
+
+    poetry = pyproject.get("tool", {}).get("poetry")
+    if poetry is None:
+        raise UnsupportedFormat("No [tool.poetry] section in pyproject.toml.")
+
+    project_dependencies = pyproject.get("project", {}).get("dependencies")
+    if project_dependencies is not None:
+        # PEP 621 dependencies take precedence over [tool.poetry.dependencies]
+        # since Poetry 2, and we would need to merge them the way Poetry does.
+        raise UnsupportedFormat("PEP 621 [project.dependencies] are not supported.")
+
+    groups: dict[str, list[common.Dependency]] = {
+        common.MAIN_GROUP: [
+            parse_dependency(name, spec)
+            for name, spec in poetry.get("dependencies", {}).items()
+            if name != "python"
+        ]
+    }
+    # Legacy dev dependencies are part of the "dev" group
+    dev_dependencies = poetry.get("dev-dependencies", {})
+    if dev_dependencies:
+        groups["dev"] = [
+            parse_dependency(name, spec) for name, spec in dev_dependencies.items()
+        ]
+
+    # Poetry keys the groups by their canonical name too
+    for group_name, group in poetry.get("group", {}).items():
+        if "include-groups" in group:
+            raise UnsupportedFormat(f"Group {group_name} includes other groups.")
+        groups.setdefault(common.canonicalize_name(group_name), []).extend(
+            parse_dependency(name, spec)
+            for name, spec in group.get("dependencies", {}).items()
+        )
+    return groups
+
+
+class _GroupsMixin:
+    groups: dict[str, list[common.Dependency]]
+
+    @property
+    def group_names(self) -> list[str]:
+        return sorted(self.groups)
+
+    def get_group_dependencies(self, group: str) -> list[common.Dependency]:
+        """Dependencies of a group, e.g. `Type_Stubs` for `type-stubs`."""
+        try:
+            return self.groups[common.canonicalize_name(group)]
+        except KeyError:
+            raise ValueError(f"Group {group} not found.")
+
+
+@dataclasses.dataclass
+class TomlProject(_GroupsMixin):
+    """Project data held in memory.
+
+    Being plain data, this is also what the cache stores, whichever backend
+    the data was read with.
+    """
+
+    packages: list[common.PoetryPackage]
+    groups: dict[str, list[common.Dependency]]
+    dependency_graph: dict[str, common.PackageDependencies] = dataclasses.field(
+        default_factory=lambda: {}
+    )
+
+    @classmethod
+    def load(cls, cwd: pathlib.Path | None = None) -> TomlProject:
+        pyproject_path = locate_pyproject(cwd=cwd)
+        lock_path = pyproject_path.parent / "poetry.lock"
+        return cls.from_data(
+            pyproject=load_toml(pyproject_path),
+            lock=load_toml(lock_path) if lock_path.exists() else None,
+        )
+
+    @classmethod
+    def from_data(
+        cls, pyproject: dict[str, Any], lock: dict[str, Any] | None = None
+    ) -> TomlProject:
+        """Build a project from already parsed pyproject.toml and poetry.lock."""
+        return cls(
+            packages=parse_lock(lock) if lock is not None else [],
+            groups=parse_groups(pyproject),
+            dependency_graph=parse_lock_dependencies(lock) if lock is not None else {},
+        )
+
+    def find_packages(self, names: Collection[str]) -> list[common.PoetryPackage]:
+        return [package for package in self.packages if package.name in names]
+
+
+@dataclasses.dataclass
+class LazyTomlProject(_GroupsMixin):
+    """Project read from the files, parsing poetry.lock only when needed.
+
+    Looking up a few packages with `find_packages` only scans the lock file
+    for them (see `scan_lock`). The whole file is parsed the first time all
+    the `packages` are needed.
+    """
+
+    groups: dict[str, list[common.Dependency]]
+    lock_text: str | None = dataclasses.field(repr=False)
+    lock_path: pathlib.Path | None = None
+
+    @classmethod
+    def load(cls, cwd: pathlib.Path | None = None) -> LazyTomlProject:
+        pyproject_path = locate_pyproject(cwd=cwd)
+        groups = parse_groups(load_toml(pyproject_path))
+
+        lock_path = pyproject_path.parent / "poetry.lock"
+        if not lock_path.exists():
+            return cls(groups=groups, lock_text=None)
+        lock_text = lock_path.read_text(encoding="utf-8")
+        check_lock_version(read_lock_version(lock_text))
+        return cls(groups=groups, lock_text=lock_text, lock_path=lock_path)
+
+    @functools.cached_property
+    def lock(self) -> dict[str, Any] | None:
+        if self.lock_text is None:
+            return None
+        with timing.span("parse poetry.lock"):
+            return loads_toml(self.lock_text, source=self.lock_path)
+
+    @functools.cached_property
+    def locked_packages(self) -> list[common.PoetryPackage]:
+        return parse_lock(self.lock) if self.lock is not None else []
+
+    @functools.cached_property
+    def locked_dependency_graph(self) -> dict[str, common.PackageDependencies]:
+        return parse_lock_dependencies(self.lock) if self.lock is not None else {}
+
+    @property
+    def lock_parsed(self) -> bool:
+        return "lock" in self.__dict__
+
+    @property
+    def packages(self) -> list[common.PoetryPackage]:
+        return self.locked_packages
+
+    @property
+    def dependency_graph(self) -> dict[str, common.PackageDependencies]:
+        return self.locked_dependency_graph
+
+    def find_packages(self, names: Collection[str]) -> list[common.PoetryPackage]:
+        if self.lock_text is None:
+            return []
+        if not self.lock_parsed:
+            try:
+                with timing.span("scan poetry.lock"):
+                    return scan_lock(self.lock_text, names)
+            except UnsupportedFormat:
+                pass
+        return [package for package in self.packages if package.name in names]
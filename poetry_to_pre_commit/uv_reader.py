@@ -0,0 +1,180 @@
+"""Read pyproject.toml and uv.lock, for projects managed with uv.
+
+The groups are the PEP 621 `[project.dependencies]` (as the `main` group),
+the PEP 735 `[dependency-groups]`, and uv's legacy `[tool.uv]
+dev-dependencies` (as part of the `dev` group). Packages, their versions and
+dependencies are read from uv.lock. Like `toml_reader`, this doesn't import
+Poetry, and raises `UnsupportedFormat` for anything it doesn't understand.
+"""
+
+from __future__ import annotations
+
+import pathlib
+import re
+from typing import Any, cast
+
+from . import common, timing, toml_reader
+
+LOCK_FILE = "uv.lock"
+SUPPORTED_LOCK_VERSIONS = (1,)
+
+# A PEP 508 requirement, e.g. `psycopg[pool]>=3; python_version < "3.13"`
+_REQUIREMENT_RE = re.compile(
+    r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[([^\]]*)\])?[^;]*(?:;(.*))?$"
+)
+
+
+def is_uv_project(cwd: pathlib.Path | None = None) -> bool:
+    """Whether the lock file of the project is uv.lock."""
+    try:
+        pyproject_path = toml_reader.locate_pyproject(cwd=cwd)
+    except toml_reader.UnsupportedFormat:
+        return False
+    return toml_reader.locate_lock(pyproject_path).name == LOCK_FILE
+
+
+def parse_requirement(requirement: str) -> common.Dependency:
+    match = _REQUIREMENT_RE.match(requirement)
+    if match is None:
+        raise toml_reader.UnsupportedFormat(f"Unsupported requirement: {requirement}")
+    name, extras, markers = match.groups()
+    return common.Dependency(
+        name=common.canonicalize_name(name),
+        extras=frozenset(
+            common.canonicalize_name(extra.strip())
+            for extra in (extras or "").split(",")
+            if extra.strip()
+        ),
+        markers=common.normalize_markers((markers or "").strip()),
+    )
+
+
+def parse_dependency_groups(
+    dependency_groups: dict[str, list[Any]],
+) -> dict[str, list[common.Dependency]]:
+    """Resolve the PEP 735 groups, including the groups they include.
+
+    Groups are keyed by their canonical name, merging those with the same one.
+    """
+    items_by_name: dict[str, list[Any]] = {}
+    for name, items in dependency_groups.items():
+        items_by_name.setdefault(common.canonicalize_name(name), []).extend(items)
+    resolved: dict[str, list[common.Dependency]] = {}
+
+    def resolve(name: str, parents: tuple[str, ...]) -> list[common.Dependency]:
+        if name in parents:
+            raise toml_reader.UnsupportedFormat(f"Group {name} includes itself.")
+        if name not in resolved:
+            dependencies: list[common.Dependency] = []
+            for item in items_by_name[name]:
+                if isinstance(item, str):
+                    dependencies.append(parse_requirement(item))
+                elif isinstance(item, dict) and "include-group" in item:
+                    item = cast("dict[str, Any]", item)
+                    included = common.canonicalize_name(str(item["include-group"]))
+                    if included not in items_by_name:
+                        raise toml_reader.UnsupportedFormat(
+                            f"Group {name} includes unknown group {included}."
+                        )
+                    dependencies.extend(resolve(included, (*parents, name)))
+                else:
+                    raise toml_reader.UnsupportedFormat(
+                        f"Unsupported entry in group {name}: {item!r}"
+                    )
+            resolved[name] = dependencies
+        return resolved[name]
+
+    return {name: resolve(name, ()) for name in items_by_name}
+
+
+def parse_groups(pyproject: dict[str, Any]) -> dict[str, list[common.Dependency]]:
+    project = pyproject.get("project")
+    if project is None:
+        raise toml_reader.UnsupportedFormat("No [project] section in pyproject.toml.")
+
+    groups: dict[str, list[common.Dependency]] = {
+        common.MAIN_GROUP: [
+            parse_requirement(requirement)
+            for requirement in project.get("dependencies", [])
+        ]
+    }
+    for name, dependencies in parse_dependency_groups(
+        pyproject.get("dependency-groups", {})
+    ).items():
+        groups.setdefault(name, []).extend(dependencies)
+    # Legacy dev dependencies are part of the "dev" group
+    dev_dependencies = pyproject.get("tool", {}).get("uv", {}).get("dev-dependencies")
+    if dev_dependencies:
+        groups.setdefault("dev", []).extend(
+            parse_requirement(requirement) for requirement in dev_dependencies
+        )
+    return groups
+
+
+def parse_locked_dependencies(
+    dependencies: list[dict[str, Any]],
+) -> tuple[common.LockedDependency, ...]:
+    return tuple(
+        common.merge_locked_dependencies(
+            common.LockedDependency(
+                name=common.canonicalize_name(dependency["name"]),
+                extras=frozenset(
+                    common.canonicalize_name(extra)
+                    for extra in dependency.get("extra", [])
+                ),
+                markers=common.normalize_markers(str(dependency.get("marker", ""))),
+            )
+            for dependency in dependencies
+        )
+    )
+
+
+def parse_lock(
+    lock: dict[str, Any],
+) -> tuple[list[common.PoetryPackage], dict[str, common.PackageDependencies]]:
+    """Packages of uv.lock, and their dependencies."""
+    if lock.get("version") not in SUPPORTED_LOCK_VERSIONS:
+        raise toml_reader.UnsupportedFormat(
+            f"Unsupported uv.lock version: {lock.get('version')!r}"
+        )
+
+    packages: list[common.PoetryPackage] = []
+    graph: dict[str, common.PackageDependencies] = {}
+    try:
+        for package in lock.get("package", []):
+            package = cast("dict[str, Any]", package)
+            name = common.canonicalize_name(package["name"])
+            # Projects with a dynamic version have none in the lock
+            if "version" in package:
+                packages.append(
+                    common.PoetryPackage(name=name, version=str(package["version"]))
+                )
+            graph[name] = common.PackageDependencies(
+                required=parse_locked_dependencies(package.get("dependencies", [])),
+                extras={
+                    common.canonicalize_name(extra): parse_locked_dependencies(
+                        dependencies
+                    )
+                    for extra, dependencies in package.get(
+                        "optional-dependencies", {}
+                    ).items()
+                },
+            )
+    except (KeyError, TypeError, AttributeError) as e:
+        raise toml_reader.UnsupportedFormat(f"Malformed package in uv.lock: {e}") from e
+    return packages, graph
+
+
+def load_project(cwd: pathlib.Path | None = None) -> toml_reader.TomlProject:
+    pyproject_path = toml_reader.locate_pyproject(cwd=cwd)
+    groups = parse_groups(toml_reader.load_toml(pyproject_path))
+
+    lock_path = pyproject_path.parent / LOCK_FILE
+    if not lock_path.exists():
+        return toml_reader.TomlProject(packages=[], groups=groups)
+    with timing.span("parse uv.lock"):
+        lock = toml_reader.load_toml(lock_path)
+    packages, graph = parse_lock(lock)
+    return toml_reader.TomlProject(
+        packages=packages, groups=groups, dependency_graph=graph
+    )
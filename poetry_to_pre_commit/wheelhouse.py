@@ -0,0 +1,219 @@
+"""Collect the wheels of the bound hooks from Poetry's artifact cache.
+
+Poetry keeps the files it downloads in its artifact cache, in directories
+named after their URL, which poetry.lock doesn't record. The cache is
+searched by file name instead, for the wheels poetry.lock lists for each
+package of the dependency closure of the bound groups. Wheels whose hash
+matches the lock are copied (or hard-linked) to the wheelhouse, and the
+bound hooks get a `--find-links` option in their `additional_dependencies`,
+for pip to install from it rather than downloading them again.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import sys
+from typing import TYPE_CHECKING, Any, Collection, Iterable, cast
+
+from . import common, project_cache, sync_hooks_additional_dependencies, toml_reader
+
+if TYPE_CHECKING:
+    from .runner import SyncFunction
+
+POETRY_CACHE_DIR_ENV_VAR = "POETRY_CACHE_DIR"
+# Wheels written to the wheelhouse, with their hash, size and mtime
+MANIFEST = ".poetry-to-pre-commit.json"
+
+
+def get_poetry_cache_dir() -> pathlib.Path:
+    """Poetry's default cache directory (its `cache-dir` setting isn't read)."""
+    directory = os.environ.get(POETRY_CACHE_DIR_ENV_VAR)
+    if directory:
+        return pathlib.Path(directory)
+    if sys.platform == "win32":
+        base = pathlib.Path(os.environ.get("LOCALAPPDATA", pathlib.Path.home()))
+        return base / "pypoetry" / "Cache"
+    if sys.platform == "darwin":
+        return pathlib.Path.home() / "Library" / "Caches" / "pypoetry"
+    base = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache"
+    return pathlib.Path(base) / "pypoetry"
+
+
+def parse_lock_wheels(lock: dict[str, Any]) -> dict[str, dict[str, str]]:
+    """Hash of each wheel listed in poetry.lock, by file name, by package."""
+    return {
+        name: {
+            file["file"]: file["hash"]
+            for file in files
+            if str(file.get("file", "")).endswith(".whl")
+        }
+        for name, files in toml_reader.parse_lock_files(lock).items()
+    }
+
+
+def index_cached_files(cache_dir: pathlib.Path) -> dict[str, list[pathlib.Path]]:
+    """Paths of the files of Poetry's artifact cache, by file name."""
+    index: dict[str, list[pathlib.Path]] = {}
+    for directory, _, files in os.walk(cache_dir / "artifacts"):
+        for filename in files:
+            index.setdefault(filename, []).append(pathlib.Path(directory) / filename)
+    return index
+
+
+def matches_hash(path: pathlib.Path, expected: str) -> bool:
+    algorithm, _, digest = expected.partition(":")
+    try:
+        file_hash = hashlib.new(algorithm)
+    except ValueError:
+        return False
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest() == digest
+
+
+def copy_file(source: pathlib.Path, destination: pathlib.Path) -> None:
+    tmp = destination.with_name(f".{destination.name}.tmp")
+    with contextlib.suppress(FileNotFoundError):
+        tmp.unlink()
+    try:
+        os.link(source, tmp)
+    except OSError:  # e.g. on another file system
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, destination)
+
+
+def read_manifest(directory: pathlib.Path) -> dict[str, list[Any]]:
+    try:
+        manifest = json.loads((directory / MANIFEST).read_text())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict):
+        return {}
+    return cast("dict[str, list[Any]]", manifest)
+
+
+def write_manifest(directory: pathlib.Path, manifest: dict[str, list[Any]]) -> None:
+    project_cache.write_atomic(
+        directory / MANIFEST, json.dumps(manifest, sort_keys=True).encode()
+    )
+
+
+def get_record(path: pathlib.Path, file_hash: str) -> list[Any]:
+    stat_result = path.stat()
+    return [file_hash, stat_result.st_size, stat_result.st_mtime_ns]
+
+
+def is_exported(path: pathlib.Path, file_hash: str, recorded: list[Any] | None) -> bool:
+    """Whether `path` is the wheel with this hash.
+
+    Wheels recorded in the manifest with the same hash, size and mtime aren't
+    read again.
+    """
+    try:
+        stat_result = path.stat()
+    except OSError:
+        return False
+    if recorded == [file_hash, stat_result.st_size, stat_result.st_mtime_ns]:
+        return True
+    return matches_hash(path, file_hash)
+
+
+def export_wheelhouse(
+    *,
+    directory: pathlib.Path,
+    packages: Iterable[common.PoetryPackage],
+    wheels: dict[str, dict[str, str]],
+    cache_dir: pathlib.Path,
+) -> list[common.PoetryPackage]:
+    """Copy the cached wheels of `packages` to `directory`.
+
+    The wheels it exported before and that aren't needed anymore are removed
+    from `directory`, other files are left alone. Poetry's artifact cache is
+    only indexed if a wheel is missing from `directory`.
+
+    Returns:
+        The packages without any cached wheel matching poetry.lock.
+    """
+    expected = {
+        filename: (package, file_hash)
+        for package in packages
+        for filename, file_hash in wheels.get(package.name, {}).items()
+    }
+
+    directory.mkdir(parents=True, exist_ok=True)
+    previous = read_manifest(directory)
+    manifest: dict[str, list[Any]] = {}
+    cached_files: dict[str, list[pathlib.Path]] | None = None
+    exported: set[str] = set()
+    for filename, (_, file_hash) in sorted(expected.items()):
+        destination = directory / filename
+        if is_exported(destination, file_hash, previous.get(filename)):
+            exported.add(filename)
+            if filename in previous:
+                manifest[filename] = get_record(destination, file_hash)
+            continue
+        if cached_files is None:
+            cached_files = index_cached_files(cache_dir)
+        for path in cached_files.get(filename, []):
+            if matches_hash(path, file_hash):
+                copy_file(path, destination)
+                manifest[filename] = get_record(destination, file_hash)
+                exported.add(filename)
+                break
+
+    for filename in set(previous) - exported:
+        with contextlib.suppress(FileNotFoundError):
+            (directory / filename).unlink()
+    if manifest != previous:
+        write_manifest(directory, manifest)
+
+    exported_packages = {expected[filename][0] for filename in exported}
+    return sorted(set(packages) - exported_packages)
+
+
+def with_wheelhouse(
+    sync: SyncFunction,
+    *,
+    directory: pathlib.Path,
+    bind: dict[str, set[str]],
+    poetry_cwd: pathlib.Path | None,
+) -> SyncFunction:
+    """Wrap `sync` so that it also exports the wheels of the bound hooks."""
+    lock_path = toml_reader.locate_lock(toml_reader.locate_pyproject(cwd=poetry_cwd))
+    if lock_path.name != "poetry.lock":
+        raise SystemError(
+            f"--wheelhouse exports wheels from Poetry's cache, not for {lock_path.name}."
+        )
+
+    def sync_and_export(
+        config: dict[str, Any],
+        project: common.Project,
+        *,
+        changed: Collection[str] | None = None,
+    ) -> list[common.Change]:
+        changes = list(sync(config, project, changed=changed))
+        packages: set[common.PoetryPackage] = set()
+        for deps in sync_hooks_additional_dependencies.get_deps_by_group(
+            project=project, bind=bind, transitive=True
+        ).values():
+            packages.update(deps)
+        missing = export_wheelhouse(
+            directory=directory,
+            packages=packages,
+            wheels=parse_lock_wheels(toml_reader.load_toml(lock_path)),
+            cache_dir=get_poetry_cache_dir(),
+        )
+        if missing:
+            print(
+                f"No wheel in Poetry's cache for {len(missing)} package(s), pip "
+                f"will download them: {', '.join(str(p) for p in missing)}"
+            )
+        return changes
+
+    return sync_and_export
@@ -0,0 +1,250 @@
+"""Apply recorded changes to the text of the pre-commit config.
+
+Rather than dumping the whole document again, which is slow and reformats
+the file, we use the positions ruamel.yaml recorded while loading to rewrite
+only the changed `rev` scalars and `additional_dependencies` sequences.
+Anything that is not a simple in-place replacement (a key that didn't exist,
+scalars spanning several lines, comments inside a sequence...) raises
+`CannotPatch`, and the caller falls back to a full dump.
+
+Each edit is checked by parsing the replaced text and its replacement on
+their own, which is much cheaper than parsing the patched document again.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import functools
+import json
+import re
+from typing import Any, cast
+
+from . import common
+
+# Plain scalars we can write without quotes. Anything else gets double quotes.
+_PLAIN_BLOCK_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9._\-=<>~!\[\],]*")
+_PLAIN_FLOW_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9._\-=<>~!]*")
+# Plain scalars that YAML would not load as strings
+_NOT_A_STRING_RE = re.compile(
+    r"[-+]?([0-9_]+|[0-9_]*\.[0-9_]*([eE][-+]?[0-9]+)?|0x[0-9a-f_]+|0o[0-7_]+"
+    r"|\.inf|\.nan)|true|false|yes|no|on|off|null|~",
+    re.IGNORECASE,
+)
+
+
+class CannotPatch(Exception):
+    pass
+
+
+@dataclasses.dataclass(frozen=True, order=True)
+class Edit:
+    """Replace lines[start_line:end_line], or part of a line if columns are set."""
+
+    start_line: int
+    start_col: int
+    end_line: int
+    end_col: int
+    replacement: str
+
+
+def format_scalar(value: str, flow: bool = False) -> str:
+    plain_re = _PLAIN_FLOW_RE if flow else _PLAIN_BLOCK_RE
+    if plain_re.fullmatch(value) and not _NOT_A_STRING_RE.fullmatch(value):
+        return value
+    # JSON strings are valid YAML double-quoted scalars
+    return json.dumps(value)
+
+
+def find_scalar_end(line: str, col: int) -> int:
+    """Return the column after the scalar starting at `col`."""
+    quote = line[col : col + 1]
+    if quote == "'":
+        end = col + 1
+        while True:
+            end = line.find("'", end)
+            if end == -1:
+                raise CannotPatch("Multi-line quoted scalar")
+            if line[end + 1 : end + 2] == "'":  # escaped quote
+                end += 2
+                continue
+            return end + 1
+    if quote == '"':
+        end = col + 1
+        while end < len(line):
+            if line[end] == "\\":
+                end += 2
+                continue
+            if line[end] == '"':
+                return end + 1
+            end += 1
+        raise CannotPatch("Multi-line quoted scalar")
+
+    # Plain scalar: up to a comment or the end of the line
+    comment = line.find(" #", col)
+    end = len(line.rstrip("\r\n")) if comment == -1 else comment
+    return len(line[:end].rstrip())
+
+
+def find_flow_sequence_end(line: str, col: int) -> int:
+    """Return the column after the flow sequence starting at `col`."""
+    depth = 0
+    pos = col
+    while pos < len(line):
+        char = line[pos]
+        if char in "'\"":
+            pos = find_scalar_end(line, pos)
+            continue
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        elif char == "#" and line[pos - 1] in " \t":
+            break
+        pos += 1
+    raise CannotPatch("Multi-line flow sequence")
+
+
+# Positions recorded by ruamel.yaml, as (line, column), both 0-based
+def value_position(mapping: Any, key: str) -> tuple[int, int]:
+    return cast("tuple[int, int]", tuple(mapping.lc.value(key)))
+
+
+def key_position(mapping: Any, key: str) -> tuple[int, int]:
+    return cast("tuple[int, int]", tuple(mapping.lc.key(key)))
+
+
+def is_blank_after(line: str, col: int) -> bool:
+    return not line[col:].strip()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_snippet_loader() -> Any:
+    import ruamel.yaml
+
+    return ruamel.yaml.YAML(typ="safe", pure=True)
+
+
+def check_snippet(value_text: str, expected: Any) -> None:
+    """Check that `value_text`, as the value of a key, loads as `expected`."""
+    import ruamel.yaml
+
+    try:
+        loaded = _get_snippet_loader().load(f"key: {value_text}")
+    except ruamel.yaml.YAMLError as e:
+        raise CannotPatch(f"Invalid YAML: {value_text!r}") from e
+    if loaded != {"key": expected}:
+        raise CannotPatch(f"{value_text!r} doesn't load as {expected!r}")
+
+
+def rev_edit(lines: list[str], data: Any, change: common.RevChange) -> Edit:
+    if change.old_rev is None:
+        raise CannotPatch("New rev key")
+    repo = data["repos"][change.repo_index]
+    line, col = value_position(repo, "rev")
+    end = find_scalar_end(lines[line], col)
+    old = lines[line][col:end]
+    check_snippet(old, change.old_rev)
+    if old[:1] in "'\"":
+        replacement = json.dumps(change.new_rev) if old[0] == '"' else None
+        if replacement is None:
+            replacement = "'" + change.new_rev.replace("'", "''") + "'"
+    else:
+        replacement = format_scalar(change.new_rev)
+    check_snippet(replacement, change.new_rev)
+    return Edit(line, col, line, end, replacement)
+
+
+def additional_dependencies_edit(
+    lines: list[str], data: Any, change: common.AdditionalDependenciesChange
+) -> Edit:
+    if change.old is None:
+        raise CannotPatch("New additional_dependencies key")
+    hook = data["repos"][change.repo_index]["hooks"][change.hook_index]
+    # The sequence itself has been replaced, but the hook mapping still knows
+    # where its value was.
+    line, col = value_position(hook, "additional_dependencies")
+
+    if lines[line][col : col + 1] == "[":
+        if not change.old:
+            # Likely a placeholder: write the dependencies as a block sequence,
+            # as a new key would be
+            raise CannotPatch("Empty flow sequence")
+        end = find_flow_sequence_end(lines[line], col)
+        check_snippet(lines[line][col:end], list(change.old))
+        replacement = (
+            "[" + ", ".join(format_scalar(dep, flow=True) for dep in change.new) + "]"
+        )
+        check_snippet(replacement, list(change.new))
+        return Edit(line, col, line, end, replacement)
+
+    # Block sequence: one line per item, right after the key, nothing else in
+    # between
+    key_line, _ = key_position(hook, "additional_dependencies")
+    if not change.old or line != key_line + 1:
+        raise CannotPatch("Irregular block sequence")
+    item_lines = lines[line : line + len(change.old)]
+    prefix = lines[line][:col] + "- "
+    if prefix.strip() != "-":
+        raise CannotPatch("Irregular block sequence")
+    for item_line in item_lines:
+        if not item_line.startswith(prefix) or not is_blank_after(
+            item_line, find_scalar_end(item_line, len(prefix))
+        ):
+            raise CannotPatch("Irregular block sequence")
+    check_snippet("\n" + "".join(item_lines), list(change.old))
+
+    last_line = line + len(item_lines)
+    if not change.new:
+        # An empty sequence can only be written in flow style
+        key_text = lines[key_line].rstrip("\r\n")
+        if not key_text.rstrip().endswith(":"):
+            raise CannotPatch("Comment after additional_dependencies key")
+        newline = lines[key_line][len(key_text) :]
+        return Edit(key_line, 0, last_line, 0, key_text.rstrip() + " []" + newline)
+
+    newline = lines[line][len(lines[line].rstrip("\r\n")) :] or "\n"
+    replacement = "".join(
+        f"{prefix}{format_scalar(dep)}{newline}" for dep in change.new
+    )
+    check_snippet("\n" + replacement, list(change.new))
+    return Edit(line, 0, last_line, 0, replacement)
+
+
+def apply_edits(lines: list[str], edits: list[Edit]) -> str:
+    edits = sorted(edits)
+    for previous, edit in zip(edits, edits[1:]):
+        if (previous.end_line, previous.end_col) > (edit.start_line, edit.start_col):
+            raise CannotPatch("Overlapping edits")
+
+    result = list(lines)
+    # Apply from the end so that positions stay valid
+    for edit in reversed(edits):
+        if edit.start_line == edit.end_line:
+            line = result[edit.start_line]
+            result[edit.start_line] = (
+                line[: edit.start_col] + edit.replacement + line[edit.end_col :]
+            )
+        else:
+            result[edit.start_line : edit.end_line] = [edit.replacement]
+    return "".join(result)
+
+
+def patch(text: str, data: Any, changes: list[common.Change]) -> str:
+    """Return `text` with `changes` applied.
+
+    `data` is the round-trip document `text` was loaded into (with its
+    position marks), already modified by `changes`.
+    """
+    lines = text.splitlines(keepends=True)
+    edits: list[Edit] = []
+    try:
+        for change in changes:
+            if isinstance(change, common.RevChange):
+                edits.append(rev_edit(lines, data, change))
+            else:
+                edits.append(additional_dependencies_edit(lines, data, change))
+    except (KeyError, IndexError, AttributeError, TypeError) as e:
+        raise CannotPatch(f"Unexpected document structure: {e!r}") from e
+    return apply_edits(lines, edits)
@@ -4,7 +4,25 @@ import pathlib
 
 import pytest
 
+from poetry_to_pre_commit import project_cache, server
+
 
 @pytest.fixture
 def poetry_cwd() -> pathlib.Path:
     return pathlib.Path(__file__).parent
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: pathlib.Path, monkeypatch) -> pathlib.Path:
+    # Don't write cache files in the repository
+    directory = tmp_path / "cache"
+    monkeypatch.setenv(project_cache.CACHE_DIR_ENV_VAR, str(directory))
+    return directory
+
+
+@pytest.fixture(autouse=True)
+def socket_path(tmp_path: pathlib.Path, monkeypatch) -> pathlib.Path:
+    # Never forward runs to a server running on this machine
+    path = tmp_path / "server.sock"
+    monkeypatch.setenv(server.SOCKET_ENV_VAR, str(path))
+    return path
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import copy
+from pathlib import Path
+
+import pytest
+
+from poetry_to_pre_commit import api, common, toml_reader
+
+
+@pytest.fixture
+def project(poetry_cwd: Path) -> api.TomlProject:
+    return toml_reader.TomlProject.load(cwd=poetry_cwd)
+
+
+@pytest.fixture
+def config() -> dict:
+    return {
+        "repos": [
+            {
+                "repo": "https://github.com/foo/pyright-python",
+                "rev": "v1.1.300",
+                "hooks": [{"id": "pyright"}],
+            },
+            {
+                "repo": "https://github.com/foo/mypy",
+                "rev": "1.0",
+                "hooks": [
+                    {
+                        "id": "mypy",
+                        "additional_dependencies": ["attrs==1", "old==2"],
+                    }
+                ],
+            },
+        ]
+    }
+
+
+def test_compute_changes(config: dict, project: api.TomlProject) -> None:
+    original = copy.deepcopy(config)
+
+    result = api.compute_changes(
+        config,
+        project,
+        map={"pyright-python": "pyright"},
+        skip=["mypy"],
+        bind={"mypy": ["main", "types"]},
+    )
+
+    assert config == original
+    assert result.repos == (
+        common.RevChange(
+            repo_index=0,
+            repo="https://github.com/foo/pyright-python",
+            old_rev="v1.1.300",
+            new_rev="v1.1.355",
+        ),
+    )
+    (hook_change,) = result.hooks
+    assert hook_change.hook_id == "mypy"
+    assert hook_change.removed == ("old==2",)
+    assert hook_change.updated == (("attrs==1", "attrs==23.2.0"),)
+    assert hook_change.added == (
+        "psycopg[pool]==3.1.18",
+        "types-requests==2.31.0.20240311",
+    )
+    assert result.changes == [*result.repos, *result.hooks]
+    assert result.config["repos"][0]["rev"] == "v1.1.355"
+    assert result.config["repos"][1]["hooks"][0]["additional_dependencies"] == list(
+        hook_change.new
+    )
+
+
+def test_compute_changes__nothing(config: dict, project: api.TomlProject) -> None:
+    result = api.compute_changes(config, project)
+
+    assert not result
+    assert result.config == config
+
+
+def test_compute_changes__unknown_group(config: dict, project: api.TomlProject) -> None:
+    with pytest.raises(SystemError):
+        api.compute_changes(config, project, bind={"mypy": ["unknown"]})
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import concurrent.futures
+import os
 from pathlib import Path
 
-from poetry_to_pre_commit import common
+import pytest
+from poetry import factory
+
+from poetry_to_pre_commit import common, toml_reader
 
 
 def test_get_poetry_packages(poetry_cwd: Path) -> None:
@@ -19,8 +24,8 @@ def test_pre_commit_config_roundtrip__no_change(tmp_path: Path) -> None:
     file = tmp_path / "file.yaml"
     yaml = "a: 1\nb: 2\n"
     file.write_text(yaml)
-    with common.pre_commit_config_roundtrip(path=file) as content:
-        assert content == {"a": 1, "b": 2}
+    with common.pre_commit_config_roundtrip(path=file) as config:
+        assert config.data == {"a": 1, "b": 2}
     assert file.read_text() == yaml
 
 
@@ -28,7 +33,305 @@ def test_pre_commit_config_roundtrip__write_back(tmp_path: Path) -> None:
     file = tmp_path / "file.yaml"
     yaml = "a: 1\nb: 2\n"
     file.write_text(yaml)
-    with common.pre_commit_config_roundtrip(path=file) as content:
-        content["a"] = 3
-        content["c"] = 5
+    with common.pre_commit_config_roundtrip(path=file) as config:
+        config.data["a"] = 3
+        config.data["c"] = 5
+        config.changes.append(
+            common.RevChange(repo_index=0, repo="a", old_rev="1", new_rev="3")
+        )
     assert file.read_text() == "a: 3\nb: 2\nc: 5\n"
+
+
+def test_pre_commit_config_roundtrip__no_recorded_change(tmp_path: Path) -> None:
+    file = tmp_path / "file.yaml"
+    yaml = "a: 1\nb: 2\n"
+    file.write_text(yaml)
+    with common.pre_commit_config_roundtrip(path=file) as config:
+        config.data["a"] = 3
+    assert file.read_text() == yaml
+
+
+def test_pre_commit_config_roundtrip__dry_run(tmp_path: Path) -> None:
+    file = tmp_path / "file.yaml"
+    yaml = "a: 1 # comment\nb: 2\n"
+    file.write_text(yaml)
+    with common.pre_commit_config_roundtrip(path=file, dry_run=True) as config:
+        config.data["a"] = 3
+        config.changes.append(
+            common.RevChange(repo_index=0, repo="a", old_rev="1", new_rev="3")
+        )
+    assert file.read_text() == yaml
+    assert config.new_text == "a: 3 # comment\nb: 2\n"
+
+
+def test_pre_commit_config_roundtrip__keeps_mode(tmp_path: Path) -> None:
+    file = tmp_path / "file.yaml"
+    file.write_text("a: 1\n")
+    file.chmod(0o640)
+    with common.pre_commit_config_roundtrip(path=file) as config:
+        config.data["a"] = 3
+        config.changes.append(
+            common.RevChange(repo_index=0, repo="a", old_rev="1", new_rev="3")
+        )
+    assert file.read_text() == "a: 3\n"
+    assert file.stat().st_mode & 0o777 == 0o640
+
+
+def test_pre_commit_config_roundtrip__writes_symlink_target(tmp_path: Path) -> None:
+    file = tmp_path / "file.yaml"
+    file.write_text("a: 1\n")
+    link = tmp_path / "link.yaml"
+    link.symlink_to(file)
+    with common.pre_commit_config_roundtrip(path=link) as config:
+        config.data["a"] = 3
+        config.changes.append(
+            common.RevChange(repo_index=0, repo="a", old_rev="1", new_rev="3")
+        )
+    assert link.is_symlink()
+    assert file.read_text() == "a: 3\n"
+
+
+def test_lock_config__reentrant(tmp_path: Path) -> None:
+    file = tmp_path / "file.yaml"
+    file.write_text("a: 1\n")
+    lock = common.lock_config(file)
+    with lock, common.pre_commit_config_roundtrip(path=file) as config:
+        config.data["a"] = 2
+        config.changes.append(
+            common.RevChange(repo_index=0, repo="a", old_rev="1", new_rev="2")
+        )
+    assert file.read_text() == "a: 2\n"
+
+
+def increment_rev(path: Path, times: int) -> None:
+    for _ in range(times):
+        with common.pre_commit_config_roundtrip(path=path) as config:
+            repo = config.data["repos"][0]
+            old_rev = repo["rev"]
+            repo["rev"] = f"v{int(old_rev[1:]) + 1}"
+            config.changes.append(
+                common.RevChange(
+                    repo_index=0,
+                    repo=repo["repo"],
+                    old_rev=old_rev,
+                    new_rev=repo["rev"],
+                )
+            )
+
+
+def test_pre_commit_config_roundtrip__concurrent_writers(tmp_path: Path) -> None:
+    file = tmp_path / "file.yaml"
+    file.write_text("# comment\nrepos:\n  - repo: foo  # comment\n    rev: v0\n")
+    writers, times = 8, 10
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=writers) as executor:
+        futures = [executor.submit(increment_rev, file, times) for _ in range(writers)]
+        for future in futures:
+            future.result()
+
+    # No update was lost, and no partially written file was read
+    assert file.read_text() == (
+        f"# comment\nrepos:\n  - repo: foo  # comment\n    rev: v{writers * times}\n"
+    )
+    # No temporary file left behind
+    assert os.listdir(tmp_path) == ["file.yaml"]
+
+
+def test_apply_changes() -> None:
+    data = {
+        "repos": [{"repo": "foo", "rev": "v1.0.0", "hooks": [{"id": "a"}, {"id": "b"}]}]
+    }
+    common.apply_changes(
+        data,
+        [
+            common.RevChange(repo_index=0, repo="foo", old_rev="v1.0.0", new_rev="v2"),
+            common.AdditionalDependenciesChange(
+                repo_index=0, hook_index=1, hook_id="b", old=None, new=("bar==1",)
+            ),
+        ],
+    )
+    assert data == {
+        "repos": [
+            {
+                "repo": "foo",
+                "rev": "v2",
+                "hooks": [
+                    {"id": "a"},
+                    {"id": "b", "additional_dependencies": ["bar==1"]},
+                ],
+            }
+        ]
+    }
+
+
+def test_merge_packages() -> None:
+    merged = common.merge_packages(
+        [
+            common.PoetryPackage("a", "1", frozenset({"x"}), 'sys_platform == "win32"'),
+            common.PoetryPackage("b", "1"),
+            common.PoetryPackage("a", "1", frozenset({"y"})),
+        ]
+    )
+
+    assert [str(package) for package in merged] == ["a[x,y]==1", "b==1"]
+
+
+def test_poetry_package__str_markers() -> None:
+    package = common.PoetryPackage("a", "1", markers='sys_platform == "win32"')
+
+    assert str(package) == 'a==1; sys_platform == "win32"'
+
+
+def test_merge_locked_dependencies() -> None:
+    merged = common.merge_locked_dependencies(
+        [
+            common.LockedDependency("a", frozenset({"x"}), 'python_version < "3.9"'),
+            common.LockedDependency("b"),
+            common.LockedDependency("a", frozenset({"y"}), 'python_version >= "3.9"'),
+        ]
+    )
+
+    assert merged == [
+        common.LockedDependency(
+            "a",
+            frozenset({"x", "y"}),
+            '(python_version < "3.9") or (python_version >= "3.9")',
+        ),
+        common.LockedDependency("b"),
+    ]
+
+
+def test_load_config_fast(tmp_path: Path) -> None:
+    file = tmp_path / "file.yaml"
+    file.write_text("repos:\n  - repo: foo # comment\n    rev: v1.0.0\n")
+    assert common.load_config_fast(file) == {
+        "repos": [{"repo": "foo", "rev": "v1.0.0"}]
+    }
+
+
+def test_load_config_fast__without_pyyaml(tmp_path: Path, mocker) -> None:
+    mocker.patch.dict("sys.modules", {"yaml": None})
+    file = tmp_path / "file.yaml"
+    file.write_text("repos:\n  - repo: foo # comment\n    rev: v1.0.0\n")
+    assert common.load_config_fast(file) == {
+        "repos": [{"repo": "foo", "rev": "v1.0.0"}]
+    }
+
+
+def test_get_poetry_packages__shared_project(poetry_cwd: Path, mocker) -> None:
+    create_poetry = mocker.spy(factory.Factory, "create_poetry")
+    project = common.PoetryProject(cwd=poetry_cwd)
+
+    first = list(common.get_poetry_packages(project=project))
+    second = list(common.get_poetry_packages(project=project))
+
+    assert first == second
+    assert create_poetry.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "backend, expected",
+    [
+        ("auto", toml_reader.LazyTomlProject),
+        ("toml", toml_reader.LazyTomlProject),
+        ("poetry", common.PoetryProject),
+    ],
+)
+def test_get_project(poetry_cwd: Path, backend: str, expected: type) -> None:
+    assert isinstance(common.get_project(cwd=poetry_cwd, backend=backend), expected)
+
+
+def test_get_project__auto_fallback(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text("[tool")
+
+    assert isinstance(common.get_project(cwd=tmp_path), common.PoetryProject)
+
+
+def test_get_project__toml_unsupported(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text("[tool")
+
+    with pytest.raises(SystemError):
+        common.get_project(cwd=tmp_path, backend="toml")
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [("foo", "foo"), ("Foo_Bar", "foo-bar"), ("foo.-_bar", "foo-bar")],
+)
+def test_canonicalize_name(name: str, expected: str) -> None:
+    assert common.canonicalize_name(name) == expected
+
+
+@pytest.mark.parametrize(
+    "requirement, expected",
+    [
+        ("foo", "foo"),
+        ("Foo_Bar==1.0", "foo-bar"),
+        ("foo[bar,baz]>=1; python_version<'3.9'", "foo"),
+        (" foo.bar @ https://example.com/foo.whl", "foo-bar"),
+    ],
+)
+def test_requirement_name(requirement: str, expected: str) -> None:
+    assert common.requirement_name(requirement) == expected
+
+
+def test_additional_dependencies_change__details() -> None:
+    change = common.AdditionalDependenciesChange(
+        repo_index=0,
+        hook_index=0,
+        hook_id="mypy",
+        old=("attrs==23.1.0", "Foo_Bar==1", "old==1"),
+        new=("attrs==23.2.0", "foo-bar==1", "new==2"),
+    )
+
+    assert change.added == ("new==2",)
+    assert change.removed == ("old==1",)
+    assert change.updated == (
+        ("attrs==23.1.0", "attrs==23.2.0"),
+        ("Foo_Bar==1", "foo-bar==1"),
+    )
+
+
+def test_additional_dependencies_change__details_no_previous_value() -> None:
+    change = common.AdditionalDependenciesChange(
+        repo_index=0, hook_index=0, hook_id="mypy", old=None, new=("a==1",)
+    )
+
+    assert change.added == ("a==1",)
+    assert change.removed == ()
+    assert change.updated == ()
+
+
+def test_change__str() -> None:
+    assert (
+        str(common.RevChange(repo_index=0, repo="foo", old_rev="v1", new_rev="v2"))
+        == "foo: rev v1 -> v2"
+    )
+    change = common.AdditionalDependenciesChange(
+        repo_index=0,
+        hook_index=0,
+        hook_id="mypy",
+        old=["attrs==1.0", "six==1.0"],
+        new=["attrs==2.0", "toml==1.0"],
+    )
+    assert str(change) == (
+        "mypy: additional_dependencies\n"
+        "  + toml==1.0\n"
+        "  - six==1.0\n"
+        "  ~ attrs==1.0 -> attrs==2.0"
+    )
+
+
+def test_poetry_project_find_packages(poetry_cwd: Path, mocker) -> None:
+    project = common.PoetryProject(cwd=poetry_cwd)
+    locked_repository = mocker.spy(project.poetry.locker, "locked_repository")
+    names = {"attrs", "pyright", "unknown"}
+
+    result = project.find_packages(names)
+
+    assert locked_repository.call_count == 0
+    assert sorted(result) == sorted(
+        package for package in project.packages if package.name in names
+    )
+    # Once all the packages were loaded, they are used directly
+    assert project.find_packages(names) == result
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from poetry_to_pre_commit import common, environments, sync_repos
+
+
+@pytest.fixture
+def config() -> dict:
+    return {
+        "repos": [
+            {
+                "repo": "https://github.com/foo/bar",
+                "rev": "v2",
+                "hooks": [{"id": "bar"}, {"id": "bar-fix"}],
+            },
+            {
+                "repo": "https://github.com/foo/mypy",
+                "rev": "v1",
+                "hooks": [
+                    {"id": "mypy", "additional_dependencies": ["attrs==2"]},
+                    {"id": "other", "additional_dependencies": ["six==1"]},
+                ],
+            },
+        ]
+    }
+
+
+CHANGES: list[common.Change] = [
+    common.RevChange(
+        repo_index=0, repo="https://github.com/foo/bar", old_rev="v1", new_rev="v2"
+    ),
+    common.AdditionalDependenciesChange(
+        repo_index=1, hook_index=0, hook_id="mypy", old=("attrs==1",), new=("attrs==2",)
+    ),
+]
+
+
+def test_get_invalidated_environments(config: dict) -> None:
+    assert environments.get_invalidated_environments(config, CHANGES) == [
+        environments.Environment(
+            repo="https://github.com/foo/bar",
+            rev="v2",
+            additional_dependencies=(),
+            hook_ids=("bar", "bar-fix"),
+        ),
+        environments.Environment(
+            repo="https://github.com/foo/mypy",
+            rev="v1",
+            additional_dependencies=("attrs==2",),
+            hook_ids=("mypy",),
+        ),
+    ]
+
+
+def test_environment__str() -> None:
+    environment = environments.Environment(
+        repo="https://github.com/foo/mypy",
+        rev="v1",
+        additional_dependencies=("attrs==2", "six==1"),
+        hook_ids=("mypy",),
+    )
+    assert str(environment) == "https://github.com/foo/mypy@v1 (mypy: attrs==2, six==1)"
+
+
+def test_get_affected_config(config: dict) -> None:
+    assert environments.get_affected_config(config, CHANGES) == {
+        "repos": [
+            config["repos"][0],
+            {
+                "repo": "https://github.com/foo/mypy",
+                "rev": "v1",
+                "hooks": [{"id": "mypy", "additional_dependencies": ["attrs==2"]}],
+            },
+        ]
+    }
+
+
+@pytest.mark.parametrize("mode, function", [("now", "run"), ("background", "Popen")])
+def test_install(
+    config: dict,
+    tmp_path: Path,
+    poetry_cwd: Path,
+    cache_dir: Path,
+    mocker,
+    mode,
+    function,
+) -> None:
+    mocker.patch("shutil.which", return_value="/bin/pre-commit")
+    subprocess_function = mocker.patch(f"subprocess.{function}")
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+
+    environments.install(
+        config=config,
+        changes=CHANGES,
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+        mode=mode,
+    )
+
+    (command,), kwargs = subprocess_function.call_args
+    assert command[:3] == ["/bin/pre-commit", "install-hooks", "--config"]
+    assert kwargs["cwd"] == tmp_path
+    installed = json.loads(Path(command[3]).read_text())
+    assert [hook["id"] for repo in installed["repos"] for hook in repo["hooks"]] == [
+        "bar",
+        "bar-fix",
+        "mypy",
+    ]
+    assert cache_dir in Path(command[3]).parents
+
+
+def test_install__failed(
+    config: dict, tmp_path: Path, poetry_cwd: Path, mocker, capsys
+) -> None:
+    mocker.patch("shutil.which", return_value="/bin/pre-commit")
+    run = mocker.patch("subprocess.run", return_value=mocker.Mock(returncode=3))
+
+    environments.install(
+        config=config,
+        changes=CHANGES,
+        pre_commit_path=tmp_path / ".pre-commit-config.yaml",
+        poetry_cwd=poetry_cwd,
+        mode="now",
+    )
+
+    assert run.call_args.kwargs["check"] is False
+    assert "failed with exit code 3" in capsys.readouterr().out
+
+
+def test_sync_repos__environments(
+    tmp_path: Path, poetry_cwd: Path, capsys, mocker
+) -> None:
+    run = mocker.patch("subprocess.run", return_value=mocker.Mock(returncode=0))
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text(
+        "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1.1.300\n"
+        "    hooks:\n      - id: pyright\n"
+    )
+
+    sync_repos.sync_repos(
+        argv=["--map", "pyright-python=pyright", "--install-hooks=now"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    assert capsys.readouterr().out.splitlines() == [
+        "pre-commit environments invalidated by this sync:",
+        "  https://github.com/foo/pyright-python@v1.1.355 (pyright: no dependencies)",
+    ]
+    assert run.call_args.args[0][-3:-1] == ["install-hooks", "--config"]
+
+
+def test_sync_repos__quiet(tmp_path: Path, poetry_cwd: Path, capsys) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text(
+        "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1.1.300\n"
+    )
+
+    sync_repos.sync_repos(
+        argv=["--map", "pyright-python=pyright"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+        quiet=True,
+    )
+
+    assert "v1.1.355" in pre_commit_path.read_text()
+    assert capsys.readouterr().out == ""
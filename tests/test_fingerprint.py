@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from poetry_to_pre_commit import fingerprint, project_cache, sync_repos
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    (tmp_path / "pyproject.toml").write_text("[tool.poetry]\n")
+    (tmp_path / "poetry.lock").write_text("")
+    (tmp_path / ".pre-commit-config.yaml").write_text("repos: []\n")
+    return tmp_path
+
+
+def get(project: Path, **options) -> fingerprint.Fingerprint:
+    result = fingerprint.get_fingerprint(
+        hook="hook",
+        options=options,
+        pre_commit_path=project / ".pre-commit-config.yaml",
+        poetry_cwd=project,
+    )
+    assert result
+    return result
+
+
+def test_fingerprint__record_and_match(project: Path, cache_dir: Path) -> None:
+    assert not get(project).matches()
+
+    get(project).record()
+
+    assert get(project).matches()
+    assert (cache_dir / ".gitignore").read_text() == "*\n"
+
+
+@pytest.mark.parametrize(
+    "file", ["pyproject.toml", "poetry.lock", ".pre-commit-config.yaml"]
+)
+def test_fingerprint__input_changed(project: Path, file: str) -> None:
+    get(project).record()
+
+    (project / file).write_text("changed")
+
+    assert not get(project).matches()
+
+
+def test_fingerprint__options_changed(project: Path) -> None:
+    get(project, skip=["a"]).record()
+
+    assert not get(project, skip=["b"]).matches()
+
+
+def test_fingerprint__sets_are_stable(project: Path) -> None:
+    assert (
+        get(project, bind=[("a", {"x", "y", "z"})]).compute()
+        == get(project, bind=[("a", {"z", "y", "x"})]).compute()
+    )
+
+
+def test_get_fingerprint__no_project(tmp_path: Path) -> None:
+    assert (
+        fingerprint.get_fingerprint(
+            hook="hook",
+            options={},
+            pre_commit_path=tmp_path / ".pre-commit-config.yaml",
+            poetry_cwd=tmp_path,
+        )
+        is None
+    )
+
+
+def test_sync_repos__skip_unchanged(tmp_path: Path, poetry_cwd: Path, mocker) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text("repos: []\n")
+    load_project = mocker.spy(project_cache, "load_project")
+
+    for _ in range(2):
+        sync_repos.sync_repos(
+            argv=["--skip-unchanged"],
+            pre_commit_path=pre_commit_path,
+            poetry_cwd=poetry_cwd,
+        )
+
+    assert load_project.call_count == 1
+
+
+def test_sync_repos__skip_unchanged__no_heavy_imports(
+    tmp_path: Path, poetry_cwd: Path
+) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text("repos: []\n")
+    sync_repos.sync_repos(
+        argv=["--skip-unchanged"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    script = f"""
+import pathlib, sys
+from poetry_to_pre_commit import sync_repos
+sync_repos.sync_repos(
+    argv=["--skip-unchanged"],
+    pre_commit_path=pathlib.Path({str(pre_commit_path)!r}),
+    poetry_cwd=pathlib.Path({str(poetry_cwd)!r}),
+)
+print(sorted(m for m in sys.modules if m.split(".")[0] in ("poetry", "ruamel")))
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == "[]"
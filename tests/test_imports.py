@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+import poetry_to_pre_commit
+
+HEAVY_MODULES = ("poetry", "ruamel", "packaging")
+
+
+@pytest.mark.parametrize(
+    "module, parser",
+    [
+        ("sync_repos", "get_sync_repos_parser"),
+        (
+            "sync_hooks_additional_dependencies",
+            "get_sync_hooks_additional_dependencies_parser",
+        ),
+        ("sync_all", "get_sync_all_parser"),
+        ("monorepo", "get_sync_monorepo_parser"),
+    ],
+)
+def test_parsing_arguments_does_not_import_heavy_modules(
+    module: str, parser: str
+) -> None:
+    script = f"""
+import sys
+from poetry_to_pre_commit import {module}
+{module}.{parser}().parse_args(["--skip-unchanged"])
+print(sorted(m for m in sys.modules if m.split(".")[0] in {HEAVY_MODULES!r}))
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_lazy_entrypoints() -> None:
+    from poetry_to_pre_commit import (
+        monorepo,
+        sync_all,
+        sync_hooks_additional_dependencies,
+        sync_repos,
+    )
+
+    assert poetry_to_pre_commit.sync_all_cli is sync_all.sync_all_cli
+    assert poetry_to_pre_commit.sync_monorepo_cli is monorepo.sync_monorepo_cli
+    assert poetry_to_pre_commit.sync_repos_cli is sync_repos.sync_repos_cli
+    assert (
+        poetry_to_pre_commit.sync_hooks_additional_dependencies_cli
+        is sync_hooks_additional_dependencies.sync_hooks_additional_dependencies_cli
+    )
+
+
+def test_lazy_entrypoints__unknown() -> None:
+    with pytest.raises(AttributeError):
+        poetry_to_pre_commit.unknown
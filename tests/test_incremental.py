@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from poetry_to_pre_commit import incremental, sync_repos
+
+CONFIG = """\
+repos:
+  - repo: https://github.com/foo/pyright-python
+    rev: v1.1.355
+  - repo: https://github.com/foo/flake8
+    rev: 6.0.0
+"""
+
+
+@pytest.fixture
+def project(tmp_path: Path, poetry_cwd: Path) -> Path:
+    for name in ("pyproject.toml", "poetry.lock"):
+        (tmp_path / name).write_bytes((poetry_cwd / name).read_bytes())
+    (tmp_path / ".pre-commit-config.yaml").write_text(CONFIG)
+    return tmp_path
+
+
+def bump_pyright(project: Path) -> None:
+    lock = project / "poetry.lock"
+    lock.write_text(
+        lock.read_text().replace('version = "1.1.355"', 'version = "1.1.400"')
+    )
+
+
+def run(project: Path, *argv: str) -> str:
+    sync_repos.sync_repos(
+        argv=["--map", "pyright-python=pyright", *argv],
+        pre_commit_path=project / ".pre-commit-config.yaml",
+        poetry_cwd=project,
+    )
+    return (project / ".pre-commit-config.yaml").read_text()
+
+
+def test_get_changed_packages() -> None:
+    old = incremental.State(pyproject="a", config="b", packages={"x": "1", "y": "2"})
+    new = incremental.State(pyproject="a", config="b", packages={"x": "1", "z": "3"})
+
+    assert incremental.get_changed_packages(old, new) == {"y", "z"}
+
+
+@pytest.mark.parametrize(
+    "new",
+    [
+        incremental.State(pyproject="other", config="b", packages={}),
+        incremental.State(pyproject="a", config="other", packages={}),
+        incremental.State(pyproject="a", config="b", packages={}, options="other"),
+    ],
+)
+def test_get_changed_packages__sync_everything(new: incremental.State) -> None:
+    old = incremental.State(pyproject="a", config="b", packages={}, options="o")
+
+    assert incremental.get_changed_packages(old, new) is None
+
+
+def test_incremental__snapshot(project: Path, mocker) -> None:
+    sync = mocker.spy(sync_repos, "sync_repos_with_project")
+
+    # Without a snapshot (nor git), everything is synced
+    assert "rev: 7.0.0" in run(project, "--incremental")
+    assert sync.call_args.kwargs.get("changed") is None
+
+    bump_pyright(project)
+    assert "rev: v1.1.400" in run(project, "--incremental")
+    assert sync.call_args.kwargs["changed"] == {"pyright"}
+
+
+def git_commit(project: Path) -> None:
+    def git(*args: str) -> None:
+        subprocess.run(["git", *args], cwd=project, check=True, capture_output=True)
+
+    git("init", "-q")
+    git("add", ".")
+    git("-c", "user.name=a", "-c", "user.email=a@a", "commit", "-q", "-m", "init")
+
+
+def test_incremental__git(project: Path) -> None:
+    git_commit(project)
+    bump_pyright(project)
+
+    config = run(project, "--incremental=HEAD")
+
+    assert "rev: v1.1.400" in config
+    # Out of sync, but flake8 didn't change in poetry.lock
+    assert "rev: 6.0.0" in config
+
+
+def test_incremental__no_snapshot_with_git(project: Path, mocker) -> None:
+    # The committed config is out of sync, and so is the lock of HEAD
+    git_commit(project)
+    sync = mocker.spy(sync_repos, "sync_repos_with_project")
+
+    assert "rev: 7.0.0" in run(project, "--incremental")
+    assert sync.call_args.kwargs.get("changed") is None
+
+
+def test_git_show__not_a_repository(tmp_path: Path) -> None:
+    assert incremental.git_show("HEAD", tmp_path / "poetry.lock") is None
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from poetry_to_pre_commit import monorepo, project_cache
+
+CONFIG = """\
+repos:
+  - repo: https://github.com/foo/pyright-python
+    rev: v1.1.300
+    hooks:
+      - id: pyright
+"""
+
+
+@pytest.fixture
+def repository(tmp_path: Path, poetry_cwd: Path) -> Path:
+    """Two projects: "a" with two configs (one in a subdirectory), and "b"."""
+    for project in ("a", "b"):
+        directory = tmp_path / project
+        directory.mkdir()
+        for file in ("pyproject.toml", "poetry.lock"):
+            shutil.copy(poetry_cwd / file, directory / file)
+        (directory / ".pre-commit-config.yaml").write_text(CONFIG)
+    (tmp_path / "a" / "sub").mkdir()
+    (tmp_path / "a" / "sub" / ".pre-commit-config.yaml").write_text(CONFIG)
+    (tmp_path / "a" / ".venv").mkdir()
+    (tmp_path / "a" / ".venv" / ".pre-commit-config.yaml").write_text(CONFIG)
+    return tmp_path
+
+
+def test_discover_configs(repository: Path) -> None:
+    assert monorepo.discover_configs(repository) == [
+        repository / "a" / ".pre-commit-config.yaml",
+        repository / "a" / "sub" / ".pre-commit-config.yaml",
+        repository / "b" / ".pre-commit-config.yaml",
+    ]
+
+
+def test_group_by_project(repository: Path, tmp_path_factory) -> None:
+    orphan = tmp_path_factory.mktemp("orphan") / ".pre-commit-config.yaml"
+    configs = [*monorepo.discover_configs(repository), orphan]
+
+    groups, errors = monorepo.group_by_project(configs)
+
+    assert groups == {
+        repository / "a": [
+            repository / "a" / ".pre-commit-config.yaml",
+            repository / "a" / "sub" / ".pre-commit-config.yaml",
+        ],
+        repository / "b": [repository / "b" / ".pre-commit-config.yaml"],
+    }
+    assert [error.pre_commit_path for error in errors] == [orphan]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_sync_monorepo(repository: Path, capsys, jobs: str) -> None:
+    argv = [
+        str(repository),
+        "--discover",
+        "--jobs",
+        jobs,
+        "--map",
+        "pyright-python=pyright",
+    ]
+
+    assert monorepo.sync_monorepo(argv=argv) == 1
+    assert capsys.readouterr().out.splitlines() == [
+        f"{repository / 'a' / '.pre-commit-config.yaml'}: 1 change(s)",
+        f"{repository / 'a' / 'sub' / '.pre-commit-config.yaml'}: 1 change(s)",
+        f"{repository / 'b' / '.pre-commit-config.yaml'}: 1 change(s)",
+    ]
+    assert "rev: v1.1.355" in (repository / "b" / ".pre-commit-config.yaml").read_text()
+
+    # Nothing left to change
+    assert monorepo.sync_monorepo(argv=argv) == 0
+
+
+def test_sync_project__loads_project_once(repository: Path, mocker) -> None:
+    load_project = mocker.spy(project_cache, "load_project")
+    args = monorepo.get_sync_monorepo_parser().parse_args([])
+    configs = [
+        repository / "a" / ".pre-commit-config.yaml",
+        repository / "a" / "sub" / ".pre-commit-config.yaml",
+    ]
+
+    results = monorepo.sync_project(args, repository / "a", configs)
+
+    assert load_project.call_count == 1
+    assert [result.error for result in results] == [None, None]
+
+
+def test_sync_project__cache_stats(repository: Path, capsys) -> None:
+    args = monorepo.get_sync_monorepo_parser().parse_args(["--cache-stats"])
+    configs = [
+        repository / "a" / ".pre-commit-config.yaml",
+        repository / "a" / "sub" / ".pre-commit-config.yaml",
+    ]
+
+    monorepo.sync_project(args, repository / "a", configs)
+
+    (line,) = capsys.readouterr().out.splitlines()
+    assert line.startswith("poetry-to-pre-commit cache: this run: ")
+
+
+def test_sync_project__errors(repository: Path) -> None:
+    args = monorepo.get_sync_monorepo_parser().parse_args([])
+    missing = repository / "a" / "missing" / ".pre-commit-config.yaml"
+
+    (result,) = monorepo.sync_project(args, repository / "a", [missing])
+
+    assert result.error and "FileNotFoundError" in result.error
+    assert str(result).startswith(f"{missing}: error: FileNotFoundError")
+
+
+def test_sync_monorepo__skip_unchanged(repository: Path, capsys) -> None:
+    argv = [str(repository / "b"), "--skip-unchanged"]
+    monorepo.sync_monorepo(argv=argv)
+    capsys.readouterr()
+
+    assert monorepo.sync_monorepo(argv=argv) == 0
+    assert capsys.readouterr().out.endswith(": unchanged (skipped)\n")
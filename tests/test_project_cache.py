@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from poetry_to_pre_commit import common, project_cache, toml_reader
+
+
+@pytest.fixture
+def cache(cache_dir: Path) -> project_cache.Cache:
+    return project_cache.Cache(directory=cache_dir)
+
+
+def test_load_project__miss_then_hit(
+    poetry_cwd: Path, cache: project_cache.Cache, mocker
+) -> None:
+    load = mocker.spy(toml_reader.LazyTomlProject, "load")
+
+    first = project_cache.load_project(cwd=poetry_cwd, cache=cache)
+    packages = first.packages
+    cache.flush()
+    second = project_cache.load_project(cwd=poetry_cwd, cache=cache)
+
+    assert load.call_count == 1
+    assert second.packages == packages
+    assert second.dependency_graph == first.dependency_graph
+    assert cache.stats == project_cache.CacheStats(hits=1, misses=1)
+    assert (cache.directory / ".gitignore").read_text() == "*\n"
+
+
+def test_load_project__scanned_not_written(
+    poetry_cwd: Path, cache: project_cache.Cache
+) -> None:
+    project = project_cache.load_project(cwd=poetry_cwd, cache=cache)
+    assert project.find_packages({"attrs"})
+    cache.flush()
+
+    assert not cache.directory.exists()
+    assert cache.pending == {}
+
+
+def test_load_project__same_as_backend(
+    poetry_cwd: Path, cache: project_cache.Cache
+) -> None:
+    poetry_project = common.PoetryProject(cwd=poetry_cwd)
+
+    project = project_cache.load_project(cwd=poetry_cwd, backend="poetry", cache=cache)
+
+    assert sorted(project.packages) == sorted(poetry_project.packages)
+    assert project.group_names == poetry_project.group_names
+    for group in project.group_names:
+        assert sorted(project.get_group_dependencies(group)) == sorted(
+            poetry_project.get_group_dependencies(group)
+        )
+
+
+def test_load_project__no_cache(poetry_cwd: Path) -> None:
+    project = project_cache.load_project(cwd=poetry_cwd, cache=None)
+
+    assert isinstance(project, toml_reader.LazyTomlProject)
+
+
+def test_load_project__no_pyproject(tmp_path: Path, cache: project_cache.Cache) -> None:
+    # The Poetry backend will raise a proper error when used
+    project = project_cache.load_project(cwd=tmp_path, cache=cache)
+
+    assert isinstance(project, common.PoetryProject)
+
+
+def test_get_cache_key__changes_with_lock(tmp_path: Path) -> None:
+    pyproject = tmp_path / "pyproject.toml"
+    pyproject.write_text("")
+    before = project_cache.get_cache_key(pyproject_path=pyproject, backend="auto")
+    (tmp_path / "poetry.lock").write_text("")
+    after = project_cache.get_cache_key(pyproject_path=pyproject, backend="auto")
+    other_backend = project_cache.get_cache_key(
+        pyproject_path=pyproject, backend="poetry"
+    )
+
+    assert len({before, after, other_backend}) == 3
+
+
+def test_cache__get_corrupted(cache: project_cache.Cache) -> None:
+    cache.directory.mkdir()
+    (cache.directory / "key.pickle").write_bytes(b"not a pickle")
+
+    assert cache.get("key") is None
+    assert cache.stats.misses == 1
+
+
+def test_cache__eviction(cache_dir: Path) -> None:
+    cache = project_cache.Cache(directory=cache_dir, max_entries=2)
+    project = toml_reader.TomlProject(packages=[], groups={})
+    for i, key in enumerate("ab"):
+        cache.set(key, project)
+        os.utime(cache_dir / f"{key}.pickle", (i, i))
+    # Using "a" makes it the most recently used
+    assert cache.get("a") == project
+    cache.set("c", project)
+
+    assert sorted(path.name for path in cache_dir.glob("*.pickle")) == [
+        "a.pickle",
+        "c.pickle",
+    ]
+    assert cache.stats.evictions == 1
+
+
+def test_cache__eviction_by_size(cache_dir: Path) -> None:
+    cache = project_cache.Cache(directory=cache_dir, max_bytes=1)
+    project = toml_reader.TomlProject(packages=[], groups={})
+    cache.set("a", project)
+    os.utime(cache_dir / "a.pickle", (0, 0))
+    cache.set("b", project)
+
+    # The most recently used entry is kept, even if it's too large
+    assert [path.name for path in cache_dir.glob("*.pickle")] == ["b.pickle"]
+    assert cache.stats.evictions == 1
+
+
+def test_record_stats(cache: project_cache.Cache) -> None:
+    cache.directory.mkdir()
+    cache.stats = project_cache.CacheStats(hits=3, misses=1)
+    cache.record_stats()
+    total = cache.record_stats()
+
+    assert total == project_cache.CacheStats(hits=6, misses=2)
+    assert total.hit_rate == 0.75
+
+
+def test_ensure_cache_dir(tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+
+    directory = project_cache.ensure_cache_dir(cache_dir, "sub")
+    assert project_cache.ensure_cache_dir(cache_dir, "sub") == directory
+
+    assert directory == cache_dir / "sub"
+    assert directory.is_dir()
+    assert (cache_dir / ".gitignore").read_text() == "*\n"
+
+
+def test_get_cache__no_pyproject(tmp_path: Path) -> None:
+    assert project_cache.get_cache(cwd=tmp_path) is None
+
+
+def test_get_cache_dir__default(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.delenv(project_cache.CACHE_DIR_ENV_VAR)
+
+    assert (
+        project_cache.get_cache_dir(tmp_path)
+        == tmp_path / ".cache" / "poetry-to-pre-commit"
+    )
+
+
+def test_print_stats(poetry_cwd: Path, capsys) -> None:
+    cache = project_cache.get_cache(cwd=poetry_cwd)
+    project_cache.load_project(cwd=poetry_cwd, cache=cache)
+    project_cache.print_stats(cache)
+    project_cache.print_stats(None)
+
+    first, second = capsys.readouterr().out.splitlines()
+    assert first == (
+        "poetry-to-pre-commit cache: this run: 0 hits, 1 misses, 0 evictions "
+        "(0% hit rate); total: 0 hits, 1 misses, 0 evictions (0% hit rate)"
+    )
+    assert second == "poetry-to-pre-commit cache: disabled"
+
+
+def test_load_project__resident(
+    tmp_path: Path, poetry_cwd: Path, cache: project_cache.Cache, mocker
+) -> None:
+    for name in ("pyproject.toml", "poetry.lock"):
+        (tmp_path / name).write_bytes((poetry_cwd / name).read_bytes())
+    mocker.patch.object(project_cache, "resident", project_cache.ResidentProjects())
+    get = mocker.spy(cache, "get")
+
+    first = project_cache.load_project(cwd=tmp_path, cache=cache)
+    second = project_cache.load_project(cwd=tmp_path, cache=cache)
+    assert second is first
+    assert get.call_count == 1
+
+    lock = tmp_path / "poetry.lock"
+    lock.write_text(lock.read_text() + "\n")
+    assert project_cache.load_project(cwd=tmp_path, cache=cache) is not first
+    assert get.call_count == 2
+
+
+def test_resident_projects__eviction(tmp_path: Path) -> None:
+    resident = project_cache.ResidentProjects(max_entries=2)
+    projects = [toml_reader.TomlProject(packages=[], groups={}) for _ in range(3)]
+    resident.set(("a",), projects[0])
+    resident.set(("b",), projects[1])
+    resident.get(("a",))
+    resident.set(("c",), projects[2])
+
+    assert list(resident.entries) == [("a",), ("c",)]
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from poetry_to_pre_commit import (
+    common,
+    requirements,
+    sync_all,
+    sync_hooks_additional_dependencies,
+    toml_reader,
+)
+
+
+def test_parse_lock_hashes(poetry_cwd: Path) -> None:
+    hashes = requirements.parse_lock_hashes(
+        toml_reader.load_toml(poetry_cwd / "poetry.lock")
+    )
+
+    assert hashes["attrs"] == [
+        "sha256:99b87a485a5820b23b879f04c2305b44b951b502fd64be915879d77a7e8fc6f1",
+        "sha256:935dc3b529c262f6cf76e50877d35a4bd3c1de194fd41f47a2b7ae8f19971f30",
+    ]
+
+
+def test_parse_lock_hashes__legacy() -> None:
+    lock = {
+        "package": [{"name": "Foo_Bar", "version": "1"}],
+        "metadata": {
+            "lock-version": "1.1",
+            "files": {"Foo_Bar": [{"file": "foo.whl", "hash": "sha256:abc"}]},
+        },
+    }
+
+    assert requirements.parse_lock_hashes(lock) == {"foo-bar": ["sha256:abc"]}
+
+
+def test_format_requirements() -> None:
+    packages = [
+        common.PoetryPackage("b", "2", frozenset({"x"})),
+        common.PoetryPackage("a", "1"),
+    ]
+    hashes = {"a": ["sha256:1", "sha256:2"], "b": ["sha256:3"]}
+
+    assert requirements.format_requirements(packages, hashes) == (
+        "a==1 \\\n    --hash=sha256:1 \\\n    --hash=sha256:2\nb[x]==2 \\\n    --hash=sha256:3\n"
+    )
+
+
+def test_format_requirements__missing_hashes() -> None:
+    packages = [common.PoetryPackage("a", "1"), common.PoetryPackage("b", "1")]
+
+    with pytest.raises(SystemError, match="no file hashes for: b"):
+        requirements.format_requirements(packages, {"a": ["sha256:1"]})
+
+
+def test_write_hooks_requirements__markers(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text(
+        '[tool.poetry]\nname = "fake"\n\n'
+        '[tool.poetry.group.lint.dependencies]\na = "*"\n\n'
+        '[tool.poetry.group.types.dependencies]\nb = "*"\n'
+    )
+    lock_path = tmp_path / "poetry.lock"
+    lock_path.write_text(
+        '[[package]]\nname = "a"\nversion = "1"\n'
+        'files = [{file = "a-1.whl", hash = "sha256:1"}]\n\n'
+        '[package.dependencies]\nb = {version = "*", markers = "sys_platform == \\"win32\\""}\n\n'
+        '[[package]]\nname = "b"\nversion = "2"\n'
+        'files = [{file = "b-2.whl", hash = "sha256:2"}]\n\n'
+        '[metadata]\nlock-version = "2.0"\n'
+    )
+    project = toml_reader.TomlProject.load(cwd=tmp_path)
+
+    (path,) = requirements.write_hooks_requirements(
+        directory=tmp_path / "reqs",
+        project=project,
+        bind={"mypy": {"lint"}},
+        lock_path=lock_path,
+    )
+
+    assert path.read_text().splitlines()[1:] == [
+        "a==1 \\",
+        "    --hash=sha256:1",
+        'b==2; sys_platform == "win32" \\',
+        "    --hash=sha256:2",
+    ]
+    # Once the groups are merged, b is always needed, and listed once
+    (path,) = requirements.write_hooks_requirements(
+        directory=tmp_path / "reqs",
+        project=project,
+        bind={"mypy": {"lint", "types"}},
+        lock_path=lock_path,
+    )
+    assert path.read_text().splitlines()[3:] == ["b==2 \\", "    --hash=sha256:2"]
+
+
+def test_sync_hooks_additional_dependencies__requirements_dir(
+    tmp_path: Path, poetry_cwd: Path
+) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text("repos: []\n")
+
+    sync_hooks_additional_dependencies.sync_hooks_additional_dependencies(
+        argv=["--bind=mypy=types", f"--requirements-dir={tmp_path / 'reqs'}"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    lines = (tmp_path / "reqs" / "mypy.txt").read_text().splitlines()
+    assert lines[0].startswith("# Generated by poetry-to-pre-commit")
+    # The whole closure is pinned, each package with its hashes
+    assert [line for line in lines if not line.startswith(("#", " "))] == [
+        "psycopg[pool]==3.1.18 \\",
+        "psycopg-pool==3.2.1 \\",
+        "types-requests==2.31.0.20240311 \\",
+        "typing-extensions==4.10.0 \\",
+        'tzdata==2024.1; sys_platform == "win32" \\',
+        "urllib3==2.2.2 \\",
+    ]
+    assert (
+        "    --hash=sha256:4d5a0a5a8590906daa58ebd5f3cfc34091377354a1acced269dd10faf55da60e \\"
+        in lines
+    )
+
+
+def test_sync_all__requirements_dir_unchanged(tmp_path: Path, poetry_cwd: Path) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text("repos: []\n")
+    argv = ["--bind=mypy=main", f"--requirements-dir={tmp_path}"]
+
+    sync_all.sync_all(argv=argv, pre_commit_path=pre_commit_path, poetry_cwd=poetry_cwd)
+    path = tmp_path / "mypy.txt"
+    mtime = path.stat().st_mtime_ns
+    sync_all.sync_all(argv=argv, pre_commit_path=pre_commit_path, poetry_cwd=poetry_cwd)
+
+    assert path.stat().st_mtime_ns == mtime
+    assert "attrs==23.2.0 \\\n" in path.read_text()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from poetry_to_pre_commit import project_cache, server, sync_repos
+
+CONFIG = "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1.1.300\n"
+
+
+@pytest.fixture
+def running_server(socket_path: Path):
+    thread = threading.Thread(target=server.serve, args=(socket_path,))
+    thread.start()
+    while not socket_path.exists():
+        pass
+    yield socket_path
+    server.server(argv=["--stop"])
+    thread.join()
+
+
+def test_forward__no_server() -> None:
+    assert server.forward("sync-repos", []) is None
+
+
+def test_forward__not_a_socket(socket_path: Path) -> None:
+    socket_path.write_text("")
+
+    assert server.forward("sync-repos", []) is None
+
+
+def test_forward__unsafe_directory(running_server: Path) -> None:
+    running_server.parent.chmod(0o777)
+    try:
+        assert server.forward("sync-repos", ["--unknown"]) is None
+    finally:
+        running_server.parent.chmod(0o700)
+
+
+def test_get_socket_path(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.delenv(server.SOCKET_ENV_VAR)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+
+    assert server.get_socket_path() == tmp_path / "poetry-to-pre-commit.sock"
+
+
+def test_get_socket_path__no_runtime_dir(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.delenv(server.SOCKET_ENV_VAR)
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr("tempfile.gettempdir", lambda: str(tmp_path))
+
+    path = server.get_socket_path()
+
+    assert path.name == "server.sock"
+    assert path.parent.parent == tmp_path
+
+
+def test_is_safe_directory(tmp_path: Path) -> None:
+    directory = tmp_path / "dir"
+    directory.mkdir(mode=0o700)
+    assert server.is_safe_directory(directory)
+
+    directory.chmod(0o777)
+    assert not server.is_safe_directory(directory)
+
+    directory.chmod(0o1777)
+    assert server.is_safe_directory(directory)
+
+    link = tmp_path / "link"
+    link.symlink_to(directory)
+    assert not server.is_safe_directory(link)
+
+
+def test_forward(
+    running_server: Path, tmp_path: Path, poetry_cwd: Path, monkeypatch, capsys
+) -> None:
+    for name in ("pyproject.toml", "poetry.lock"):
+        (tmp_path / name).write_bytes((poetry_cwd / name).read_bytes())
+    config = tmp_path / ".pre-commit-config.yaml"
+    config.write_text(CONFIG)
+    monkeypatch.chdir(tmp_path)
+
+    argv = ["--map", "pyright-python=pyright", "--check"]
+    assert server.forward("sync-repos", argv) == 1
+    assert "v1.1.300 -> v1.1.355" in capsys.readouterr().out
+    assert server.forward("sync-repos", argv[:2]) == 0
+
+    assert "rev: v1.1.355" in config.read_text()
+    assert project_cache.resident is not None
+    assert len(project_cache.resident.entries) == 1
+
+
+def test_forward__error(running_server: Path, capsys) -> None:
+    assert server.forward("sync-repos", ["--unknown"]) == 2
+    assert "unrecognized arguments: --unknown" in capsys.readouterr().err
+
+
+def test_forward__other_version(running_server: Path, monkeypatch) -> None:
+    monkeypatch.setattr(project_cache, "get_tool_version", lambda: "0.0.0")
+
+    assert server.forward("sync-repos", ["--unknown"]) is None
+
+
+def test_forward__unknown_hook(running_server: Path) -> None:
+    assert server.forward("unknown", []) is None
+
+
+def test_serve__already_running(running_server: Path) -> None:
+    with pytest.raises(SystemExit):
+        server.serve(running_server)
+
+
+def test_serve__idle_timeout(socket_path: Path) -> None:
+    server.serve(socket_path, idle_timeout=0.01)
+
+    assert not socket_path.exists()
+
+
+def test_serve__creates_private_directory(tmp_path: Path) -> None:
+    path = tmp_path / "private" / "server.sock"
+
+    server.serve(path, idle_timeout=0.01)
+
+    assert path.parent.stat().st_mode & 0o777 == 0o700
+
+
+def test_serve__unsafe_directory(tmp_path: Path) -> None:
+    directory = tmp_path / "shared"
+    directory.mkdir()
+    directory.chmod(0o777)
+
+    with pytest.raises(SystemExit):
+        server.serve(directory / "server.sock")
+
+
+def test_server__stop_no_server(capsys) -> None:
+    assert server.server(argv=["--stop"]) == 1
+
+
+def test_sync_repos_cli__fallback(
+    tmp_path: Path, poetry_cwd: Path, monkeypatch
+) -> None:
+    for name in ("pyproject.toml", "poetry.lock"):
+        (tmp_path / name).write_bytes((poetry_cwd / name).read_bytes())
+    config = tmp_path / ".pre-commit-config.yaml"
+    config.write_text(CONFIG)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["sync-repos", "--map", "pyright-python=pyright"])
+
+    sync_repos.sync_repos_cli()
+
+    assert "rev: v1.1.355" in config.read_text()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import ruamel.yaml
+
+from poetry_to_pre_commit import common, project_cache, sync_all
+
+
+def test_get_sync_all_parser() -> None:
+    parser = sync_all.get_sync_all_parser()
+    args = parser.parse_args(
+        [
+            *("--skip", "a", "--map", "b=c", "--bind", "mypy=types"),
+            *("--no-new-deps", "--transitive", "f"),
+        ]
+    )
+
+    assert args.filenames == ["f"]
+    assert args.skip == ["a"]
+    assert args.map == [("b", "c")]
+    assert args.bind == [("mypy", {"types"})]
+    assert args.no_new_deps is True
+    assert args.transitive is True
+
+
+def test_sync_all(tmp_path: Path, poetry_cwd: Path, mocker) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    ruamel.yaml.YAML().dump(
+        {
+            "repos": [
+                {
+                    "repo": "https://github.com/foo/pyright-python",
+                    "rev": "v1.1.300",
+                    "hooks": [{"id": "pyright"}],
+                }
+            ]
+        },
+        pre_commit_path,
+    )
+    load_project = mocker.spy(project_cache, "load_project")
+    roundtrip = mocker.spy(common, "pre_commit_config_roundtrip")
+
+    sync_all.sync_all(
+        argv=["--map", "pyright-python=pyright", "--bind", "pyright=types,main"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    result = ruamel.yaml.YAML().load(pre_commit_path.read_text())
+    assert result["repos"][0]["rev"] == "v1.1.355"
+    assert result["repos"][0]["hooks"][0]["additional_dependencies"] == [
+        "attrs==23.2.0",
+        "psycopg[pool]==3.1.18",
+        "types-requests==2.31.0.20240311",
+    ]
+    assert load_project.call_count == 1
+    assert roundtrip.call_count == 1
@@ -4,9 +4,11 @@ from pathlib import Path
 
 import pytest
 import ruamel.yaml
+from poetry import factory
+from poetry.packages.locker import Locker
 
-from poetry_to_pre_commit import sync_hooks_additional_dependencies
-from poetry_to_pre_commit.common import PoetryPackage
+from poetry_to_pre_commit import common, sync_hooks_additional_dependencies, toml_reader
+from poetry_to_pre_commit.common import AdditionalDependenciesChange, PoetryPackage
 
 
 @pytest.mark.parametrize(
@@ -66,18 +68,253 @@ def test_get_poetry_deps__error(poetry_cwd: Path) -> None:
         )
 
 
+@pytest.mark.parametrize("backend", ["toml", "poetry"])
+def test_get_poetry_deps__transitive(poetry_cwd: Path, backend: str) -> None:
+    project = common.get_project(cwd=poetry_cwd, backend=backend)
+
+    results = sync_hooks_additional_dependencies.get_poetry_deps(
+        project=project, group="types", transitive=True
+    )
+
+    assert sorted(str(package) for package in results) == [
+        "psycopg-pool==3.2.1",
+        "psycopg[pool]==3.1.18",
+        "types-requests==2.31.0.20240311",
+        "typing-extensions==4.10.0",
+        'tzdata==2024.1; sys_platform == "win32"',
+        "urllib3==2.2.2",
+    ]
+
+
+@pytest.fixture
+def markers_cwd(tmp_path: Path, poetry_cwd: Path) -> Path:
+    pyproject = (poetry_cwd / "pyproject.toml").read_text()
+    pyproject = pyproject.replace(
+        'attrs = "*"', 'attrs = { version = "*", python = "^3.12" }'
+    ).replace(
+        'pylint = "*"',
+        'pylint = { version = "*", markers = "sys_platform==\'win32\'" }',
+    )
+    (tmp_path / "pyproject.toml").write_text(pyproject)
+    (tmp_path / "poetry.lock").write_text((poetry_cwd / "poetry.lock").read_text())
+    return tmp_path
+
+
+@pytest.mark.parametrize("transitive", [False, True])
+@pytest.mark.parametrize("backend", ["toml", "poetry"])
+def test_get_poetry_deps__markers(
+    markers_cwd: Path, backend: str, transitive: bool
+) -> None:
+    project = common.get_project(cwd=markers_cwd, backend=backend)
+
+    results = [
+        str(package)
+        for group in ("main", "dev")
+        for package in sync_hooks_additional_dependencies.get_poetry_deps(
+            project=project, group=group, transitive=transitive
+        )
+        if package.name in ("attrs", "pylint", "colorama")
+    ]
+
+    if transitive:
+        assert results == [
+            'attrs==23.2.0; python_version >= "3.12" and python_version < "4.0"',
+            'pylint==3.1.0; sys_platform == "win32"',
+            'colorama==0.4.6; sys_platform == "win32"',
+        ]
+    else:
+        assert results == ["attrs==23.2.0", "pylint==3.1.0"]
+
+
+def test_get_closure_markers() -> None:
+    graph = {
+        "a": common.PackageDependencies(
+            required=(
+                common.LockedDependency("b", markers='sys_platform == "win32"'),
+                common.LockedDependency("c", markers='python_version < "3.11"'),
+            ),
+        ),
+        "b": common.PackageDependencies(
+            required=(common.LockedDependency("d", markers='python_version < "3.11"'),)
+        ),
+        "c": common.PackageDependencies(required=(common.LockedDependency("d"),)),
+        # Always needed by a root
+        "e": common.PackageDependencies(required=(common.LockedDependency("b"),)),
+    }
+    roots = [common.Dependency("a"), common.Dependency("e", markers='os_name == "nt"')]
+    extras_by_name = sync_hooks_additional_dependencies.get_closure(graph, roots)
+
+    assert sync_hooks_additional_dependencies.get_closure_markers(
+        graph, roots, extras_by_name
+    ) == {
+        "a": "",
+        "b": 'os_name == "nt" or sys_platform == "win32"',
+        "c": 'python_version < "3.11"',
+        # The path through b is implied by the path through c
+        "d": 'python_version < "3.11"',
+        "e": 'os_name == "nt"',
+    }
+
+
+def test_get_closure() -> None:
+    graph = {
+        "a": common.PackageDependencies(
+            required=(common.LockedDependency("b"),),
+            extras={"x": (common.LockedDependency("c", frozenset({"y"})),)},
+        ),
+        # Cycle
+        "b": common.PackageDependencies(required=(common.LockedDependency("a"),)),
+        "c": common.PackageDependencies(
+            extras={"y": (common.LockedDependency("d"),)},
+        ),
+    }
+
+    assert sync_hooks_additional_dependencies.get_closure(
+        graph, [common.Dependency("b")]
+    ) == {"a": set(), "b": set()}
+    # The extra is requested after "a" was expanded
+    assert sync_hooks_additional_dependencies.get_closure(
+        graph, [common.Dependency("b"), common.Dependency("a", frozenset({"x"}))]
+    ) == {"a": {"x"}, "b": set(), "c": {"y"}, "d": set()}
+
+
+def test_get_closure__environment() -> None:
+    graph = {
+        "a": common.PackageDependencies(
+            required=(
+                common.LockedDependency("b", markers="sys_platform == 'win32'"),
+                common.LockedDependency("c", markers="sys_platform != 'win32'"),
+            )
+        ),
+        "b": common.PackageDependencies(required=(common.LockedDependency("d"),)),
+    }
+
+    assert sync_hooks_additional_dependencies.get_closure(
+        graph, [common.Dependency("a")], environment={"sys_platform": "linux"}
+    ) == {"a": set(), "c": set()}
+    assert sync_hooks_additional_dependencies.get_closure(
+        graph, [common.Dependency("a")]
+    ) == {"a": set(), "b": set(), "c": set(), "d": set()}
+
+
+@pytest.mark.parametrize(
+    "markers, environment, expected",
+    [
+        ("", {"python_version": "3.8"}, True),
+        ('python_version < "3.9"', None, True),
+        ('python_version < "3.9"', {"python_version": "3.8"}, True),
+        ('python_version < "3.9"', {"python_version": "3.12"}, False),
+        ("not a marker", {"python_version": "3.12"}, True),
+    ],
+)
+def test_applies(markers: str, environment: dict | None, expected: bool) -> None:
+    assert sync_hooks_additional_dependencies.applies(markers, environment) is expected
+
+
+def test_get_environments() -> None:
+    bind = {"mypy": {"types"}, "pylint": {"dev"}}
+
+    assert (
+        sync_hooks_additional_dependencies.get_environments(
+            bind, prune_markers=False, marker_env={}
+        )
+        == {}
+    )
+    environments = sync_hooks_additional_dependencies.get_environments(
+        bind, prune_markers=False, marker_env={"mypy": {"sys_platform": "win32"}}
+    )
+    assert environments.keys() == {"mypy"}
+    assert environments["mypy"]["sys_platform"] == "win32"
+    assert "python_version" in environments["mypy"]
+    assert sync_hooks_additional_dependencies.get_environments(
+        bind, prune_markers=True, marker_env={}
+    ).keys() == {"mypy", "pylint"}
+
+
+def test_sync_hooks_with_project__prune_markers() -> None:
+    project = toml_reader.TomlProject(
+        packages=[
+            PoetryPackage(name="attrs", version="1"),
+            PoetryPackage(name="colorama", version="2"),
+        ],
+        groups={
+            "dev": [
+                common.Dependency("attrs"),
+                common.Dependency("colorama", markers='sys_platform == "win32"'),
+            ]
+        },
+    )
+
+    def sync(**kwargs) -> list[str]:
+        config = {"repos": [{"hooks": [{"id": "pylint"}, {"id": "flake8"}]}]}
+        changes = sync_hooks_additional_dependencies.sync_hooks_with_project(
+            config,
+            project,
+            bind={"pylint": {"dev"}, "flake8": {"dev"}},
+            transitive=True,
+            **kwargs,
+        )
+        return [f"{c.hook_id}: {' '.join(c.new)}" for c in changes]
+
+    assert sync() == [
+        'pylint: attrs==1 colorama==2; sys_platform == "win32"',
+        'flake8: attrs==1 colorama==2; sys_platform == "win32"',
+    ]
+    assert sync(marker_env={"pylint": {"sys_platform": "linux"}}) == [
+        "pylint: attrs==1",
+        'flake8: attrs==1 colorama==2; sys_platform == "win32"',
+    ]
+    assert sync(prune_markers=True, marker_env={"flake8": {"sys_platform": "win32"}})[
+        1
+    ] == ("flake8: attrs==1 colorama==2")
+
+
+def test_format_marker_env() -> None:
+    assert sync_hooks_additional_dependencies.format_marker_env(
+        "mypy=python_version=3.12"
+    ) == ("mypy", ("python_version", "3.12"))
+    with pytest.raises(ValueError):
+        sync_hooks_additional_dependencies.format_marker_env("mypy")
+
+
+def test_get_deps_by_group__one_closure_per_group(poetry_cwd: Path, mocker) -> None:
+    get_closure = mocker.spy(sync_hooks_additional_dependencies, "get_closure")
+    project = common.get_project(cwd=poetry_cwd)
+
+    result = sync_hooks_additional_dependencies.get_deps_by_group(
+        project=project,
+        bind={"mypy": {"main", "types"}, "pyright": {"types", "dev"}, "a": {"dev"}},
+        transitive=True,
+    )
+
+    assert get_closure.call_count == 3
+    assert set(result) == {"main", "types", "dev"}
+
+
 def test__sync_hooks_additional_dependencies() -> None:
     config = {"repos": [{"hooks": [{"id": "mypy"}, {"id": "foo"}]}]}
     deps_by_group = {
-        "types": {"bar==1", "baz[e]==2"},
-        "main": {"qux==3"},
+        "types": {
+            PoetryPackage("bar", "1"),
+            PoetryPackage("baz", "2", frozenset({"e"})),
+        },
+        "main": {PoetryPackage("qux", "3")},
     }
     bind = {"mypy": {"types", "main", "unknown"}, "other_unknown": {"abc"}}
-    sync_hooks_additional_dependencies._sync_hooks_additional_dependencies(
+    changes = sync_hooks_additional_dependencies._sync_hooks_additional_dependencies(
         config=config,
         deps_by_group=deps_by_group,
         bind=bind,
     )
+    assert changes == [
+        AdditionalDependenciesChange(
+            repo_index=0,
+            hook_index=0,
+            hook_id="mypy",
+            old=None,
+            new=("bar==1", "baz[e]==2", "qux==3"),
+        )
+    ]
     assert config == {
         "repos": [
             {
@@ -130,7 +367,7 @@ def test_sync_hooks_additional_dependencies(tmp_path: Path, poetry_cwd: Path) ->
     ("poetry_deps", "additional_deps", "expected_additional_deps"),
     [
         ({PoetryPackage("a", "1"), PoetryPackage("b")}, ["a"], ["a==1"]),
-        ({PoetryPackage("a", "1"), PoetryPackage("b")}, ["a[x]==2"], ["a==1"]),
+        ({PoetryPackage("a", "1"), PoetryPackage("b")}, ["a[x]==2"], ["a[x]==1"]),
         (
             {PoetryPackage("a", "1", frozenset({"x"})), PoetryPackage("b")},
             ["a"],
@@ -149,6 +386,22 @@ def test_sync_hooks_additional_dependencies(tmp_path: Path, poetry_cwd: Path) ->
         ({PoetryPackage("a", "1"), PoetryPackage("b")}, ["a == 2"], ["a==1"]),
         ({PoetryPackage("a", "1"), PoetryPackage("b")}, ["a<=2"], ["a==1"]),
         ({PoetryPackage("a", "1"), PoetryPackage("b")}, ["a>=1"], ["a==1"]),
+        ({PoetryPackage("a-b", "1"), PoetryPackage("c")}, ["A_B"], ["a-b==1"]),
+        (
+            {PoetryPackage("a", "1"), PoetryPackage("b")},
+            ["a>=1; python_version < '3.12'"],
+            ['a==1; python_version < "3.12"'],
+        ),
+        (
+            {PoetryPackage("a", "1", frozenset({"x"})), PoetryPackage("b")},
+            ["a[y]; sys_platform == 'linux'"],
+            ['a[x,y]==1; sys_platform == "linux"'],
+        ),
+        (
+            {PoetryPackage("a", "1"), PoetryPackage("b")},
+            ["--find-links=wheels", "a"],
+            ["a==1"],
+        ),
     ],
 )
 def test__sync_hooks_additional_dependencies__no_new_deps(
@@ -180,13 +433,105 @@ def test__sync_hooks_additional_dependencies__no_new_deps(
     }
 
 
+@pytest.mark.parametrize(
+    ("package_markers", "requirement_markers", "expected"),
+    [
+        ("", "", ""),
+        ('os_name == "nt"', "", 'os_name == "nt"'),
+        ("", 'os_name == "nt"', 'os_name == "nt"'),
+        ("os_name=='nt'", 'os_name == "nt"', 'os_name == "nt"'),
+        (
+            'os_name == "nt"',
+            'os_name == "nt" and python_version < "3.12"',
+            'os_name == "nt" and python_version < "3.12"',
+        ),
+        (
+            'os_name == "nt" or python_version < "3.12"',
+            'os_name == "nt"',
+            '(os_name == "nt" or python_version < "3.12") and os_name == "nt"',
+        ),
+    ],
+)
+def test_combine_markers(package_markers, requirement_markers, expected) -> None:
+    assert (
+        sync_hooks_additional_dependencies.combine_markers(
+            package_markers, requirement_markers
+        )
+        == expected
+    )
+
+
+def test__sync_hooks_additional_dependencies__no_new_deps_twice() -> None:
+    config = {
+        "repos": [
+            {
+                "hooks": [
+                    {
+                        "id": "mypy",
+                        "additional_dependencies": [
+                            'a; python_version < "3.12"',
+                            "b",
+                        ],
+                    }
+                ]
+            }
+        ]
+    }
+    deps_by_group = {
+        "main": {
+            PoetryPackage("a", "1", markers='os_name == "nt"'),
+            PoetryPackage("b", "2", markers='os_name == "nt"'),
+        }
+    }
+
+    for _ in range(2):
+        sync_hooks_additional_dependencies._sync_hooks_additional_dependencies(
+            config=config,
+            deps_by_group=deps_by_group,
+            bind={"mypy": {"main"}},
+            no_new_deps=True,
+        )
+        assert config["repos"][0]["hooks"][0]["additional_dependencies"] == [
+            'a==1; os_name == "nt" and python_version < "3.12"',
+            'b==2; os_name == "nt"',
+        ]
+
+
+def test__sync_hooks_additional_dependencies__no_new_deps_parses_once() -> None:
+    config = {
+        "repos": [
+            {
+                "hooks": [
+                    {"id": hook_id, "additional_dependencies": ["a>=1", "b"]}
+                    for hook_id in ("mypy", "pyright")
+                ]
+            }
+        ]
+    }
+    sync_hooks_additional_dependencies._parse_requirement.cache_clear()
+
+    sync_hooks_additional_dependencies._sync_hooks_additional_dependencies(
+        config=config,
+        deps_by_group={"main": {PoetryPackage("a", "1"), PoetryPackage("b", "2")}},
+        bind={"mypy": {"main"}, "pyright": {"main"}},
+        no_new_deps=True,
+    )
+
+    cache_info = sync_hooks_additional_dependencies._parse_requirement.cache_info()
+    assert (cache_info.misses, cache_info.hits) == (2, 2)
+    assert cache_info.maxsize == sync_hooks_additional_dependencies.PARSE_CACHE_SIZE
+
+
 @pytest.mark.parametrize(
     ("additional_deps", "expected_additional_deps"),
     [
         ([], []),
         (["attrs", "psycopg"], ["attrs==23.2.0", "psycopg[pool]==3.1.18"]),
         (["attrs", "psycopg[pool]"], ["attrs==23.2.0", "psycopg[pool]==3.1.18"]),
-        (["attrs", "psycopg[dummy]"], ["attrs==23.2.0", "psycopg[pool]==3.1.18"]),
+        (
+            ["attrs", "psycopg[dummy]"],
+            ["attrs==23.2.0", "psycopg[dummy,pool]==3.1.18"],
+        ),
         (["attrs", "fastapi==1.0.0"], ["attrs==23.2.0"]),
     ],
 )
@@ -222,3 +567,105 @@ def test_sync_hooks_additional_dependencies__no_new_deps(
         result["repos"][0]["hooks"][0]["additional_dependencies"]
         == expected_additional_deps
     )
+
+
+@pytest.mark.parametrize("backend", ["toml", "poetry"])
+def test_sync_hooks_additional_dependencies__bind_declared_group_name(
+    tmp_path: Path, poetry_cwd: Path, backend: str
+) -> None:
+    project_path = tmp_path / "project"
+    project_path.mkdir()
+    (project_path / "pyproject.toml").write_text(
+        (poetry_cwd / "pyproject.toml")
+        .read_text()
+        .replace("group.types.dependencies", "group.Type_Stubs.dependencies")
+    )
+    (project_path / "poetry.lock").write_text((poetry_cwd / "poetry.lock").read_text())
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    ruamel.yaml.YAML().dump(
+        {"repos": [{"repo": "local", "hooks": [{"id": "mypy"}]}]}, pre_commit_path
+    )
+
+    sync_hooks_additional_dependencies.sync_hooks_additional_dependencies(
+        argv=["--bind", "mypy=Type_Stubs", "--backend", backend],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=project_path,
+    )
+
+    result = ruamel.yaml.YAML().load(pre_commit_path.read_text())
+    assert result["repos"][0]["hooks"][0]["additional_dependencies"] == [
+        "psycopg[pool]==3.1.18",
+        "types-requests==2.31.0.20240311",
+    ]
+
+
+def test_sync_hooks_additional_dependencies__loads_poetry_once(
+    tmp_path: Path, poetry_cwd: Path, mocker
+) -> None:
+    create_poetry = mocker.spy(factory.Factory, "create_poetry")
+    locked_repository = mocker.spy(Locker, "locked_repository")
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    ruamel.yaml.YAML().dump(
+        {"repos": [{"repo": "local", "hooks": [{"id": "mypy"}, {"id": "pyright"}]}]},
+        pre_commit_path,
+    )
+
+    sync_hooks_additional_dependencies.sync_hooks_additional_dependencies(
+        argv=[
+            "--bind",
+            "mypy=types,main",
+            "--bind",
+            "pyright=dev,types",
+            "--backend",
+            "poetry",
+        ],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    assert create_poetry.call_count == 1
+    assert locked_repository.call_count == 1
+
+
+def test__sync_hooks_additional_dependencies__unchanged() -> None:
+    config = {
+        "repos": [{"hooks": [{"id": "mypy", "additional_dependencies": ["a==1"]}]}]
+    }
+
+    changes = sync_hooks_additional_dependencies._sync_hooks_additional_dependencies(
+        config=config,
+        deps_by_group={"main": {PoetryPackage("a", "1")}},
+        bind={"mypy": {"main"}},
+    )
+
+    assert changes == []
+
+
+def test__sync_hooks_additional_dependencies__changed() -> None:
+    config = {
+        "repos": [
+            {
+                "hooks": [
+                    {"id": "mypy", "additional_dependencies": ["bar==0"]},
+                    {"id": "flake8", "additional_dependencies": ["qux==0"]},
+                    {"id": "pylint", "additional_dependencies": ["old==1"]},
+                ]
+            }
+        ]
+    }
+    deps_by_group = {
+        "types": {PoetryPackage(name="bar", version="1")},
+        "main": {PoetryPackage(name="qux", version="3")},
+    }
+    bind = {"mypy": {"types"}, "flake8": {"main"}, "pylint": {"main"}}
+    changes = sync_hooks_additional_dependencies._sync_hooks_additional_dependencies(
+        config=config,
+        deps_by_group=deps_by_group,
+        bind=bind,
+        changed={"bar", "old"},
+    )
+
+    assert [change.hook_id for change in changes] == ["mypy", "pylint"]
+    hooks = config["repos"][0]["hooks"]
+    assert hooks[1]["additional_dependencies"] == ["qux==0"]
+    assert hooks[2]["additional_dependencies"] == ["qux==3"]
@@ -20,6 +20,22 @@ def test_repo_url_to_pypi_name(input: str, expected: str) -> None:
     assert sync_repos.repo_url_to_pypi_name(input) == expected
 
 
+# Options that are common to all hooks
+DEFAULT_ARGS = {
+    "backend": "auto",
+    "no_cache": False,
+    "cache_stats": False,
+    "skip_unchanged": False,
+    "timings": False,
+    "trace": None,
+    "profile": None,
+    "incremental": None,
+    "install_hooks": None,
+    "check": False,
+    "diff": False,
+}
+
+
 @pytest.mark.parametrize(
     "input,expected",
     [
@@ -42,7 +58,7 @@ def test_repo_url_to_pypi_name(input: str, expected: str) -> None:
 def test_get_parser(input: list[str], expected: dict[str, list[str]]) -> None:
     parser = sync_repos.get_sync_repos_parser()
     args = parser.parse_args(input)
-    assert vars(args) == expected
+    assert vars(args) == {**DEFAULT_ARGS, **expected}
 
 
 def test_get_pre_commit_repos() -> None:
@@ -111,8 +127,24 @@ def test_write_precommit_config() -> None:
             {"repo": "https://github.com/foo/qux", "rev": "2.6"},
         ],
     }
-    sync_repos.sync_repos_in_precommit_config(repo_packages=projects, config=config)
+    changes = sync_repos.sync_repos_in_precommit_config(
+        repo_packages=projects, config=config
+    )
 
+    assert changes == [
+        common.RevChange(
+            repo_index=0,
+            repo="https://github.com/foo/bar",
+            old_rev="v1.2.3",
+            new_rev="v2.3.4",
+        ),
+        common.RevChange(
+            repo_index=1,
+            repo="https://github.com/foo/baz",
+            old_rev="2.4",
+            new_rev="2.5",
+        ),
+    ]
     assert config == {
         "repos": [
             {"repo": "https://github.com/foo/bar", "rev": "v2.3.4"},
@@ -141,3 +173,177 @@ def test_sync_repos(tmp_path: Path, poetry_cwd: Path) -> None:
     result = ruamel.yaml.YAML().load(pre_commit_path.read_text())
 
     assert result["repos"][0]["rev"] == "v1.1.355"
+
+
+def test_sync_repos__cache_stats(tmp_path: Path, poetry_cwd: Path, capsys) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text("repos: []\n")
+
+    # Poetry reads the whole lock, so the project is written to the cache
+    for _ in range(2):
+        sync_repos.sync_repos(
+            argv=["--cache-stats", "--backend=poetry"],
+            pre_commit_path=pre_commit_path,
+            poetry_cwd=poetry_cwd,
+        )
+
+    assert (
+        capsys.readouterr()
+        .out.splitlines()[-1]
+        .endswith("total: 1 hits, 1 misses, 0 evictions (50% hit rate)")
+    )
+
+
+def test_write_precommit_config__unchanged() -> None:
+    projects = [
+        (
+            sync_repos.PreCommitRepo(
+                repo="https://github.com/foo/bar",
+                pre_commit_rev="v1.2.3",
+            ),
+            common.PoetryPackage(name="bar", version="1.2.3"),
+        ),
+    ]
+    config = {"repos": [{"repo": "https://github.com/foo/bar", "rev": "v1.2.3"}]}
+
+    changes = sync_repos.sync_repos_in_precommit_config(
+        repo_packages=projects, config=config
+    )
+
+    assert changes == []
+
+
+def test_sync_repos__no_change_no_write(tmp_path: Path, poetry_cwd: Path) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    # Formatting that a dump would change
+    content = (
+        "repos:\n-   repo: https://github.com/foo/pyright-python\n    rev: v1.1.355\n"
+    )
+    pre_commit_path.write_text(content)
+
+    sync_repos.sync_repos(
+        argv=["--map", "pyright-python=pyright"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    assert pre_commit_path.read_text() == content
+
+
+def test_sync_repos__no_change_no_roundtrip(
+    tmp_path: Path, poetry_cwd: Path, mocker
+) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text(
+        "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1.1.355\n"
+    )
+    roundtrip = mocker.spy(common, "pre_commit_config_roundtrip")
+
+    sync_repos.sync_repos(
+        argv=["--map", "pyright-python=pyright"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    assert roundtrip.call_count == 0
+
+
+def test_sync_repos__no_fast_loader_loads_once(
+    tmp_path: Path, poetry_cwd: Path, mocker
+) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text(
+        "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1.1.300\n"
+    )
+    mocker.patch.object(common, "has_fast_loader", return_value=False)
+    load_config_fast = mocker.spy(common, "load_config_fast")
+
+    sync_repos.sync_repos(
+        argv=["--map", "pyright-python=pyright"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    assert load_config_fast.call_count == 0
+    assert "rev: v1.1.355" in pre_commit_path.read_text()
+
+
+def test_sync_repos__change_keeps_comments(tmp_path: Path, poetry_cwd: Path) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text(
+        "# hooks\n"
+        "repos:\n"
+        "  - repo: https://github.com/foo/pyright-python  # types\n"
+        "    rev: v1.1.300  # pinned\n"
+    )
+
+    sync_repos.sync_repos(
+        argv=["--map", "pyright-python=pyright"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    assert pre_commit_path.read_text() == (
+        "# hooks\n"
+        "repos:\n"
+        "  - repo: https://github.com/foo/pyright-python  # types\n"
+        "    rev: v1.1.355  # pinned\n"
+    )
+
+
+def test_sync_repos__check(tmp_path: Path, poetry_cwd: Path, capsys) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    text = (
+        "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1.1.300\n"
+    )
+    pre_commit_path.write_text(text)
+
+    with pytest.raises(SystemExit) as exc_info:
+        sync_repos.sync_repos(
+            argv=["--map", "pyright-python=pyright", "--check"],
+            pre_commit_path=pre_commit_path,
+            poetry_cwd=poetry_cwd,
+        )
+
+    assert exc_info.value.code == 1
+    assert pre_commit_path.read_text() == text
+    assert capsys.readouterr().out == (
+        f"{pre_commit_path} is out of sync:\n"
+        "  https://github.com/foo/pyright-python: rev v1.1.300 -> v1.1.355\n"
+    )
+
+
+def test_sync_repos__check_diff(tmp_path: Path, poetry_cwd: Path, capsys) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    text = (
+        "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1.1.300\n"
+    )
+    pre_commit_path.write_text(text)
+
+    with pytest.raises(SystemExit):
+        sync_repos.sync_repos(
+            argv=["--map", "pyright-python=pyright", "--check", "--diff"],
+            pre_commit_path=pre_commit_path,
+            poetry_cwd=poetry_cwd,
+        )
+
+    assert pre_commit_path.read_text() == text
+    assert capsys.readouterr().out.splitlines()[-2:] == [
+        "-    rev: v1.1.300",
+        "+    rev: v1.1.355",
+    ]
+
+
+def test_sync_repos__check_in_sync(tmp_path: Path, poetry_cwd: Path, capsys) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text(
+        "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1.1.355\n"
+    )
+
+    sync_repos.sync_repos(
+        argv=["--map", "pyright-python=pyright", "--check"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=poetry_cwd,
+    )
+
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import json
+import pstats
+from pathlib import Path
+
+from poetry_to_pre_commit import sync_repos, timing
+
+
+def test_span__no_listener() -> None:
+    with timing.span("a"):
+        pass
+
+    assert timing._depth == 0
+
+
+def test_listening() -> None:
+    recorder = timing.Recorder()
+
+    with timing.listening(recorder), timing.span("outer"), timing.span("inner"):
+        pass
+    with timing.span("ignored"):
+        pass
+
+    assert [(s.name, s.depth) for s in recorder.spans] == [
+        ("inner", 1),
+        ("outer", 0),
+    ]
+    inner, outer = recorder.spans
+    assert outer.start <= inner.start
+    assert outer.duration >= inner.duration
+
+
+def test_recorder() -> None:
+    recorder = timing.Recorder(
+        spans=[
+            timing.Span(name="inner", start=1.5, duration=0.25, depth=1),
+            timing.Span(name="outer", start=1.0, duration=1.0, depth=0),
+        ]
+    )
+
+    assert recorder.format() == (
+        "poetry-to-pre-commit timings:\n  outer: 1000.0 ms\n    inner: 250.0 ms"
+    )
+    assert recorder.to_trace()["traceEvents"] == [
+        {"name": "outer", "ph": "X", "ts": 0, "dur": 1000000, "pid": 0, "tid": 0},
+        {"name": "inner", "ph": "X", "ts": 500000, "dur": 250000, "pid": 0, "tid": 0},
+    ]
+
+
+def test_instrument__disabled(capsys) -> None:
+    with timing.instrument(), timing.span("a"):
+        pass
+
+    assert capsys.readouterr().out == ""
+
+
+def test_sync_repos__timings(tmp_path: Path, poetry_cwd: Path, capsys) -> None:
+    config = tmp_path / ".pre-commit-config.yaml"
+    config.write_text(
+        "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1\n"
+    )
+    trace = tmp_path / "trace.json"
+    profile = tmp_path / "profile.pstats"
+
+    sync_repos.sync_repos(
+        argv=[
+            "--map=pyright-python=pyright",
+            "--timings",
+            f"--trace={trace}",
+            f"--profile={profile}",
+        ],
+        pre_commit_path=config,
+        poetry_cwd=poetry_cwd,
+    )
+
+    output = capsys.readouterr().out
+    assert output.startswith("poetry-to-pre-commit timings:\n  total: ")
+    for phase in ("load project", "load config", "sync", "write config"):
+        assert f"    {phase}: " in output
+    names = {event["name"] for event in json.loads(trace.read_text())["traceEvents"]}
+    assert {"total", "load project", "sync"} <= names
+    assert pstats.Stats(str(profile)).total_calls > 0
@@ -0,0 +1,432 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from poetry_to_pre_commit import common, toml_reader
+
+
+@pytest.fixture
+def toml_project(poetry_cwd: Path) -> toml_reader.TomlProject:
+    return toml_reader.TomlProject.load(cwd=poetry_cwd)
+
+
+def test_packages__same_as_poetry(
+    toml_project: toml_reader.TomlProject, poetry_cwd: Path
+) -> None:
+    poetry_project = common.PoetryProject(cwd=poetry_cwd)
+
+    assert sorted(toml_project.packages) == sorted(poetry_project.packages)
+
+
+@pytest.mark.parametrize("group", ["main", "dev", "types"])
+def test_get_group_dependencies__same_as_poetry(
+    toml_project: toml_reader.TomlProject, poetry_cwd: Path, group: str
+) -> None:
+    poetry_project = common.PoetryProject(cwd=poetry_cwd)
+
+    assert sorted(toml_project.get_group_dependencies(group)) == sorted(
+        poetry_project.get_group_dependencies(group)
+    )
+
+
+def test_get_group_dependencies__unknown(
+    toml_project: toml_reader.TomlProject,
+) -> None:
+    with pytest.raises(ValueError):
+        toml_project.get_group_dependencies("unknown")
+
+
+def test_locate_pyproject__parent(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").touch()
+    subdir = tmp_path / "sub"
+    subdir.mkdir()
+
+    assert toml_reader.locate_pyproject(cwd=subdir) == tmp_path / "pyproject.toml"
+
+
+def test_locate_pyproject__missing(tmp_path: Path) -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        toml_reader.locate_pyproject(cwd=tmp_path)
+
+
+def test_parse_lock__unsupported_version() -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        toml_reader.parse_lock({"metadata": {"lock-version": "3.0"}, "package": []})
+
+
+def test_parse_lock__malformed() -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        toml_reader.parse_lock({"metadata": {"lock-version": "2.0"}, "package": [{}]})
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("^1", common.Dependency("foo-bar")),
+        (
+            {"version": "^1", "extras": ["A"]},
+            common.Dependency("foo-bar", frozenset({"a"})),
+        ),
+        (
+            [{"version": "^1", "extras": ["a"]}, {"version": "^2", "extras": ["b"]}],
+            common.Dependency("foo-bar", frozenset({"a", "b"})),
+        ),
+        (
+            {"version": "^1", "markers": "sys_platform == 'win32'"},
+            common.Dependency("foo-bar", markers='sys_platform == "win32"'),
+        ),
+        (
+            {"version": "^1", "platform": "darwin", "python": "<3.9"},
+            common.Dependency(
+                "foo-bar",
+                markers='python_version < "3.9" and sys_platform == "darwin"',
+            ),
+        ),
+        (
+            [{"version": "^1", "python": "<3.9"}, {"version": "^2", "python": ">=3.9"}],
+            common.Dependency(
+                "foo-bar", markers='python_version < "3.9" or python_version >= "3.9"'
+            ),
+        ),
+        (
+            [{"version": "^1", "python": "<3.9"}, "^2"],
+            common.Dependency("foo-bar"),
+        ),
+    ],
+)
+def test_parse_dependency(spec, expected: common.Dependency) -> None:
+    assert toml_reader.parse_dependency("Foo_Bar", spec) == expected
+
+
+def test_parse_dependency__unsupported() -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        toml_reader.parse_dependency("foo", 1)
+
+
+def test_parse_groups() -> None:
+    pyproject = {
+        "tool": {
+            "poetry": {
+                "dependencies": {"python": "^3.8", "a": "*"},
+                "dev-dependencies": {"b": "*"},
+                "group": {
+                    "dev": {"dependencies": {"c": "*"}},
+                    "empty": {"optional": True},
+                },
+            }
+        }
+    }
+    assert toml_reader.parse_groups(pyproject) == {
+        "main": [common.Dependency("a")],
+        "dev": [common.Dependency("b"), common.Dependency("c")],
+        "empty": [],
+    }
+
+
+@pytest.mark.parametrize(
+    "pyproject",
+    [
+        {},
+        {"dependency-groups": {}, "tool": {"poetry": {}}},
+        {"project": {"dependencies": []}, "tool": {"poetry": {}}},
+        {"tool": {"poetry": {"group": {"a": {"include-groups": ["b"]}}}}},
+    ],
+)
+def test_parse_groups__unsupported(pyproject) -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        toml_reader.parse_groups(pyproject)
+
+
+def test_load_toml__invalid(tmp_path: Path) -> None:
+    path = tmp_path / "pyproject.toml"
+    path.write_text("[tool")
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        toml_reader.load_toml(path)
+
+
+def test_load__no_lock(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text("[tool.poetry.dependencies]\na = '*'\n")
+
+    project = toml_reader.TomlProject.load(cwd=tmp_path)
+
+    assert project.packages == []
+    assert project.get_group_dependencies("main") == [common.Dependency("a")]
+
+
+def test_from_data(poetry_cwd: Path, toml_project: toml_reader.TomlProject) -> None:
+    project = toml_reader.TomlProject.from_data(
+        pyproject=toml_reader.load_toml(poetry_cwd / "pyproject.toml"),
+        lock=toml_reader.load_toml(poetry_cwd / "poetry.lock"),
+    )
+
+    assert project == toml_project
+
+
+def test_from_data__no_lock() -> None:
+    project = toml_reader.TomlProject.from_data(
+        pyproject={"tool": {"poetry": {"dependencies": {"attrs": "*"}}}}
+    )
+
+    assert project.packages == []
+    assert project.group_names == ["main"]
+
+
+def test_scan_lock(poetry_cwd: Path, toml_project: toml_reader.TomlProject) -> None:
+    text = (poetry_cwd / "poetry.lock").read_text()
+    names = {"attrs", "urllib3", "unknown"}
+
+    result = toml_reader.scan_lock(text, names)
+
+    assert sorted(result) == sorted(toml_project.find_packages(names))
+    assert {package.name for package in result} == {"attrs", "urllib3"}
+
+
+def test_scan_lock__stops_when_all_found() -> None:
+    text = (
+        '[[package]]\nname = "Foo_Bar"\nversion = "1.0"\n\n'
+        "[[package]]\nthis is not a package entry\n"
+    )
+
+    assert toml_reader.scan_lock(text, {"foo-bar"}) == [
+        common.PoetryPackage(name="foo-bar", version="1.0")
+    ]
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        toml_reader.scan_lock(text, {"foo-bar", "other"})
+
+
+def test_read_lock_version(poetry_cwd: Path) -> None:
+    text = (poetry_cwd / "poetry.lock").read_text()
+
+    assert toml_reader.read_lock_version(text) == "2.0"
+    assert toml_reader.read_lock_version("") == ""
+
+
+@pytest.fixture
+def lazy_project(poetry_cwd: Path) -> toml_reader.LazyTomlProject:
+    return toml_reader.LazyTomlProject.load(cwd=poetry_cwd)
+
+
+def test_lazy_project__same_as_toml_project(
+    lazy_project: toml_reader.LazyTomlProject, toml_project: toml_reader.TomlProject
+) -> None:
+    assert lazy_project.packages == toml_project.packages
+    assert lazy_project.groups == toml_project.groups
+
+
+def test_lazy_project__find_packages_does_not_parse_lock(
+    lazy_project: toml_reader.LazyTomlProject, mocker
+) -> None:
+    parse_lock = mocker.spy(toml_reader, "parse_lock")
+
+    result = lazy_project.find_packages({"attrs"})
+
+    assert result == [common.PoetryPackage(name="attrs", version="23.2.0")]
+    assert parse_lock.call_count == 0
+
+
+def test_lazy_project__find_packages_fallback(tmp_path: Path, poetry_cwd: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text(
+        (poetry_cwd / "pyproject.toml").read_text()
+    )
+    # Valid TOML, in an order the scanner doesn't expect
+    (tmp_path / "poetry.lock").write_text(
+        '[[package]]\nversion = "1.0"\nname = "attrs"\n\n'
+        '[metadata]\nlock-version = "2.0"\n'
+    )
+    project = toml_reader.LazyTomlProject.load(cwd=tmp_path)
+
+    assert project.find_packages({"attrs"}) == [
+        common.PoetryPackage(name="attrs", version="1.0")
+    ]
+
+
+def test_lazy_project__unsupported_lock_version(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text("[tool.poetry]\n")
+    (tmp_path / "poetry.lock").write_text('[metadata]\nlock-version = "3.0"\n')
+
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        toml_reader.LazyTomlProject.load(cwd=tmp_path)
+
+
+def test_lazy_project__no_lock(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text("[tool.poetry]\n")
+    project = toml_reader.LazyTomlProject.load(cwd=tmp_path)
+
+    assert project.packages == []
+    assert project.find_packages({"attrs"}) == []
+
+
+def test_dependency_graph__same_as_poetry(
+    toml_project: toml_reader.TomlProject,
+    lazy_project: toml_reader.LazyTomlProject,
+    poetry_cwd: Path,
+) -> None:
+    poetry_project = common.PoetryProject(cwd=poetry_cwd)
+
+    assert toml_project.dependency_graph == poetry_project.dependency_graph
+    assert lazy_project.dependency_graph == poetry_project.dependency_graph
+
+
+@pytest.mark.parametrize(
+    "spec, expected, optional",
+    [
+        (">=1", common.LockedDependency("a"), False),
+        (
+            {"version": "*", "optional": True, "extras": ["X_Y"]},
+            common.LockedDependency("a", frozenset({"x-y"})),
+            True,
+        ),
+        (
+            [
+                {"version": "1", "markers": 'python_version < "3.10"'},
+                {"version": "2", "markers": 'python_version >= "3.10"'},
+            ],
+            common.LockedDependency(
+                "a",
+                markers='(python_version < "3.10") or (python_version >= "3.10")',
+            ),
+            False,
+        ),
+        (
+            [{"version": "1", "markers": "a"}, {"version": "2"}],
+            common.LockedDependency("a"),
+            False,
+        ),
+    ],
+)
+def test_parse_locked_dependency(
+    spec, expected: common.LockedDependency, optional: bool
+) -> None:
+    assert toml_reader.parse_locked_dependency("A", spec) == (expected, optional)
+
+
+@pytest.mark.parametrize(
+    "requirement, expected",
+    [
+        ("pytest", common.LockedDependency("pytest")),
+        ("Sphinx (>=5.0)", common.LockedDependency("sphinx")),
+        (
+            "coverage[toml, Foo_Bar] (>=5.3)",
+            common.LockedDependency("coverage", frozenset({"toml", "foo-bar"})),
+        ),
+    ],
+)
+def test_parse_extra_requirement(
+    requirement: str, expected: common.LockedDependency
+) -> None:
+    assert toml_reader.parse_extra_requirement(requirement) == expected
+
+
+def test_digest_lock_packages() -> None:
+    lock = """
+[[package]]
+name = "Foo"
+version = "1.0"
+
+[package.dependencies]
+bar = "*"
+
+[[package]]
+name = "bar"
+version = "2.0"
+
+[metadata]
+lock-version = "2.0"
+"""
+    digests = toml_reader.digest_lock_packages(lock)
+    changed = toml_reader.digest_lock_packages(lock.replace('bar = "*"', 'bar = ">1"'))
+
+    assert digests.keys() == {"foo", "bar"}
+    assert digests["bar"] == changed["bar"]
+    assert digests["foo"] != changed["foo"]
+
+
+def test_parse_lock_files() -> None:
+    wheel = {"file": "a-1-py3-none-any.whl", "hash": "sha256:a"}
+    sdist = {"url": "https://example.com/c-1.tar.gz", "hash": "sha256:c"}
+    lock = {
+        "package": [
+            {"name": "A", "version": "1", "files": [wheel]},
+            # uv.lock
+            {"name": "c", "version": "1", "sdist": sdist, "wheels": []},
+            {"name": "d", "version": "1", "source": {"editable": "."}},
+        ],
+        # Before lock version 2
+        "metadata": {"files": {"B_b": [{"file": "b-1.tar.gz", "hash": "sha256:b"}]}},
+    }
+
+    assert toml_reader.parse_lock_files(lock) == {
+        "a": [wheel],
+        "b-b": [{"file": "b-1.tar.gz", "hash": "sha256:b"}],
+        "c": [sdist],
+    }
+
+
+@pytest.mark.parametrize(
+    "constraint, expected",
+    [
+        ("<3.9", 'python_version < "3.9"'),
+        (
+            ">=3.8, <3.10.2",
+            'python_version >= "3.8" and python_full_version < "3.10.2"',
+        ),
+        ("^3.12", 'python_version >= "3.12" and python_version < "4.0"'),
+        (
+            "^3.12.1",
+            'python_full_version >= "3.12.1" and python_full_version < "4.0.0"',
+        ),
+        ("^0.2", 'python_version == "0.2"'),
+        ("~3.12", 'python_version == "3.12"'),
+        (
+            "~=3.12.1",
+            'python_full_version >= "3.12.1" and python_full_version < "3.13.0"',
+        ),
+        ("3.*", 'python_version >= "3" and python_version < "4"'),
+        ("3.9", 'python_version == "3.9"'),
+        ("!=3.9", 'python_full_version != "3.9.0"'),
+        (">=3.8 <3.9", 'python_version == "3.8"'),
+        ("*", ""),
+    ],
+)
+def test_python_constraint_to_markers(constraint: str, expected: str) -> None:
+    assert toml_reader.python_constraint_to_markers(constraint) == expected
+
+
+@pytest.mark.parametrize("constraint", [">=3.8,<3.9 || >=3.10", "!=3.9.*", "3.x"])
+def test_python_constraint_to_markers__unsupported(constraint: str) -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        toml_reader.python_constraint_to_markers(constraint)
+
+
+@pytest.mark.parametrize(
+    "item, expected",
+    [
+        (
+            {"python": "^3.12", "markers": "sys_platform=='win32'"},
+            (
+                'python_version >= "3.12" and python_version < "4.0" '
+                'and sys_platform == "win32"'
+            ),
+        ),
+        (
+            {"python": "<3.12", "markers": "sys_platform=='win32'"},
+            'sys_platform == "win32" and python_version < "3.12"',
+        ),
+        (
+            {"python": "^3.12", "markers": "os_name=='nt' or os_name=='posix'"},
+            (
+                'python_version >= "3.12" and python_version < "4.0" '
+                'and (os_name == "nt" or os_name == "posix")'
+            ),
+        ),
+        (
+            {"python": "<3.12", "platform": "linux", "markers": "os_name=='nt'"},
+            'os_name == "nt" and python_version < "3.12" and sys_platform == "linux"',
+        ),
+    ],
+)
+def test_get_dependency_markers(item: dict, expected: str) -> None:
+    """Markers are written as Poetry writes them."""
+    assert toml_reader.get_dependency_markers(item) == expected
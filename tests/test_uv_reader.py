@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import ruamel.yaml
+
+from poetry_to_pre_commit import (
+    common,
+    incremental,
+    requirements,
+    sync_all,
+    toml_reader,
+    uv_reader,
+)
+
+PYPROJECT = """\
+[project]
+name = "fake"
+version = "0.1.0"
+requires-python = ">=3.12"
+dependencies = ["attrs"]
+
+[dependency-groups]
+types = ["types-requests", "psycopg[pool]>=3; python_version >= '3.12'"]
+dev = ["pyright", {include-group = "types"}]
+"""
+
+LOCK = """\
+version = 1
+revision = 2
+requires-python = ">=3.12"
+
+[[package]]
+name = "attrs"
+version = "23.2.0"
+source = { registry = "https://pypi.org/simple" }
+sdist = { url = "https://example.com/attrs-23.2.0.tar.gz", hash = "sha256:aaa", size = 1 }
+wheels = [
+    { url = "https://example.com/attrs-23.2.0-py3-none-any.whl", hash = "sha256:bbb", size = 1 },
+]
+
+[[package]]
+name = "fake"
+source = { virtual = "." }
+dependencies = [
+    { name = "attrs" },
+]
+
+[package.dev-dependencies]
+types = [
+    { name = "psycopg", extra = ["pool"] },
+    { name = "types-requests" },
+]
+
+[[package]]
+name = "psycopg"
+version = "3.1.18"
+source = { registry = "https://pypi.org/simple" }
+dependencies = [
+    { name = "typing-extensions" },
+    { name = "tzdata", marker = "sys_platform == 'win32'" },
+]
+
+[package.optional-dependencies]
+pool = [
+    { name = "psycopg-pool" },
+]
+
+[[package]]
+name = "psycopg-pool"
+version = "3.2.1"
+source = { registry = "https://pypi.org/simple" }
+dependencies = [
+    { name = "typing-extensions" },
+]
+
+[[package]]
+name = "pyright"
+version = "1.1.355"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "types-requests"
+version = "2.31.0.20240311"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "typing-extensions"
+version = "4.10.0"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "tzdata"
+version = "2024.1"
+source = { registry = "https://pypi.org/simple" }
+"""
+
+
+@pytest.fixture
+def uv_cwd(tmp_path: Path) -> Path:
+    directory = tmp_path / "project"
+    directory.mkdir()
+    (directory / "pyproject.toml").write_text(PYPROJECT)
+    (directory / "uv.lock").write_text(LOCK)
+    return directory
+
+
+def test_load_project(uv_cwd: Path) -> None:
+    project = uv_reader.load_project(cwd=uv_cwd)
+
+    assert common.PoetryPackage("pyright", "1.1.355") in project.packages
+    assert project.group_names == ["dev", "main", "types"]
+    assert project.get_group_dependencies("types") == [
+        common.Dependency("types-requests"),
+        common.Dependency(
+            "psycopg", frozenset({"pool"}), markers='python_version >= "3.12"'
+        ),
+    ]
+    assert [dep.name for dep in project.get_group_dependencies("dev")] == [
+        "pyright",
+        "types-requests",
+        "psycopg",
+    ]
+    assert project.dependency_graph["psycopg"] == common.PackageDependencies(
+        required=(
+            common.LockedDependency("typing-extensions"),
+            common.LockedDependency("tzdata", markers='sys_platform == "win32"'),
+        ),
+        extras={"pool": (common.LockedDependency("psycopg-pool"),)},
+    )
+
+
+def test_load_project__no_lock(uv_cwd: Path) -> None:
+    (uv_cwd / "uv.lock").unlink()
+
+    assert uv_reader.load_project(cwd=uv_cwd).packages == []
+
+
+@pytest.mark.parametrize(
+    "requirement, expected",
+    [
+        ("foo", common.Dependency("foo")),
+        ("Foo_Bar>=1,<2", common.Dependency("foo-bar")),
+        ("foo[X, y] ==1", common.Dependency("foo", frozenset({"x", "y"}))),
+        (
+            'foo; sys_platform == "linux"',
+            common.Dependency("foo", markers='sys_platform == "linux"'),
+        ),
+        ("foo @ https://example.com/foo.whl", common.Dependency("foo")),
+    ],
+)
+def test_parse_requirement(requirement: str, expected: common.Dependency) -> None:
+    assert uv_reader.parse_requirement(requirement) == expected
+
+
+def test_parse_dependency_groups__cycle() -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        uv_reader.parse_dependency_groups(
+            {"a": [{"include-group": "b"}], "b": [{"include-group": "a"}]}
+        )
+
+
+def test_parse_dependency_groups__canonical_names() -> None:
+    groups = uv_reader.parse_dependency_groups(
+        {
+            "Type_Stubs": ["types-requests"],
+            "type-stubs": ["types-pyyaml"],
+            "dev": [{"include-group": "TYPE.STUBS"}],
+        }
+    )
+
+    stubs = [common.Dependency("types-requests"), common.Dependency("types-pyyaml")]
+    assert groups == {"type-stubs": stubs, "dev": stubs}
+
+
+def test_load_project__declared_group_name(uv_cwd: Path) -> None:
+    pyproject = uv_cwd / "pyproject.toml"
+    pyproject.write_text(
+        pyproject.read_text()
+        .replace("types =", "Type_Stubs =")
+        .replace('include-group = "types"', 'include-group = "Type_Stubs"')
+    )
+    project = uv_reader.load_project(cwd=uv_cwd)
+
+    assert project.get_group_dependencies("Type_Stubs") == (
+        project.get_group_dependencies("type-stubs")
+    )
+    assert project.get_group_dependencies("Type_Stubs")
+
+
+def test_parse_groups__legacy_dev_dependencies() -> None:
+    groups = uv_reader.parse_groups(
+        {"project": {}, "tool": {"uv": {"dev-dependencies": ["pytest"]}}}
+    )
+
+    assert groups == {"main": [], "dev": [common.Dependency("pytest")]}
+
+
+def test_parse_groups__no_project() -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        uv_reader.parse_groups({"tool": {"poetry": {}}})
+
+
+def test_parse_lock__unsupported_version() -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        uv_reader.parse_lock({"version": 2, "package": []})
+
+
+def test_parse_lock__malformed() -> None:
+    with pytest.raises(toml_reader.UnsupportedFormat):
+        uv_reader.parse_lock({"version": 1, "package": [{"version": "1"}]})
+
+
+def test_get_project__auto(uv_cwd: Path) -> None:
+    assert uv_reader.is_uv_project(cwd=uv_cwd)
+    project = common.get_project(cwd=uv_cwd)
+
+    assert common.PoetryPackage("attrs", "23.2.0") in project.packages
+
+
+def test_get_project__auto_prefers_poetry_lock(poetry_cwd: Path) -> None:
+    assert not uv_reader.is_uv_project(cwd=poetry_cwd)
+    assert isinstance(common.get_project(cwd=poetry_cwd), toml_reader.LazyTomlProject)
+
+
+def test_get_project__uv_unsupported(poetry_cwd: Path) -> None:
+    with pytest.raises(SystemError):
+        common.get_project(cwd=poetry_cwd, backend="uv")
+
+
+def test_sync_all(tmp_path: Path, uv_cwd: Path) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text(
+        "repos:\n"
+        "  - repo: https://github.com/foo/pyright-python\n"
+        "    rev: v1.1.300\n"
+        "    hooks:\n"
+        "      - id: pyright\n"
+    )
+
+    sync_all.sync_all(
+        argv=[
+            *("--map", "pyright-python=pyright"),
+            *("--bind", "pyright=types,main", "--transitive"),
+        ],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=uv_cwd,
+    )
+
+    result = ruamel.yaml.YAML().load(pre_commit_path.read_text())
+    assert result["repos"][0]["rev"] == "v1.1.355"
+    assert result["repos"][0]["hooks"][0]["additional_dependencies"] == [
+        "attrs==23.2.0",
+        'psycopg-pool==3.2.1; python_version >= "3.12"',
+        'psycopg[pool]==3.1.18; python_version >= "3.12"',
+        "types-requests==2.31.0.20240311",
+        'typing-extensions==4.10.0; python_version >= "3.12"',
+        'tzdata==2024.1; python_version >= "3.12" and sys_platform == "win32"',
+    ]
+
+
+def test_sync_all__does_not_import_poetry(tmp_path: Path, uv_cwd: Path) -> None:
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text(
+        "repos:\n  - repo: https://github.com/foo/pyright-python\n    rev: v1.1.300\n"
+    )
+    script = f"""
+import pathlib, sys
+from poetry_to_pre_commit import sync_all
+sync_all.sync_all(
+    argv=["--map", "pyright-python=pyright"],
+    pre_commit_path=pathlib.Path({str(pre_commit_path)!r}),
+    poetry_cwd=pathlib.Path({str(uv_cwd)!r}),
+)
+print(sorted(m for m in sys.modules if m.split(".")[0] == "poetry"))
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_parse_lock_hashes(uv_cwd: Path) -> None:
+    hashes = requirements.parse_lock_hashes(toml_reader.load_toml(uv_cwd / "uv.lock"))
+
+    assert hashes["attrs"] == ["sha256:aaa", "sha256:bbb"]
+
+
+def test_incremental__uv_lock(uv_cwd: Path) -> None:
+    result = incremental.get_incremental(
+        hook="sync-all",
+        revision=incremental.AUTO,
+        options={},
+        pre_commit_path=uv_cwd / ".pre-commit-config.yaml",
+        poetry_cwd=uv_cwd,
+    )
+
+    assert result is not None
+    assert result.lock_path == uv_cwd / "uv.lock"
+    # The virtual project has no version
+    assert "fake" in toml_reader.digest_lock_packages(LOCK)
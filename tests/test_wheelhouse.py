@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any
+
+import pytest
+import ruamel.yaml
+
+from poetry_to_pre_commit import common, sync_hooks_additional_dependencies, wheelhouse
+
+ATTRS_WHEEL = "attrs-23.2.0-py3-none-any.whl"
+
+
+def cache_file(cache_dir: Path, filename: str, content: bytes) -> str:
+    directory = cache_dir / "artifacts" / "ab" / "cd" / "ef" / "0123"
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / filename).write_bytes(content)
+    return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+
+@pytest.fixture
+def poetry_cache_dir(tmp_path: Path, monkeypatch) -> Path:
+    directory = tmp_path / "pypoetry"
+    monkeypatch.setenv(wheelhouse.POETRY_CACHE_DIR_ENV_VAR, str(directory))
+    return directory
+
+
+def test_get_poetry_cache_dir(poetry_cache_dir: Path) -> None:
+    assert wheelhouse.get_poetry_cache_dir() == poetry_cache_dir
+
+
+def test_parse_lock_wheels() -> None:
+    lock = {
+        "package": [
+            {
+                "name": "Foo_Bar",
+                "files": [
+                    {"file": "foo_bar-1.0-py3-none-any.whl", "hash": "sha256:abc"},
+                    {"file": "foo_bar-1.0.tar.gz", "hash": "sha256:def"},
+                ],
+            }
+        ]
+    }
+    assert wheelhouse.parse_lock_wheels(lock) == {
+        "foo-bar": {"foo_bar-1.0-py3-none-any.whl": "sha256:abc"}
+    }
+
+
+def test_export_wheelhouse(tmp_path: Path, poetry_cache_dir: Path) -> None:
+    good = cache_file(poetry_cache_dir, "a-1-py3-none-any.whl", b"a")
+    cache_file(poetry_cache_dir, "b-1-py3-none-any.whl", b"tampered")
+    directory = tmp_path / "wheels"
+    directory.mkdir()
+    (directory / "other-1-py3-none-any.whl").write_bytes(b"")
+    packages = [
+        common.PoetryPackage(name="a", version="1"),
+        common.PoetryPackage(name="b", version="1"),
+        common.PoetryPackage(name="c", version="1"),
+    ]
+
+    missing = wheelhouse.export_wheelhouse(
+        directory=directory,
+        packages=packages,
+        wheels={
+            "a": {"a-1-py3-none-any.whl": good},
+            "b": {"b-1-py3-none-any.whl": "sha256:0000"},
+            "c": {"c-1-py3-none-any.whl": "sha256:0000"},
+        },
+        cache_dir=poetry_cache_dir,
+    )
+
+    assert missing == packages[1:]
+    assert sorted(path.name for path in directory.glob("*.whl")) == [
+        "a-1-py3-none-any.whl",
+        "other-1-py3-none-any.whl",
+    ]
+    assert (directory / "a-1-py3-none-any.whl").read_bytes() == b"a"
+    assert list(wheelhouse.read_manifest(directory)) == ["a-1-py3-none-any.whl"]
+
+
+def test_export_wheelhouse__removes_exported(
+    tmp_path: Path, poetry_cache_dir: Path
+) -> None:
+    a_hash = cache_file(poetry_cache_dir, "a-1-py3-none-any.whl", b"a")
+    b_hash = cache_file(poetry_cache_dir, "b-1-py3-none-any.whl", b"b")
+    directory = tmp_path / "wheels"
+    a, b = common.PoetryPackage(name="a"), common.PoetryPackage(name="b")
+    wheels = {
+        "a": {"a-1-py3-none-any.whl": a_hash},
+        "b": {"b-1-py3-none-any.whl": b_hash},
+    }
+    wheelhouse.export_wheelhouse(
+        directory=directory, packages=[a, b], wheels=wheels, cache_dir=poetry_cache_dir
+    )
+
+    wheelhouse.export_wheelhouse(
+        directory=directory, packages=[a], wheels=wheels, cache_dir=poetry_cache_dir
+    )
+
+    assert [path.name for path in directory.glob("*.whl")] == ["a-1-py3-none-any.whl"]
+    assert list(wheelhouse.read_manifest(directory)) == ["a-1-py3-none-any.whl"]
+
+
+def test_export_wheelhouse__checks_existing(
+    tmp_path: Path, poetry_cache_dir: Path, mocker
+) -> None:
+    a_hash = cache_file(poetry_cache_dir, "a-1-py3-none-any.whl", b"a")
+    directory = tmp_path / "wheels"
+    directory.mkdir()
+    (directory / "a-1-py3-none-any.whl").write_bytes(b"tampered")
+    kwargs: dict[str, Any] = {
+        "directory": directory,
+        "packages": [common.PoetryPackage(name="a")],
+        "wheels": {"a": {"a-1-py3-none-any.whl": a_hash}},
+        "cache_dir": poetry_cache_dir,
+    }
+
+    assert wheelhouse.export_wheelhouse(**kwargs) == []
+    assert (directory / "a-1-py3-none-any.whl").read_bytes() == b"a"
+
+    # Nothing is missing: the cache isn't indexed, nor the wheel read again
+    index_cached_files = mocker.spy(wheelhouse, "index_cached_files")
+    matches_hash = mocker.spy(wheelhouse, "matches_hash")
+    assert wheelhouse.export_wheelhouse(**kwargs) == []
+    index_cached_files.assert_not_called()
+    matches_hash.assert_not_called()
+
+
+def test_sync_hooks_additional_dependencies__wheelhouse(
+    tmp_path: Path, poetry_cwd: Path, poetry_cache_dir: Path, capsys
+) -> None:
+    lock = (poetry_cwd / "poetry.lock").read_text()
+    attrs_hash = cache_file(poetry_cache_dir, ATTRS_WHEEL, b"attrs")
+    (tmp_path / "poetry.lock").write_text(
+        lock.replace(
+            "sha256:99b87a485a5820b23b879f04c2305b44b951b502fd64be915879d77a7e8fc6f1",
+            attrs_hash,
+        )
+    )
+    (tmp_path / "pyproject.toml").write_bytes(
+        (poetry_cwd / "pyproject.toml").read_bytes()
+    )
+    pre_commit_path = tmp_path / ".pre-commit-config.yaml"
+    pre_commit_path.write_text(
+        "repos:\n  - repo: https://github.com/foo/mypy\n    rev: v1\n"
+        "    hooks:\n      - id: mypy\n"
+    )
+
+    sync_hooks_additional_dependencies.sync_hooks_additional_dependencies(
+        argv=["--bind=mypy=main", f"--wheelhouse={tmp_path / 'wheels'}"],
+        pre_commit_path=pre_commit_path,
+        poetry_cwd=tmp_path,
+    )
+
+    config = ruamel.yaml.YAML().load(pre_commit_path)
+    assert config["repos"][0]["hooks"][0]["additional_dependencies"] == [
+        f"--find-links={(tmp_path / 'wheels').resolve()}",
+        "attrs==23.2.0",
+    ]
+    assert (tmp_path / "wheels" / ATTRS_WHEEL).read_bytes() == b"attrs"
+
+
+def test_get_pip_options() -> None:
+    parser = sync_hooks_additional_dependencies.get_sync_hooks_additional_dependencies_parser()
+    args = parser.parse_args(["--wheelhouse=w", "--wheelhouse-url=file:///w"])
+
+    assert sync_hooks_additional_dependencies.get_pip_options(args) == [
+        "--find-links=file:///w"
+    ]
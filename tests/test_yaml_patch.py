@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import pytest
+import ruamel.yaml
+
+from poetry_to_pre_commit import common, yaml_patch
+
+
+def load(text: str):
+    return ruamel.yaml.YAML().load(text)
+
+
+def rev_change(data, new_rev: str, repo_index: int = 0) -> common.RevChange:
+    repo = data["repos"][repo_index]
+    change = common.RevChange(
+        repo_index=repo_index,
+        repo=repo["repo"],
+        old_rev=repo.get("rev"),
+        new_rev=new_rev,
+    )
+    repo["rev"] = new_rev
+    return change
+
+
+def deps_change(data, new: list[str]) -> common.AdditionalDependenciesChange:
+    hook = data["repos"][0]["hooks"][0]
+    old = hook.get("additional_dependencies")
+    change = common.AdditionalDependenciesChange(
+        repo_index=0,
+        hook_index=0,
+        hook_id=hook["id"],
+        old=None if old is None else tuple(old),
+        new=tuple(new),
+    )
+    hook["additional_dependencies"] = new
+    return change
+
+
+@pytest.mark.parametrize(
+    "rev, new_rev, expected",
+    [
+        ("v1.0", "v2.0", "v2.0"),
+        ("v1.0  # pinned", "v2.0", "v2.0  # pinned"),
+        ('"v1.0"', "v2.0", '"v2.0"'),
+        ("'v1.0' # pinned", "v2.0", "'v2.0' # pinned"),
+        ("1.0.0", "1.10", '"1.10"'),
+    ],
+)
+def test_patch__rev(rev: str, new_rev: str, expected: str) -> None:
+    text = f"repos:\n-   repo: https://github.com/foo/bar\n    rev: {rev}\n"
+    data = load(text)
+
+    result = yaml_patch.patch(text, data, [rev_change(data, new_rev)])
+
+    assert (
+        result == f"repos:\n-   repo: https://github.com/foo/bar\n    rev: {expected}\n"
+    )
+
+
+def test_patch__keeps_formatting_and_comments() -> None:
+    text = """\
+# Top comment
+repos:
+-   repo: https://github.com/foo/bar   # the bar repo
+    rev: v1.0
+    hooks:
+    -   id: bar
+        args: [--strict]    # strict!
+
+-   repo: https://github.com/foo/baz
+    rev: 2.0.0
+"""
+    data = load(text)
+
+    result = yaml_patch.patch(
+        text, data, [rev_change(data, "v1.1"), rev_change(data, "2.1.0", repo_index=1)]
+    )
+
+    assert result == text.replace("v1.0", "v1.1").replace("2.0.0", "2.1.0")
+
+
+def hook_text(deps: str) -> str:
+    return f"repos:\n- repo: local\n  hooks:\n  - id: mypy\n    additional_dependencies:{deps}\n  - id: other\n"
+
+
+@pytest.mark.parametrize(
+    "deps, new, expected",
+    [
+        # Block sequences
+        (
+            "\n    - a==1\n    - 'b==1'",
+            ["a==2", "b==2", "c[x]==1"],
+            "\n    - a==2\n    - b==2\n    - c[x]==1",
+        ),
+        ("\n    - a==1\n    - b==1", ["b==2"], "\n    - b==2"),
+        ("\n    - a==1", [], " []"),
+        # Flow sequences
+        (" [a==1, b==1]", ["a==2", "c[x]==1"], ' [a==2, "c[x]==1"]'),
+        (" [a==1]  # comment", [], " []  # comment"),
+    ],
+)
+def test_patch__additional_dependencies(
+    deps: str, new: list[str], expected: str
+) -> None:
+    text = hook_text(deps)
+    data = load(text)
+
+    result = yaml_patch.patch(text, data, [deps_change(data, new)])
+
+    assert result == hook_text(expected)
+
+
+@pytest.mark.parametrize(
+    "text, change",
+    [
+        # New keys
+        ("repos:\n- repo: https://github.com/foo/bar\n", "rev"),
+        ("repos:\n- repo: local\n  hooks:\n  - id: mypy\n", "deps"),
+        # Comments inside the sequence
+        (hook_text("\n    - a==1  # comment\n    - b==1"), "deps"),
+        (hook_text("\n    # comment\n    - a==1"), "deps"),
+        # Multi-line flow sequence
+        (hook_text(" [\n      a==1,\n    ]"), "deps"),
+        # Empty flow sequence
+        (hook_text(" []"), "deps"),
+    ],
+)
+def test_patch__cannot_patch(text: str, change: str) -> None:
+    data = load(text)
+    changes = [rev_change(data, "v2") if change == "rev" else deps_change(data, [])]
+
+    with pytest.raises(yaml_patch.CannotPatch):
+        yaml_patch.patch(text, data, changes)
+
+
+@pytest.mark.parametrize(
+    "value, flow, expected",
+    [
+        ("a==1", False, "a==1"),
+        ("a[x]==1", False, "a[x]==1"),
+        ("a[x]==1", True, '"a[x]==1"'),
+        ("1.10", False, '"1.10"'),
+        ("true", False, '"true"'),
+        ("2.1.0", False, "2.1.0"),
+        ("0x1f", False, '"0x1f"'),
+        ('a; python_version < "3.9"', False, '"a; python_version < \\"3.9\\""'),
+    ],
+)
+def test_format_scalar(value: str, flow: bool, expected: str) -> None:
+    assert yaml_patch.format_scalar(value, flow=flow) == expected
+
+
+def test_pre_commit_config_roundtrip__patches(tmp_path) -> None:
+    path = tmp_path / ".pre-commit-config.yaml"
+    text = "repos:\n-   repo: https://github.com/foo/bar  # comment\n    rev: v1.0\n"
+    path.write_text(text)
+
+    with common.pre_commit_config_roundtrip(path) as config:
+        config.changes.append(rev_change(config.data, "v2.0"))
+
+    assert path.read_text() == text.replace("v1.0", "v2.0")
+
+
+def test_pre_commit_config_roundtrip__falls_back_to_dump(tmp_path) -> None:
+    path = tmp_path / ".pre-commit-config.yaml"
+    path.write_text("repos:\n-   repo: https://github.com/foo/bar\n")
+
+    with common.pre_commit_config_roundtrip(path) as config:
+        config.changes.append(rev_change(config.data, "v2.0"))
+
+    assert path.read_text() == (
+        "repos:\n  - repo: https://github.com/foo/bar\n    rev: v2.0\n"
+    )
+
+
+def test_pre_commit_config_roundtrip__empty_flow_sequence(tmp_path) -> None:
+    path = tmp_path / ".pre-commit-config.yaml"
+    path.write_text(hook_text(" []"))
+
+    with common.pre_commit_config_roundtrip(path) as config:
+        config.changes.append(deps_change(config.data, ["a==1", "b==1"]))
+
+    assert path.read_text() == (
+        "repos:\n"
+        "  - repo: local\n"
+        "    hooks:\n"
+        "      - id: mypy\n"
+        "        additional_dependencies:\n"
+        "          - a==1\n"
+        "          - b==1\n"
+        "      - id: other\n"
+    )